@@ -123,6 +123,33 @@ export default function ApiDocsPage() {
               <code className="text-sm">GET /api/models/:id</code>
               <p className="text-sm text-slate-600 mt-1">Returns a specific model by ID.</p>
             </div>
+
+            <div className="bg-slate-50 p-3 rounded-md">
+              <code className="text-sm">GET /api/models?ids=1,2,3&amp;include=metadata,derivatives</code>
+              <p className="text-sm text-slate-600 mt-1">
+                Returns up to 100 of your models in one request (also accepts POST with{" "}
+                <code>{`{"ids": [...], "include": [...]}`}</code>). Ids that are not found are listed under{" "}
+                <code>missing</code>.
+              </p>
+            </div>
+
+            <div className="bg-slate-50 p-3 rounded-md">
+              <code className="text-sm">GET /api/models/:id/progressive</code>
+              <p className="text-sm text-slate-600 mt-1">
+                Manifest for progressive loading: a coarse base mesh followed by full-resolution chunks, largest
+                surface first, each with its own signed URL valid until <code>expires_at</code>. Returns 202 while
+                the encoding is still being built and 422 if the model could not be encoded.
+              </p>
+            </div>
+
+            <div className="bg-slate-50 p-3 rounded-md">
+              <code className="text-sm">GET /api/models/:id/stats</code>
+              <p className="text-sm text-slate-600 mt-1">
+                Mesh statistics saved at upload: vertex and face counts, bounding box, surface area, volume,
+                watertightness, component count and the problems repaired. Returns 202 while they are computed and
+                422 if the file could not be loaded.
+              </p>
+            </div>
           </div>
         </div>
 
@@ -22,6 +22,8 @@ interface ModelWithUser {
   uploader_username: string
   uploader_name: string
   uploader_organization: string
+  thumbnail_url: string | null
+  turntable_url: string | null
 }
 
 function GalleryContent() {
@@ -165,7 +167,19 @@ function GalleryContent() {
 
           <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
             {filteredModels.map((model) => (
-              <Card key={model.id} className="hover:shadow-lg transition-shadow">
+              <Card key={model.id} className="hover:shadow-lg transition-shadow overflow-hidden">
+                <div className="aspect-square bg-slate-100 flex items-center justify-center">
+                  {model.thumbnail_url ? (
+                    <img
+                      src={model.thumbnail_url}
+                      alt={model.name}
+                      loading="lazy"
+                      className="h-full w-full object-contain"
+                    />
+                  ) : (
+                    <Cube className="h-12 w-12 text-slate-300" />
+                  )}
+                </div>
                 <CardHeader className="pb-3">
                   <div className="flex items-start justify-between">
                     <div className="flex-1 min-w-0">
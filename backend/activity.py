@@ -0,0 +1,255 @@
+"""
+User activity log with rollups, archive rotation and retention
+
+user_activity_log holds only the recent `hot_days` of activity. A
+maintenance pass (run periodically on a background thread):
+
+1. recomputes the daily rollups (activity_daily_user per user/action,
+   activity_daily_action per action) for every day since the last one
+   rolled up, so analytics never scan the raw log;
+2. moves rows older than hot_days into user_activity_archive in id-range
+   batches (INSERT IGNORE then DELETE, so a retry after a crash is safe);
+3. deletes archive rows older than retention_days in LIMITed batches.
+
+InnoDB partitioning was not used because partitioned tables cannot keep
+the user_id foreign key. User-agent strings are stored once in
+user_agents and referenced by id.
+"""
+
+import hashlib
+import json
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import mysql.connector
+
+import db
+from user_directory import record_activity
+
+ACTIVITY_COLUMNS = "id, user_id, action, resource_type, resource_id, details, ip_address, user_agent_id, created_at"
+USER_AGENT_CACHE_SIZE = 1024
+
+
+class ActivityLog:
+    def __init__(self, db_config: Dict[str, str], hot_days: int = 30, retention_days: int = 365,
+                 batch_size: int = 5000, maintenance_interval: int = 3600):
+        self.db_config = db_config
+        self.hot_days = hot_days
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.maintenance_interval = maintenance_interval
+        self.last_maintenance = None
+        self._user_agents: Dict[str, int] = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def get_db_connection(self):
+        """Get database connection"""
+        try:
+            return db.connect(self.db_config)
+        except mysql.connector.Error as err:
+            print(f"Database connection error: {err}")
+            return None
+
+    def _user_agent_id(self, cursor, user_agent: Optional[str]) -> Optional[int]:
+        """Id of a user-agent string in the lookup table, inserting it if new"""
+        if not user_agent:
+            return None
+        cached = self._user_agents.get(user_agent)
+        if cached is not None:
+            return cached
+
+        ua_hash = hashlib.sha1(user_agent.encode('utf-8')).hexdigest()
+        # LAST_INSERT_ID(id) makes lastrowid the existing id on a duplicate
+        cursor.execute("""
+            INSERT INTO user_agents (ua_hash, user_agent) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+        """, (ua_hash, user_agent))
+        ua_id = cursor.lastrowid
+
+        if len(self._user_agents) >= USER_AGENT_CACHE_SIZE:
+            self._user_agents.clear()
+        self._user_agents[user_agent] = ua_id
+        return ua_id
+
+    def log(self, user_id: int, action: str, resource_type: str = None, resource_id: int = None,
+            details: Dict = None, ip_address: str = None, user_agent: str = None):
+        """Record one user action"""
+        conn = self.get_db_connection()
+        if not conn:
+            return
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO user_activity_log
+                (user_id, action, resource_type, resource_id, details, ip_address, user_agent_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (user_id, action, resource_type, resource_id,
+                  json.dumps(details) if details else None, ip_address,
+                  self._user_agent_id(cursor, user_agent)))
+            record_activity(cursor, user_id)
+            cursor.close()
+            conn.close()
+
+        except Exception as e:
+            print(f"Error logging user activity: {e}")
+
+    # --- maintenance -------------------------------------------------------
+
+    def rollup(self, cursor) -> int:
+        """Recompute daily rollups from the last rolled-up day through today"""
+        cursor.execute("SELECT MAX(day) AS day FROM activity_daily_action")
+        row = cursor.fetchone()
+        if row and row['day']:
+            start = row['day']
+        else:
+            cursor.execute("SELECT MIN(created_at) AS first FROM user_activity_log")
+            first = cursor.fetchone()['first']
+            if first is None:
+                return 0
+            start = first.date()
+
+        # Rows before `start` may already be archived; only recompute from there
+        since = datetime.combine(start, datetime.min.time())
+        cursor.execute("""
+            INSERT INTO activity_daily_user (day, user_id, action, count)
+            SELECT DATE(created_at), user_id, action, COUNT(*)
+            FROM user_activity_log
+            WHERE created_at >= %s
+            GROUP BY DATE(created_at), user_id, action
+            ON DUPLICATE KEY UPDATE count = VALUES(count)
+        """, (since,))
+        cursor.execute("""
+            INSERT INTO activity_daily_action (day, action, count, users)
+            SELECT DATE(created_at), action, COUNT(*), COUNT(DISTINCT user_id)
+            FROM user_activity_log
+            WHERE created_at >= %s
+            GROUP BY DATE(created_at), action
+            ON DUPLICATE KEY UPDATE count = VALUES(count), users = VALUES(users)
+        """, (since,))
+        return (date.today() - start).days + 1
+
+    def rotate(self, cursor) -> int:
+        """Move rows older than hot_days into the archive, one id range at a time"""
+        cutoff = datetime.combine(date.today() - timedelta(days=self.hot_days), datetime.min.time())
+        moved = 0
+        while not self._stop.is_set():
+            cursor.execute("""
+                SELECT MAX(id) AS last_id FROM (
+                    SELECT id FROM user_activity_log
+                    WHERE created_at < %s
+                    ORDER BY created_at
+                    LIMIT %s
+                ) batch
+            """, (cutoff, self.batch_size))
+            last_id = cursor.fetchone()['last_id']
+            if last_id is None:
+                break
+
+            cursor.execute(f"""
+                INSERT IGNORE INTO user_activity_archive ({ACTIVITY_COLUMNS})
+                SELECT {ACTIVITY_COLUMNS} FROM user_activity_log
+                WHERE id <= %s AND created_at < %s
+            """, (last_id, cutoff))
+            cursor.execute("DELETE FROM user_activity_log WHERE id <= %s AND created_at < %s",
+                           (last_id, cutoff))
+            moved += cursor.rowcount
+            if cursor.rowcount == 0:
+                break
+        return moved
+
+    def purge(self, cursor) -> int:
+        """Delete archived rows past the retention window in LIMITed batches"""
+        cutoff = datetime.combine(date.today() - timedelta(days=self.retention_days), datetime.min.time())
+        purged = 0
+        while not self._stop.is_set():
+            cursor.execute("""
+                DELETE FROM user_activity_archive
+                WHERE created_at < %s
+                ORDER BY created_at
+                LIMIT %s
+            """, (cutoff, self.batch_size))
+            purged += cursor.rowcount
+            if cursor.rowcount < self.batch_size:
+                break
+        return purged
+
+    def run_maintenance(self) -> Optional[Dict[str, Any]]:
+        """Rollup, rotate and purge; returns what was done or None on failure"""
+        conn = self.get_db_connection()
+        if not conn:
+            return None
+
+        try:
+            cursor = conn.cursor(dictionary=True)
+            result = {
+                "days_rolled_up": self.rollup(cursor),
+                "rows_archived": self.rotate(cursor),
+                "rows_purged": self.purge(cursor)
+            }
+            cursor.close()
+            conn.close()
+            self.last_maintenance = datetime.now()
+            return result
+
+        except Exception as e:
+            print(f"Activity log maintenance error: {e}")
+            return None
+
+    def _maintenance_loop(self):
+        while not self._stop.wait(self.maintenance_interval):
+            self.run_maintenance()
+
+    def start(self):
+        """Start periodic maintenance on a background thread (idempotent)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._maintenance_loop, name='activity-maintenance',
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # --- analytics ---------------------------------------------------------
+
+    def daily_counts(self, days: int = 30, user_id: Optional[int] = None,
+                     action: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """Per-day counts from the rollup tables (not the raw log)"""
+        conn = self.get_db_connection()
+        if not conn:
+            return None
+
+        try:
+            cursor = conn.cursor(dictionary=True)
+            since = date.today() - timedelta(days=days - 1)
+            if user_id is not None:
+                sql = """
+                    SELECT day, action, count
+                    FROM activity_daily_user
+                    WHERE user_id = %s AND day >= %s
+                """
+                params = [user_id, since]
+            else:
+                sql = """
+                    SELECT day, action, count, users
+                    FROM activity_daily_action
+                    WHERE day >= %s
+                """
+                params = [since]
+            if action:
+                sql += " AND action = %s"
+                params.append(action)
+            cursor.execute(sql + " ORDER BY day, action", params)
+            rows = cursor.fetchall()
+            cursor.close()
+            conn.close()
+
+            for row in rows:
+                row['day'] = row['day'].strftime('%Y-%m-%d')
+            return rows
+
+        except Exception as e:
+            print(f"Error reading activity rollups: {e}")
+            return None
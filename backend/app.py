@@ -1,57 +1,78 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, url_for
 from flask_cors import CORS
 import os
-import uuid
-import mysql.connector
-from werkzeug.utils import secure_filename
 import json
+import mimetypes
+import time
 from datetime import datetime
-from auth import AuthManager, require_auth, require_role
+from decimal import Decimal
+from auth import require_auth, require_role
+from user_directory import record_models_removed
+from streaming import stream_json
+from signed_urls import DEFAULT_TTL
+from mesh_validation import STATS_FIELDS, format_stats
+from thumbnails import THUMBNAIL_NAME, TURNTABLE_NAME
+from search import METADATA_FIELDS
+from metrics import RequestMetrics
+from profiling import RequestProfiler
+from migrations import apply_migrations
+from services import (
+    config, DB_CONFIG, PROGRESSIVE_URL_TTL, PUBLIC_DERIVATIVES,
+    slow_query_log, password_hasher, session_manager, activity_log, auth_manager, segmenter,
+    job_pool, derivative_store, thumbnail_renderer, progressive_encoder, file_offload, url_signer,
+    user_directory, model_search, similarity_index, mesh_validator,
+    get_db_connection, get_user_db_connection, allowed_file, queue_thumbnail_render,
+    queue_content_hash, queue_progressive_encoding, user_owns_folder, new_upload_path,
+    register_uploaded_model, get_model_file, model_mime_type, start_background_workers
+)
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-change-this-in-production-2024'
+# Shared with async_server.py (see services.py)
+app.config.update(config)
 
 # Update the CORS configuration to allow your frontend
 CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000"], supports_credentials=True)
 
-# Configuration
-UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'obj', 'ply', 'stl', 'glb', 'gltf'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max upload size
-
-# Ensure upload directory exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-# Database connection configuration
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'heritage_user',
-    'password': 'heritage_password123',
-    'database': 'cultural_heritage',
-    'autocommit': True
-}
-
-# Initialize auth manager
-auth_manager = AuthManager(DB_CONFIG, app.config['SECRET_KEY'])
+MAX_BATCH_MODELS = 100  # ids accepted by the batch model endpoint
+
+# Per-fingerprint statement stats and slow query log for every db.connect() connection
+slow_query_log.install()
 app.auth_manager = auth_manager
 
-# Database connection
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
-    except mysql.connector.Error as err:
-        print(f"Database connection error: {err}")
-        return None
+# Request/DB instrumentation exposed at /metrics
+request_metrics = RequestMetrics()
+request_metrics.init_app(app)
+
+# Per-request profiles; installs no hooks unless a token or sample rate is set
+request_profiler = RequestProfiler(app.config['PROFILE_FOLDER'], app.config['PROFILE_TOKEN'],
+                                   app.config['PROFILE_SAMPLE_RATE'], app.config['PROFILE_MODE'])
+request_profiler.init_app(app)
 
-def get_user_db_connection(user_id: int):
-    """Get connection to user's database"""
-    return get_db_connection()
+request_metrics.add_callback_gauge('background_jobs_pending', 'Queued or running background jobs',
+                                   job_pool.pending_count)
+request_metrics.add_callback_gauge('password_hash_queue_depth', 'Queued or running bcrypt operations',
+                                   password_hasher.queue_depth)
 
-# Helper function to check allowed file extensions
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# Session purge, activity maintenance and ingest sweep run in this process only
+start_background_workers()
+
+def derivative_url(content_hash: str, name: str) -> str:
+    return url_for('get_derivative', content_hash=content_hash, name=name, _external=True)
+
+def attach_preview_urls(model):
+    """Replace file_path/content_hash on a listing row with preview URLs"""
+    file_path = model.pop('file_path')
+    content_hash = model.pop('content_hash')
+    if content_hash and thumbnail_renderer.has_previews(content_hash):
+        model['thumbnail_url'] = derivative_url(content_hash, THUMBNAIL_NAME)
+        model['turntable_url'] = derivative_url(content_hash, TURNTABLE_NAME)
+    else:
+        model['thumbnail_url'] = None
+        model['turntable_url'] = None
+        if content_hash:
+            queue_thumbnail_render(file_path, content_hash)
+        else:
+            queue_content_hash(model['id'], file_path)
 
 # Health check
 @app.route('/api/health', methods=['GET'])
@@ -77,6 +98,8 @@ def register():
         role=data.get('role', 'researcher')
     )
     
+    if 'retry_after' in result:
+        return jsonify(result), 429, {'Retry-After': str(result['retry_after'])}
     if 'error' in result:
         return jsonify(result), 400
     
@@ -91,6 +114,8 @@ def login():
     
     result = auth_manager.authenticate_user(data['username'], data['password'])
     
+    if 'retry_after' in result:
+        return jsonify(result), 429, {'Retry-After': str(result['retry_after'])}
     if 'error' in result:
         return jsonify(result), 401
     
@@ -109,6 +134,9 @@ def login():
 def logout():
     user_id = request.current_user['id']
     
+    # Revoke this session so the JWT stops working
+    auth_manager.sessions.revoke(request.session_id)
+    
     # Log logout activity
     auth_manager.log_user_activity(
         user_id=user_id,
@@ -119,6 +147,13 @@ def logout():
     
     return jsonify({"message": "Logged out successfully"})
 
+@app.route('/api/auth/sessions', methods=['DELETE'])
+@require_auth
+def logout_everywhere():
+    """Revoke every session of the current user, including this one"""
+    revoked = session_manager.revoke_all(request.current_user['id'])
+    return jsonify({"message": "All sessions revoked", "revoked": revoked})
+
 @app.route('/api/auth/profile', methods=['GET'])
 @require_auth
 def get_profile():
@@ -193,31 +228,42 @@ def get_gallery_models():
                 m.description,
                 m.file_type,
                 m.file_size,
-                m.uploaded_at,
+                DATE(m.uploaded_at) as uploaded_at,
                 m.folder_id,
                 f.name as folder_name,
                 u.username as uploader_username,
                 CONCAT(u.first_name, ' ', u.last_name) as uploader_name,
-                u.organization as uploader_organization
+                u.organization as uploader_organization,
+                m.file_path,
+                m.content_hash
             FROM models m
             JOIN folders f ON m.folder_id = f.id
             JOIN users u ON m.user_id = u.id
             ORDER BY m.uploaded_at DESC
         """)
         
-        models = cursor.fetchall()
-        
-        # Convert datetime objects to strings
-        for model in models:
-            if model['uploaded_at']:
-                model['uploaded_at'] = model['uploaded_at'].strftime('%Y-%m-%d')
-        
-        cursor.close()
-        conn.close()
-        return jsonify(models)
+        # Rows are streamed in batches; preview URLs are attached as each batch is encoded
+        return stream_json(conn, cursor, attach_preview_urls)
     except Exception as e:
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
+# Search over all models: full-text, facets and range filters
+@app.route('/api/search/models', methods=['GET'])
+@require_auth
+def search_models():
+    spec = model_search.parse_params(request.args)
+    if 'error' in spec:
+        return jsonify(spec), 400
+    
+    result = model_search.search(spec)
+    if 'error' in result:
+        return jsonify(result), 500
+    
+    for model in result['results']:
+        attach_preview_urls(model)
+    
+    return jsonify(result)
+
 # Protected API Routes
 @app.route('/api/folders', methods=['GET'])
 @require_auth
@@ -230,22 +276,14 @@ def get_folders():
     try:
         cursor = conn.cursor(dictionary=True)
         cursor.execute("""
-            SELECT f.id, f.name, f.description, f.created_at, COUNT(m.id) as file_count
+            SELECT f.id, f.name, f.description, DATE(f.created_at) as created_at, COUNT(m.id) as file_count
             FROM folders f
             LEFT JOIN models m ON f.id = m.folder_id
             WHERE f.user_id = %s
             GROUP BY f.id, f.name, f.description, f.created_at
             ORDER BY f.created_at DESC
         """, (user_id,))
-        folders = cursor.fetchall()
-        
-        for folder in folders:
-            if folder['created_at']:
-                folder['created_at'] = folder['created_at'].strftime('%Y-%m-%d')
-        
-        cursor.close()
-        conn.close()
-        return jsonify(folders)
+        return stream_json(conn, cursor)
     except Exception as e:
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
@@ -373,7 +411,7 @@ def delete_folder(folder_id):
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT file_path FROM models 
+            SELECT id, file_path, file_size FROM models 
             WHERE folder_id = %s AND user_id = %s
         """, (folder_id, user_id))
         models = cursor.fetchall()
@@ -388,13 +426,16 @@ def delete_folder(folder_id):
             conn.close()
             return jsonify({"error": "Folder not found"}), 404
         
+        record_models_removed(cursor, user_id, len(models), sum(model[2] or 0 for model in models))
         cursor.close()
         conn.close()
         
         for model in models:
-            file_path = model[0]
+            file_path = model[1]
             if os.path.exists(file_path):
                 os.remove(file_path)
+            segmenter.invalidate(model[0])
+            similarity_index.remove(model[0])
         
         return jsonify({"message": "Folder deleted successfully"})
     except Exception as e:
@@ -404,75 +445,35 @@ def delete_folder(folder_id):
 @require_auth
 def upload_model(folder_id):
     user_id = request.current_user['id']
-    conn = get_user_db_connection(user_id)
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
     
     try:
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id FROM folders 
-            WHERE id = %s AND user_id = %s
-        """, (folder_id, user_id))
-        folder = cursor.fetchone()
-        
-        if not folder:
-            cursor.close()
-            conn.close()
+        owned = user_owns_folder(folder_id, user_id)
+        if owned is None:
+            return jsonify({"error": "Database connection failed"}), 500
+        if not owned:
             return jsonify({"error": "Folder not found"}), 404
         
         if 'file' not in request.files:
-            cursor.close()
-            conn.close()
             return jsonify({"error": "No file part"}), 400
         
         file = request.files['file']
         
         if file.filename == '':
-            cursor.close()
-            conn.close()
             return jsonify({"error": "No selected file"}), 400
         
         if not allowed_file(file.filename):
-            cursor.close()
-            conn.close()
             return jsonify({"error": "File type not allowed"}), 400
         
-        user_upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], f"user_{user_id}")
-        os.makedirs(user_upload_dir, exist_ok=True)
-        
-        filename = secure_filename(file.filename)
-        file_extension = filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = os.path.join(user_upload_dir, unique_filename)
+        filename, file_extension, file_path = new_upload_path(user_id, file.filename)
         file.save(file_path)
         
-        file_size = os.path.getsize(file_path)
-        
-        cursor.execute("""
-            INSERT INTO models (user_id, folder_id, name, description, file_path, file_type, file_size)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (user_id, folder_id, filename, request.form.get('description', ''), file_path, file_extension, file_size))
-        
-        model_id = cursor.lastrowid
-        cursor.close()
-        conn.close()
-        
-        auth_manager.log_user_activity(
-            user_id=user_id,
-            action='upload_model',
-            resource_type='model',
-            resource_id=model_id,
-            details={'filename': filename, 'file_size': file_size}
-        )
-        
-        return jsonify({
-            "id": model_id,
-            "name": filename,
-            "file_type": file_extension,
-            "file_size": file_size
-        }), 201
+        try:
+            result = register_uploaded_model(user_id, folder_id, filename, file_extension, file_path,
+                                             request.form.get('description', ''))
+        except Exception:
+            os.remove(file_path)
+            raise
+        return jsonify(result), 201
     except Exception as e:
         return jsonify({"error": f"Upload error: {str(e)}"}), 500
 
@@ -506,10 +507,244 @@ def get_model(model_id):
     except Exception as e:
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
+def parse_model_ids(raw):
+    """Deduplicated model ids from a list or comma-separated string, or an error message"""
+    if isinstance(raw, str):
+        raw = [part for part in raw.split(',') if part.strip()]
+    if not isinstance(raw, list) or not raw:
+        return None, "ids must be a non-empty list of model ids"
+    
+    if any(isinstance(value, (bool, float)) for value in raw):
+        return None, "ids must be integers"
+    try:
+        ids = list(dict.fromkeys(int(value) for value in raw))
+    except (TypeError, ValueError):
+        return None, "ids must be integers"
+    
+    if len(ids) > MAX_BATCH_MODELS:
+        return None, f"At most {MAX_BATCH_MODELS} ids per request"
+    return ids, None
+
+def parse_include(raw):
+    """Set of requested sections from a list or comma-separated string, or an error message"""
+    if isinstance(raw, str):
+        raw = raw.split(',')
+    if not isinstance(raw, list) or not all(isinstance(part, str) for part in raw):
+        return None, "include must be a list or comma-separated string"
+    return {part.strip() for part in raw if part.strip()}, None
+
+@app.route('/api/models', methods=['GET', 'POST'])
+@require_auth
+def get_models_batch():
+    """Details for many models in one query: ?ids=1,2,3 or POST {"ids": [...]}
+
+    ?include=metadata,derivatives,stats (or "include" in the POST body, as a
+    list or the same comma-separated string) adds
+    the model_metadata fields, which derivatives are ready and the mesh
+    statistics saved at ingest.
+    """
+    user_id = request.current_user['id']
+    if request.method == 'POST':
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Body must be a JSON object"}), 400
+        raw_ids = data.get('ids')
+        raw_include = data.get('include', [])
+    else:
+        raw_ids = request.args.get('ids', '')
+        raw_include = request.args.get('include', '')
+    
+    ids, error = parse_model_ids(raw_ids)
+    if error:
+        return jsonify({"error": error}), 400
+    include, error = parse_include(raw_include)
+    if error:
+        return jsonify({"error": error}), 400
+    
+    conn = get_user_db_connection(user_id)
+    if not conn:
+        return jsonify({"error": "Database connection failed"}), 500
+    
+    try:
+        cursor = conn.cursor(dictionary=True)
+        extra_columns = ''.join(f", mm.{field}" for field in METADATA_FIELDS) if 'metadata' in include else ''
+        extra_joins = "LEFT JOIN model_metadata mm ON mm.model_id = m.id" if 'metadata' in include else ''
+        if 'stats' in include:
+            extra_columns += ", ms.validated_at" + ''.join(f", ms.{field}" for field in STATS_FIELDS)
+            extra_joins += " LEFT JOIN model_stats ms ON ms.model_id = m.id"
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(f"""
+            SELECT m.id, m.folder_id, m.name, m.description, m.file_type, m.file_size,
+                   m.triangle_count, m.uploaded_at, m.content_hash{extra_columns}
+            FROM models m
+            {extra_joins}
+            WHERE m.id IN ({placeholders}) AND m.user_id = %s
+        """, ids + [user_id])
+        rows = {row['id']: row for row in cursor.fetchall()}
+        cursor.close()
+        conn.close()
+        
+        models = []
+        for model_id in ids:
+            model = rows.get(model_id)
+            if not model:
+                continue
+            if model['uploaded_at']:
+                model['uploaded_at'] = model['uploaded_at'].strftime('%Y-%m-%d')
+            if 'metadata' in include:
+                model['metadata'] = {field: model.pop(field) for field in METADATA_FIELDS}
+                for field, value in model['metadata'].items():
+                    if isinstance(value, Decimal):
+                        model['metadata'][field] = float(value)
+            if 'stats' in include:
+                stats = {field: model.pop(field) for field in STATS_FIELDS + ['validated_at']}
+                model['stats'] = format_stats(stats) if stats['validated_at'] else None
+            content_hash = model.pop('content_hash')
+            if 'derivatives' in include:
+                previews = bool(content_hash) and thumbnail_renderer.has_previews(content_hash)
+                model['derivatives'] = {
+                    "thumbnail_url": derivative_url(content_hash, THUMBNAIL_NAME) if previews else None,
+                    "turntable_url": derivative_url(content_hash, TURNTABLE_NAME) if previews else None,
+                    "progressive_url": (url_for('get_model_progressive', model_id=model_id, _external=True)
+                                        if content_hash and progressive_encoder.has_encoding(content_hash)
+                                        else None),
+                    "segments": os.path.exists(segmenter.cache_path(model_id)),
+                    "similarity": model_id in similarity_index
+                }
+            models.append(model)
+        
+        # Unknown ids and other users' models are indistinguishable on purpose
+        return jsonify({
+            "models": models,
+            "missing": [model_id for model_id in ids if model_id not in rows]
+        })
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+def user_owns_model(model_id: int, user_id: int):
+    """True/False for ownership, None if the database is unreachable"""
+    conn = get_user_db_connection(user_id)
+    if not conn:
+        return None
+    
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM models WHERE id = %s AND user_id = %s", (model_id, user_id))
+    owned = cursor.fetchone() is not None
+    cursor.close()
+    conn.close()
+    return owned
+
+@app.route('/api/models/<int:model_id>/metadata', methods=['GET'])
+@require_auth
+def get_model_metadata(model_id):
+    try:
+        owned = user_owns_model(model_id, request.current_user['id'])
+        if owned is None:
+            return jsonify({"error": "Database connection failed"}), 500
+        if not owned:
+            return jsonify({"error": "Model not found"}), 404
+        
+        return jsonify(model_search.get_metadata(model_id) or {})
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+@app.route('/api/models/<int:model_id>/metadata', methods=['PUT'])
+@require_auth
+def update_model_metadata(model_id):
+    data = request.json
+    if not data:
+        return jsonify({"error": "No fields to update"}), 400
+    
+    try:
+        owned = user_owns_model(model_id, request.current_user['id'])
+        if owned is None:
+            return jsonify({"error": "Database connection failed"}), 500
+        if not owned:
+            return jsonify({"error": "Model not found"}), 404
+        
+        result = model_search.save_metadata(model_id, data)
+        if 'error' in result:
+            return jsonify(result), 400
+        
+        return jsonify({"success": True, "message": "Metadata updated successfully"})
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
 @app.route('/api/models/<int:model_id>/file', methods=['GET'])
 @require_auth
 def download_model(model_id):
     user_id = request.current_user['id']
+    
+    try:
+        model = get_model_file(model_id, user_id)
+        
+        if not model:
+            return jsonify({"error": "Model not found"}), 404
+        
+        if not os.path.exists(model['file_path']):
+            return jsonify({"error": "File not found on disk"}), 404
+        
+        return file_offload.send(model['file_path'], model_mime_type(model['file_type']), model['name'])
+    except Exception as e:
+        print(f"Error serving file: {e}")
+        return jsonify({"error": f"File serving error: {str(e)}"}), 500
+
+@app.route('/api/models/<int:model_id>/signed-url', methods=['GET'])
+@require_auth
+def get_signed_url(model_id):
+    """Short-lived URL for the model file (?derivative=file) or one of its derivatives"""
+    user_id = request.current_user['id']
+    derivative = request.args.get('derivative', 'file')
+    ttl = request.args.get('ttl', DEFAULT_TTL, type=int)
+    
+    try:
+        model = get_model_file(model_id, user_id)
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    if not model:
+        return jsonify({"error": "Model not found"}), 404
+    
+    if derivative == 'file':
+        path = model['file_path']
+        mime_type = model_mime_type(model['file_type'])
+        download_name = model['name']
+    else:
+        path = derivative_store.path(model['content_hash'] or '', derivative)
+        mime_type = mimetypes.guess_type(derivative)[0] or 'application/octet-stream'
+        download_name = derivative
+    if not path or not os.path.exists(path):
+        return jsonify({"error": "File not found"}), 404
+    
+    signed = url_signer.issue(model_id, derivative, user_id, path, mime_type, download_name, ttl)
+    if not signed:
+        return jsonify({"error": "File is outside the served directories"}), 500
+    
+    return jsonify({
+        "url": url_for('get_signed_file', token=signed['token'], _external=True),
+        "expires_at": signed['expires_at']
+    })
+
+@app.route('/api/signed/<token>', methods=['GET'])
+def get_signed_file(token):
+    """Serve a file named by a signed URL; no auth header or DB lookup"""
+    claims = url_signer.verify(token)
+    if not claims:
+        return jsonify({"error": "Invalid or expired link"}), 403
+    if not os.path.exists(claims['path']):
+        return jsonify({"error": "File not found"}), 404
+    
+    response = file_offload.send(claims['path'], claims['t'], claims['n'])
+    # Same URL always names the same bytes until it expires
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = max(0, int(claims['e'] - time.time()))
+    return response
+
+@app.route('/api/models/<int:model_id>/segments', methods=['GET'])
+@require_auth
+def get_model_segments(model_id):
+    """Face-to-segment labels as a compact little-endian integer array"""
+    user_id = request.current_user['id']
     conn = get_user_db_connection(user_id)
     if not conn:
         return jsonify({"error": "Database connection failed"}), 500
@@ -517,7 +752,7 @@ def download_model(model_id):
     try:
         cursor = conn.cursor(dictionary=True)
         cursor.execute("""
-            SELECT file_path, name, file_type 
+            SELECT file_path 
             FROM models 
             WHERE id = %s AND user_id = %s
         """, (model_id, user_id))
@@ -531,25 +766,267 @@ def download_model(model_id):
         if not os.path.exists(model['file_path']):
             return jsonify({"error": "File not found on disk"}), 404
         
-        mime_types = {
-            'obj': 'text/plain',
-            'ply': 'application/octet-stream',
-            'stl': 'application/octet-stream',
-            'glb': 'model/gltf-binary',
-            'gltf': 'model/gltf+json'
-        }
-        
-        mime_type = mime_types.get(model['file_type'], 'application/octet-stream')
-        
-        return send_file(
-            model['file_path'], 
-            mimetype=mime_type,
-            as_attachment=False,
-            download_name=model['name']
-        )
+        labels = segmenter.get_labels(model_id, model['file_path'])
+        if labels is None:
+            return jsonify({"error": "Model could not be segmented"}), 422
+        
+        segment_count = int(labels.max()) + 1 if len(labels) else 0
+        response = Response(labels.astype(labels.dtype.newbyteorder('<')).tobytes(),
+                            mimetype='application/octet-stream')
+        response.headers['X-Segment-Count'] = str(segment_count)
+        response.headers['X-Segment-Dtype'] = labels.dtype.name
+        response.headers['X-Face-Count'] = str(len(labels))
+        response.headers['Access-Control-Expose-Headers'] = 'X-Segment-Count, X-Segment-Dtype, X-Face-Count'
+        return response
     except Exception as e:
-        print(f"Error serving file: {e}")
-        return jsonify({"error": f"File serving error: {str(e)}"}), 500
+        print(f"Error segmenting model: {e}")
+        return jsonify({"error": f"Segmentation error: {str(e)}"}), 500
+
+@app.route('/api/models/<int:model_id>/progressive', methods=['GET'])
+@require_auth
+def get_model_progressive(model_id):
+    """Manifest of the progressive encoding with a URL per chunk, base mesh first"""
+    try:
+        model = get_model_file(model_id, request.current_user['id'])
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    if not model:
+        return jsonify({"error": "Model not found"}), 404
+    
+    content_hash = model['content_hash']
+    if not content_hash:
+        if not os.path.exists(model['file_path']):
+            return jsonify({"error": "File not found on disk"}), 404
+        # Uploaded before content hashing; hashed once in the background
+        queue_content_hash(model_id, model['file_path'])
+        return jsonify({"status": "pending"}), 202
+    
+    manifest = progressive_encoder.manifest(content_hash)
+    if manifest is None:
+        if progressive_encoder.has_failed(content_hash):
+            return jsonify({"error": "Model could not be encoded for progressive loading"}), 422
+        if not os.path.exists(model['file_path']):
+            return jsonify({"error": "File not found on disk"}), 404
+        queue_progressive_encoding(model['file_path'], content_hash)
+        return jsonify({"status": "pending"}), 202
+    
+    # The chunks reconstruct the model, so each file (raw and .qmc) gets a signed URL bound to this user
+    entries = []
+    for chunk in [manifest['base']] + manifest['chunks']:
+        entries.append(chunk)
+        if chunk.get('encoded'):
+            entries.append(chunk['encoded'])
+    for entry in entries:
+        signed = url_signer.issue(model_id, entry['name'], request.current_user['id'],
+                                  derivative_store.path(content_hash, entry['name']),
+                                  'application/octet-stream', entry['name'], PROGRESSIVE_URL_TTL)
+        if not signed:
+            return jsonify({"error": "File is outside the served directories"}), 500
+        entry['url'] = url_for('get_signed_file', token=signed['token'], _external=True)
+    manifest['expires_at'] = int(time.time()) + PROGRESSIVE_URL_TTL
+    return jsonify(manifest)
+
+@app.route('/api/models/<int:model_id>/stats', methods=['GET'])
+@require_auth
+def get_model_stats(model_id):
+    """Mesh statistics and repair counts saved at ingest"""
+    try:
+        model = get_model_file(model_id, request.current_user['id'])
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    if not model:
+        return jsonify({"error": "Model not found"}), 404
+    
+    stats = mesh_validator.get_stats(model_id)
+    if stats is None:
+        if not os.path.exists(model['file_path']):
+            return jsonify({"error": "File not found on disk"}), 404
+        # Uploaded before ingest validation
+        job_pool.submit(f"stats:{model_id}", mesh_validator.validate_model, model_id, model['file_path'])
+        return jsonify({"status": "pending"}), 202
+    if stats['error']:
+        return jsonify({"error": f"Model could not be validated: {stats['error']}",
+                        "validated_at": stats['validated_at']}), 422
+    return jsonify(stats)
+
+@app.route('/api/models/<int:model_id>/similar', methods=['GET'])
+@require_auth
+def get_similar_models(model_id):
+    """Nearest models by shape descriptor, closest first"""
+    try:
+        k = min(50, max(1, int(request.args.get('k', 10))))
+    except ValueError:
+        return jsonify({"error": "k must be an integer"}), 400
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Database connection failed"}), 500
+    
+    try:
+        neighbours = similarity_index.query(model_id, k)
+        cursor = conn.cursor(dictionary=True)
+        
+        if neighbours is None:
+            cursor.execute("SELECT file_path FROM models WHERE id = %s", (model_id,))
+            model = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            if not model:
+                return jsonify({"error": "Model not found"}), 404
+            if similarity_index.has_failed(model_id):
+                return jsonify({"error": "Model could not be loaded for similarity search"}), 422
+            
+            # Not indexed yet (e.g. uploaded before this feature): index it now
+            job_pool.submit(f"similarity:{model_id}", similarity_index.index_model,
+                            model_id, model['file_path'])
+            return jsonify({"status": "pending", "results": []}), 202
+        
+        results = []
+        if neighbours:
+            ids = [neighbour_id for neighbour_id, _ in neighbours]
+            placeholders = ', '.join(['%s'] * len(ids))
+            cursor.execute(f"""
+                SELECT 
+                    m.id,
+                    m.name,
+                    m.file_type,
+                    m.folder_id,
+                    m.file_path,
+                    m.content_hash,
+                    u.username as uploader_username
+                FROM models m
+                JOIN users u ON m.user_id = u.id
+                WHERE m.id IN ({placeholders})
+            """, ids)
+            rows = {row['id']: row for row in cursor.fetchall()}
+            
+            for neighbour_id, distance in neighbours:
+                row = rows.get(neighbour_id)
+                if row:
+                    attach_preview_urls(row)
+                    row['distance'] = distance
+                    results.append(row)
+        
+        cursor.close()
+        conn.close()
+        return jsonify({"status": "ok", "results": results})
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+@app.route('/api/derivatives/<content_hash>/<name>', methods=['GET'])
+def get_derivative(content_hash, name):
+    """Serve a content-addressed preview image; the URL never changes meaning"""
+    if name not in PUBLIC_DERIVATIVES:
+        return jsonify({"error": "Derivative not found"}), 404
+    path = derivative_store.path(content_hash, name)
+    if not path or not os.path.exists(path):
+        return jsonify({"error": "Derivative not found"}), 404
+    
+    response = send_file(os.path.abspath(path), max_age=31536000, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/api/admin/users', methods=['GET'])
+@require_auth
+@require_role('admin')
+def get_all_users():
+    """Paginated user list; ?q= prefix search, ?sort=&order=, ?page=&per_page="""
+    spec = user_directory.parse_params(request.args)
+    if 'error' in spec:
+        return jsonify(spec), 400
+    
+    page, conn, cursor = user_directory.open_page(spec)
+    if 'error' in page:
+        return jsonify(page), 500
+    return stream_json(conn, cursor, envelope=page, key='users')
+
+@app.route('/api/admin/users/export', methods=['GET'])
+@require_auth
+@require_role('admin')
+def export_users():
+    """All matching users as CSV, streamed"""
+    spec = user_directory.parse_params(request.args)
+    if 'error' in spec:
+        return jsonify(spec), 400
+    
+    return Response(user_directory.export_csv(spec), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=users.csv'})
+
+@app.route('/api/admin/users/stats/rebuild', methods=['POST'])
+@require_auth
+@require_role('admin')
+def rebuild_user_stats():
+    """Recompute user_stats from models and activity (first deploy / drift repair)"""
+    result = user_directory.rebuild()
+    if 'error' in result:
+        return jsonify(result), 500
+    return jsonify(result)
+
+@app.route('/api/admin/sessions/stats', methods=['GET'])
+@require_auth
+@require_role('admin')
+def get_session_stats():
+    stats = session_manager.stats()
+    if stats is None:
+        return jsonify({"error": "Database connection failed"}), 500
+    return jsonify(stats)
+
+@app.route('/api/admin/activity', methods=['GET'])
+@require_auth
+@require_role('admin')
+def get_activity_stats():
+    """Daily activity counts from the rollup tables; ?user_id= for one user"""
+    days = min(max(request.args.get('days', 30, type=int), 1), 3660)
+    rows = activity_log.daily_counts(days, request.args.get('user_id', type=int),
+                                     request.args.get('action'))
+    if rows is None:
+        return jsonify({"error": "Database connection failed"}), 500
+    return jsonify({"days": days, "counts": rows})
+
+@app.route('/api/admin/activity/maintenance', methods=['POST'])
+@require_auth
+@require_role('admin')
+def run_activity_maintenance():
+    """Roll up, archive and purge now instead of waiting for the next pass"""
+    result = activity_log.run_maintenance()
+    if result is None:
+        return jsonify({"error": "Activity maintenance failed"}), 500
+    return jsonify(result)
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@require_auth
+@require_role('admin')
+def list_profiles():
+    """Summaries of captured request profiles, newest first"""
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    return jsonify({
+        "enabled": request_profiler.enabled,
+        "profiles": request_profiler.list_profiles(limit)
+    })
+
+@app.route('/api/admin/profiles/<name>', methods=['GET'])
+@require_auth
+@require_role('admin')
+def get_profile_output(name):
+    """Download a collapsed-stack, .prof or summary file"""
+    path = request_profiler.profile_path(name)
+    if not path:
+        return jsonify({"error": "Profile not found"}), 404
+    
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=name)
+
+@app.route('/api/admin/queries', methods=['GET'])
+@require_auth
+@require_role('admin')
+def list_top_queries():
+    """Query fingerprints ranked by total time (or ?sort=avg|max|count)"""
+    limit = min(request.args.get('limit', 20, type=int), 200)
+    sort = request.args.get('sort', 'total')
+    return jsonify({
+        "threshold_ms": app.config['SLOW_QUERY_MS'],
+        "queries": slow_query_log.top_queries(limit, sort)
+    })
 
 @app.route('/api/models/<int:model_id>', methods=['DELETE'])
 @require_auth
@@ -563,7 +1040,7 @@ def delete_model(model_id):
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT file_path FROM models 
+            SELECT file_path, file_size FROM models 
             WHERE id = %s AND user_id = %s
         """, (model_id, user_id))
         model = cursor.fetchone()
@@ -579,11 +1056,15 @@ def delete_model(model_id):
             DELETE FROM models 
             WHERE id = %s AND user_id = %s
         """, (model_id, user_id))
+        if cursor.rowcount:
+            record_models_removed(cursor, user_id, 1, model[1])
         cursor.close()
         conn.close()
         
         if os.path.exists(file_path):
             os.remove(file_path)
+        segmenter.invalidate(model_id)
+        similarity_index.remove(model_id)
         
         return jsonify({"message": "Model deleted successfully"})
     except Exception as e:
@@ -607,9 +1088,13 @@ def init_db():
             if statement.strip():
                 cursor.execute(statement)
         
+        # Columns added to tables that already existed before this schema version
+        applied = apply_migrations(cursor)
+        
         cursor.close()
         conn.close()
-        return jsonify({"message": "Database initialized successfully with authentication"})
+        return jsonify({"message": "Database initialized successfully with authentication",
+                        "migrations": applied})
     except Exception as e:
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 import os
 import uuid
@@ -7,6 +7,8 @@ from werkzeug.utils import secure_filename
 import json
 from datetime import datetime
 from auth import AuthManager, require_auth, require_role
+from user_directory import UserDirectory, record_model_added
+from streaming import stream_json
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-this-in-production'
@@ -36,6 +38,9 @@ DB_CONFIG = {
 auth_manager = AuthManager(DB_CONFIG, app.config['SECRET_KEY'])
 app.auth_manager = auth_manager
 
+# Admin user listing over maintained per-user stats
+user_directory = UserDirectory(DB_CONFIG)
+
 # Database connection
 def get_db_connection():
     try:
@@ -74,6 +79,8 @@ def register():
         role=data.get('role', 'researcher')
     )
     
+    if 'retry_after' in result:
+        return jsonify(result), 429, {'Retry-After': str(result['retry_after'])}
     if 'error' in result:
         return jsonify(result), 400
     
@@ -88,6 +95,8 @@ def login():
     
     result = auth_manager.authenticate_user(data['username'], data['password'])
     
+    if 'retry_after' in result:
+        return jsonify(result), 429, {'Retry-After': str(result['retry_after'])}
     if 'error' in result:
         return jsonify(result), 401
     
@@ -106,6 +115,9 @@ def login():
 def logout():
     user_id = request.current_user['id']
     
+    # Revoke this session so the JWT stops working
+    auth_manager.sessions.revoke(request.session_id)
+    
     # Log logout activity
     auth_manager.log_user_activity(
         user_id=user_id,
@@ -133,23 +145,14 @@ def get_folders():
     try:
         cursor = conn.cursor(dictionary=True)
         cursor.execute("""
-            SELECT f.id, f.name, f.description, f.created_at, COUNT(m.id) as file_count
+            SELECT f.id, f.name, f.description, DATE(f.created_at) as created_at, COUNT(m.id) as file_count
             FROM folders f
             LEFT JOIN models m ON f.id = m.folder_id
             WHERE f.user_id = %s
             GROUP BY f.id, f.name, f.description, f.created_at
             ORDER BY f.created_at DESC
         """, (user_id,))
-        folders = cursor.fetchall()
-        
-        # Convert datetime objects to strings
-        for folder in folders:
-            if folder['created_at']:
-                folder['created_at'] = folder['created_at'].strftime('%Y-%m-%d')
-        
-        cursor.close()
-        conn.close()
-        return jsonify(folders)
+        return stream_json(conn, cursor)
     except Exception as e:
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
@@ -296,6 +299,7 @@ def upload_model(folder_id):
         """, (user_id, folder_id, filename, request.form.get('description', ''), file_path, file_extension, file_size))
         
         model_id = cursor.lastrowid
+        record_model_added(cursor, user_id, file_size)
         cursor.close()
         conn.close()
         
@@ -400,35 +404,37 @@ def download_model(model_id):
 @require_auth
 @require_role('admin')
 def get_all_users():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
+    """Paginated user list; ?q= prefix search, ?sort=&order=, ?page=&per_page="""
+    spec = user_directory.parse_params(request.args)
+    if 'error' in spec:
+        return jsonify(spec), 400
     
-    try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT u.id, u.username, u.email, u.first_name, u.last_name, 
-                   u.organization, u.role, u.created_at, u.last_login, u.is_active,
-                   COUNT(m.id) as model_count
-            FROM users u
-            LEFT JOIN models m ON u.id = m.user_id
-            GROUP BY u.id
-            ORDER BY u.created_at DESC
-        """)
-        users = cursor.fetchall()
-        
-        # Convert datetime objects to strings
-        for user in users:
-            if user['created_at']:
-                user['created_at'] = user['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-            if user['last_login']:
-                user['last_login'] = user['last_login'].strftime('%Y-%m-%d %H:%M:%S')
-        
-        cursor.close()
-        conn.close()
-        return jsonify(users)
-    except Exception as e:
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    page, conn, cursor = user_directory.open_page(spec)
+    if 'error' in page:
+        return jsonify(page), 500
+    return stream_json(conn, cursor, envelope=page, key='users')
+
+@app.route('/api/admin/users/export', methods=['GET'])
+@require_auth
+@require_role('admin')
+def export_users():
+    """All matching users as CSV, streamed"""
+    spec = user_directory.parse_params(request.args)
+    if 'error' in spec:
+        return jsonify(spec), 400
+    
+    return Response(user_directory.export_csv(spec), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=users.csv'})
+
+@app.route('/api/admin/users/stats/rebuild', methods=['POST'])
+@require_auth
+@require_role('admin')
+def rebuild_user_stats():
+    """Recompute user_stats from models and activity (first deploy / drift repair)"""
+    result = user_directory.rebuild()
+    if 'error' in result:
+        return jsonify(result), 500
+    return jsonify(result)
 
 # Health check and initialization
 @app.route('/api/health', methods=['GET'])
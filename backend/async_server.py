@@ -0,0 +1,209 @@
+"""
+Async serving mode for model uploads and downloads
+
+The Flask app holds one worker thread per request for the whole
+transfer, so a handful of slow uplinks can exhaust the pool. This aiohttp
+server handles just the two transfer routes on an event loop:
+
+    POST /api/folders/<folder_id>/models   multipart body streamed to disk
+    GET  /api/models/<model_id>/file       FileResponse (Range + sendfile)
+
+Uploads are read chunk by chunk, hashed as they arrive and written
+through a small file-I/O thread pool, so a slow client costs a socket and
+a buffer rather than a thread. Downloads use aiohttp's FileResponse, which
+uses loop.sendfile() (zero-copy) where the platform supports it. Auth and
+DB work reuse the helpers in services.py on a bounded thread pool; they
+are short compared with the transfer.
+
+This process starts no background workers. Uploads are registered
+without ingest; the Flask process's ingest sweep validates them and
+builds their derivatives, so the Flask app must be running too.
+
+Run next to the Flask app and route the two paths here from the proxy:
+
+    python async_server.py            # listens on ASYNC_PORT (default 5001)
+
+    location ~ ^/api/(folders/\\d+/models|models/\\d+/file)$ {
+        proxy_pass http://127.0.0.1:5001;
+        proxy_request_buffering off;
+    }
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+import services as api
+
+UPLOAD_CHUNK = 256 * 1024
+DB_WORKERS = int(os.environ.get('ASYNC_DB_WORKERS', 8))
+IO_WORKERS = int(os.environ.get('ASYNC_IO_WORKERS', 4))
+ALLOWED_ORIGINS = {"http://localhost:3000", "http://127.0.0.1:3000"}
+
+db_pool = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix='async-db')
+io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='async-io')
+
+
+async def run_db(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(db_pool, fn, *args)
+
+
+async def run_io(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(io_pool, fn, *args)
+
+
+def json_error(message: str, status: int) -> web.Response:
+    return web.json_response({"error": message}, status=status)
+
+
+async def authenticate(request: web.Request):
+    """User dict for the bearer token, or an error response"""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None, json_error('Authentication token is missing', 401)
+    parts = auth_header.split(" ")
+    if len(parts) < 2:
+        return None, json_error('Invalid authorization header format', 401)
+
+    user = await run_db(api.auth_manager.get_user_from_token, parts[1])
+    if not user:
+        return None, json_error('Invalid or expired token', 401)
+    return user, None
+
+
+@web.middleware
+async def cors_middleware(request: web.Request, handler):
+    # Mirrors the flask-cors settings of app.py
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    origin = request.headers.get('Origin')
+    if origin in ALLOWED_ORIGINS:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers['Access-Control-Allow-Credentials'] = 'true'
+        response.headers['Access-Control-Allow-Headers'] = 'Authorization, Content-Type'
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+        response.headers['Vary'] = 'Origin'
+    return response
+
+
+async def save_stream(part, file_path: str, limit: int):
+    """Write a multipart part to disk; returns (bytes, sha256) or None if over limit"""
+    digest = hashlib.sha256()
+    size = 0
+    f = await run_io(open, file_path, 'wb')
+    try:
+        while True:
+            chunk = await part.read_chunk(UPLOAD_CHUNK)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                return None
+            digest.update(chunk)
+            await run_io(f.write, chunk)
+    finally:
+        await run_io(f.close)
+    return size, digest.hexdigest()
+
+
+async def upload_model(request: web.Request) -> web.Response:
+    user, error = await authenticate(request)
+    if error:
+        return error
+    user_id = user['id']
+    folder_id = int(request.match_info['folder_id'])
+
+    owned = await run_db(api.user_owns_folder, folder_id, user_id)
+    if owned is None:
+        return json_error("Database connection failed", 500)
+    if not owned:
+        return json_error("Folder not found", 404)
+
+    if not request.content_type.startswith('multipart/'):
+        return json_error("No file part", 400)
+
+    limit = api.config['MAX_CONTENT_LENGTH']
+    if request.content_length and request.content_length > limit:
+        return json_error("File too large", 413)
+
+    description = ''
+    saved = None
+    reader = await request.multipart()
+    try:
+        async for part in reader:
+            if part.name == 'description':
+                description = await part.text()
+            elif part.name == 'file' and saved is None:
+                if not part.filename:
+                    return json_error("No selected file", 400)
+                if not api.allowed_file(part.filename):
+                    return json_error("File type not allowed", 400)
+
+                filename, file_extension, file_path = await run_io(api.new_upload_path, user_id, part.filename)
+                saved = (filename, file_extension, file_path)
+                result = await save_stream(part, file_path, limit)
+                if result is None:
+                    await run_io(os.remove, file_path)
+                    return json_error("File too large", 413)
+                saved += (result[1],)
+
+        if saved is None:
+            return json_error("No file part", 400)
+
+        filename, file_extension, file_path, content_hash = saved
+        body = await run_db(api.register_uploaded_model, user_id, folder_id, filename, file_extension,
+                            file_path, description, content_hash, False)
+        return web.json_response(body, status=201)
+
+    except Exception as e:
+        # Client disconnects and DB failures leave no orphaned file behind
+        if saved is not None and os.path.exists(saved[2]):
+            await run_io(os.remove, saved[2])
+        if isinstance(e, ConnectionResetError):
+            raise
+        print(f"Async upload error: {e}")
+        return json_error(f"Upload error: {str(e)}", 500)
+
+
+async def download_model(request: web.Request) -> web.StreamResponse:
+    user, error = await authenticate(request)
+    if error:
+        return error
+
+    try:
+        model = await run_db(api.get_model_file, int(request.match_info['model_id']), user['id'])
+    except Exception as e:
+        print(f"Error serving file: {e}")
+        return json_error(f"File serving error: {str(e)}", 500)
+
+    if not model:
+        return json_error("Model not found", 404)
+    if not os.path.exists(model['file_path']):
+        return json_error("File not found on disk", 404)
+
+    safe_name = re.sub(r'[^\w.\- ]', '_', model['name'])
+    return web.FileResponse(model['file_path'], chunk_size=UPLOAD_CHUNK, headers={
+        'Content-Type': api.model_mime_type(model['file_type']),
+        'Content-Disposition': f'inline; filename="{safe_name}"'
+    })
+
+
+def create_app() -> web.Application:
+    # Body size is enforced per chunk in save_stream, not by buffering the request
+    application = web.Application(middlewares=[cors_middleware])
+    application.router.add_post(r'/api/folders/{folder_id:\d+}/models', upload_model)
+    application.router.add_get(r'/api/models/{model_id:\d+}/file', download_model)
+    return application
+
+
+if __name__ == '__main__':
+    port = int(os.environ.get('ASYNC_PORT', 5001))
+    print(f"Starting async transfer server on port {port}...")
+    api.slow_query_log.install()
+    web.run_app(create_app(), port=port)
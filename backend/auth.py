@@ -1,45 +1,49 @@
-import bcrypt
 import jwt
-import secrets
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify, current_app
 import mysql.connector
+import db
+from passwords import PasswordHasher, PasswordHasherBusy
+from sessions import SessionManager
+from activity import ActivityLog
 from typing import Optional, Dict, Any
 
 class AuthManager:
-    def __init__(self, db_config: Dict[str, str], secret_key: str):
+    def __init__(self, db_config: Dict[str, str], secret_key: str,
+                 password_hasher: Optional[PasswordHasher] = None,
+                 sessions: Optional[SessionManager] = None,
+                 activity: Optional[ActivityLog] = None):
         self.db_config = db_config
         self.secret_key = secret_key
+        self.password_hasher = password_hasher or PasswordHasher()
+        self.sessions = sessions or SessionManager(db_config)
+        self.activity = activity or ActivityLog(db_config)
         
     def get_db_connection(self):
         """Get database connection"""
         try:
-            return mysql.connector.connect(**self.db_config)
+            return db.connect(self.db_config)
         except mysql.connector.Error as err:
             print(f"Database connection error: {err}")
             return None
     
     def hash_password(self, password: str) -> str:
-        """Hash password using bcrypt"""
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return hashed.decode('utf-8')
+        """Hash password using bcrypt on the hashing pool; may raise PasswordHasherBusy"""
+        return self.password_hasher.hash(password)
     
     def verify_password(self, password: str, hashed: str) -> bool:
-        """Verify password against hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        """Verify password against hash on the hashing pool; may raise PasswordHasherBusy"""
+        return self.password_hasher.verify(password, hashed)
     
-    def generate_session_token(self) -> str:
-        """Generate secure session token"""
-        return secrets.token_urlsafe(32)
-    
-    def create_jwt_token(self, user_id: int, username: str) -> str:
-        """Create JWT token for user"""
+    def create_jwt_token(self, user_id: int, username: str, session_token: str,
+                         expires_in: timedelta = timedelta(hours=24)) -> str:
+        """Create JWT token for user, bound to a user_sessions row"""
         payload = {
             'user_id': user_id,
             'username': username,
-            'exp': datetime.utcnow() + timedelta(hours=24),
+            'sid': session_token,
+            'exp': datetime.utcnow() + expires_in,
             'iat': datetime.utcnow()
         }
         # Use PyJWT's encode method
@@ -84,6 +88,7 @@ class AuthManager:
             """, (username, email, password_hash, first_name, last_name, organization, role))
             
             user_id = cursor.lastrowid
+            cursor.execute("INSERT INTO user_stats (user_id) VALUES (%s)", (user_id,))
             
             # Create user's personal database name
             user_db_name = f"heritage_user_{user_id}"
@@ -102,6 +107,8 @@ class AuthManager:
                 "database_name": user_db_name
             }
             
+        except PasswordHasherBusy as e:
+            return {"error": "Server busy, please retry", "retry_after": e.retry_after}
         except Exception as e:
             print(f"Registration error: {e}")
             return {"error": f"Registration failed: {str(e)}"}
@@ -128,20 +135,21 @@ class AuthManager:
             if not user or not self.verify_password(password, user['password_hash']):
                 return {"error": "Invalid credentials"}
             
+            # Upgrade hashes made with a different bcrypt cost; skipped if the pool is full
+            if self.password_hasher.needs_rehash(user['password_hash']):
+                try:
+                    cursor.execute("UPDATE users SET password_hash = %s WHERE id = %s",
+                                   (self.hash_password(password), user['id']))
+                except PasswordHasherBusy:
+                    pass
+            
             # Update last login
             cursor.execute("UPDATE users SET last_login = NOW() WHERE id = %s", (user['id'],))
             
-            # Generate JWT token
-            token = self.create_jwt_token(user['id'], user['username'])
-            
-            # Create session
-            session_token = self.generate_session_token()
-            expires_at = datetime.now() + timedelta(hours=24)
-            
-            cursor.execute("""
-                INSERT INTO user_sessions (user_id, session_token, expires_at)
-                VALUES (%s, %s, %s)
-            """, (user['id'], session_token, expires_at))
+            # Create session (dropping the oldest past the per-user cap) and a JWT bound to it
+            session_token, _ = self.sessions.create_session(cursor, user['id'])
+            token = self.create_jwt_token(user['id'], user['username'], session_token,
+                                          self.sessions.ttl)
             
             # Get user's database
             cursor.execute("SELECT database_name FROM user_databases WHERE user_id = %s", (user['id'],))
@@ -166,14 +174,16 @@ class AuthManager:
                 }
             }
             
+        except PasswordHasherBusy as e:
+            return {"error": "Server busy, please retry", "retry_after": e.retry_after}
         except Exception as e:
             print(f"Authentication error: {e}")
             return {"error": f"Authentication failed: {str(e)}"}
     
     def get_user_from_token(self, token: str) -> Optional[Dict[str, Any]]:
-        """Get user information from JWT token"""
+        """Get user information from JWT token; the token's session must still be live"""
         payload = self.verify_jwt_token(token)
-        if not payload:
+        if not payload or 'sid' not in payload:
             return None
         
         conn = self.get_db_connection()
@@ -184,11 +194,13 @@ class AuthManager:
             cursor = conn.cursor(dictionary=True)
             cursor.execute("""
                 SELECT u.id, u.username, u.email, u.first_name, u.last_name, 
-                       u.organization, u.role, ud.database_name
+                       u.organization, u.role, ud.database_name, s.id AS session_id
                 FROM users u
+                JOIN user_sessions s ON s.user_id = u.id
+                    AND s.session_token = %s AND s.expires_at > NOW()
                 LEFT JOIN user_databases ud ON u.id = ud.user_id
                 WHERE u.id = %s AND u.is_active = TRUE
-            """, (payload['user_id'],))
+            """, (payload['sid'], payload['user_id']))
             
             user = cursor.fetchone()
             cursor.close()
@@ -204,24 +216,7 @@ class AuthManager:
                          resource_id: int = None, details: Dict = None, 
                          ip_address: str = None, user_agent: str = None):
         """Log user activity"""
-        conn = self.get_db_connection()
-        if not conn:
-            return
-        
-        try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO user_activity_log 
-                (user_id, action, resource_type, resource_id, details, ip_address, user_agent)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (user_id, action, resource_type, resource_id, 
-                  str(details) if details else None, ip_address, user_agent))
-            
-            cursor.close()
-            conn.close()
-            
-        except Exception as e:
-            print(f"Error logging user activity: {e}")
+        self.activity.log(user_id, action, resource_type, resource_id, details, ip_address, user_agent)
 
 def require_auth(f):
     """Decorator to require authentication for routes"""
@@ -247,7 +242,8 @@ def require_auth(f):
         if not user:
             return jsonify({'error': 'Invalid or expired token'}), 401
         
-        # Add user to request context
+        # Add user and its session to request context
+        request.session_id = user.pop('session_id')
         request.current_user = user
         
         return f(*args, **kwargs)
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the API hot paths
+
+Runs the Flask app in-process against a dedicated local MySQL database
+seeded with synthetic users, folders and models, drives the hot endpoints
+at a configurable concurrency and reports latency percentiles, throughput
+and DB queries per request. Results are saved as JSON; pass --compare
+with an earlier result file to see the change per endpoint.
+
+The schema and queries rely on MySQL features (ENUM, FULLTEXT,
+ON DUPLICATE KEY UPDATE, CONCAT), so there is no SQLite stand-in. Point
+--db-* at any local MySQL server, for example a throwaway container:
+  docker run --rm -e MYSQL_ROOT_PASSWORD=bench -p 3306:3306 mysql:8
+The benchmark database (--db-name) is dropped and recreated on every run.
+
+Usage:
+  python benchmark_api.py --db-password bench                   # Default scenario
+  python benchmark_api.py --db-password bench --concurrency 16 --requests 2000
+  python benchmark_api.py --db-password bench --compare bench_api_old.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+import mysql.connector
+
+import db
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ENDPOINTS = ['login', 'folders', 'folder', 'gallery', 'upload', 'download']
+BENCH_PASSWORD = 'bench-password'
+
+
+def synthetic_obj(rows: int, cols: int) -> bytes:
+    """A wavy height-field grid as OBJ text, 2 * (rows-1) * (cols-1) faces"""
+    xs, ys = np.meshgrid(np.linspace(0, 1, cols), np.linspace(0, 1, rows))
+    zs = 0.1 * np.sin(xs * 6.0) * np.cos(ys * 6.0)
+    vertices = np.column_stack((xs.ravel(), ys.ravel(), zs.ravel()))
+
+    index = np.arange(rows * cols).reshape(rows, cols) + 1
+    a, b = index[:-1, :-1].ravel(), index[:-1, 1:].ravel()
+    c, d = index[1:, :-1].ravel(), index[1:, 1:].ravel()
+    faces = np.vstack((np.column_stack((a, b, d)), np.column_stack((a, d, c))))
+
+    lines = [f"v {x:.6f} {y:.6f} {z:.6f}" for x, y, z in vertices]
+    lines += [f"f {i} {j} {k}" for i, j, k in faces]
+    return ("\n".join(lines) + "\n").encode('ascii')
+
+
+class QueryCounter:
+    """Per-thread count and total time of DB statements"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def __call__(self, statement, params, seconds):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+        self._local.seconds = getattr(self._local, 'seconds', 0.0) + seconds
+
+    def reset(self):
+        self._local.count = 0
+        self._local.seconds = 0.0
+
+    def snapshot(self):
+        return getattr(self._local, 'count', 0), getattr(self._local, 'seconds', 0.0)
+
+
+def create_database(args) -> dict:
+    """Drop/recreate the benchmark database from schema_with_auth.sql"""
+    server_config = {
+        'host': args.db_host,
+        'port': args.db_port,
+        'user': args.db_user,
+        'password': args.db_password,
+        'autocommit': True
+    }
+    conn = mysql.connector.connect(**server_config)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{args.db_name}`")
+
+    with open(os.path.join(BACKEND_DIR, 'schema_with_auth.sql'), 'r') as f:
+        schema_sql = f.read().replace('cultural_heritage', args.db_name)
+
+    for statement in schema_sql.split(';'):
+        if statement.strip():
+            cursor.execute(statement)
+
+    cursor.close()
+    conn.close()
+    return dict(server_config, database=args.db_name)
+
+
+def seed_database(api, db_config: dict, args, upload_dir: str) -> dict:
+    """Insert synthetic users, folders and models; returns ids per user"""
+    rng = random.Random(args.seed)
+    password_hash = api.auth_manager.hash_password(BENCH_PASSWORD)
+
+    model_files = []
+    for i in range(4):
+        path = os.path.join(upload_dir, f"bench_model_{i}.obj")
+        data = synthetic_obj(args.model_grid + i, args.model_grid)
+        with open(path, 'wb') as f:
+            f.write(data)
+        model_files.append((path, len(data)))
+
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+
+    cursor.executemany("""
+        INSERT INTO users (username, email, password_hash, first_name, last_name, organization, role)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, [(f"bench_user_{i}", f"bench_user_{i}@bench.local", password_hash,
+           'Bench', f"User {i}", f"Museum {i % 7}", 'researcher')
+          for i in range(args.users)])
+
+    cursor.execute("SELECT id, username FROM users WHERE email LIKE %s ORDER BY id", ('%@bench.local',))
+    users = cursor.fetchall()
+    cursor.executemany("INSERT INTO user_databases (user_id, database_name) VALUES (%s, %s)",
+                       [(user_id, f"heritage_user_{user_id}") for user_id, _ in users])
+
+    cursor.executemany("INSERT INTO folders (user_id, name, description) VALUES (%s, %s, %s)",
+                       [(user_id, f"Collection {j}", 'Synthetic benchmark folder')
+                        for user_id, _ in users for j in range(args.folders)])
+    cursor.execute("SELECT id, user_id FROM folders ORDER BY id")
+    folders = cursor.fetchall()
+
+    model_rows = []
+    for folder_id, user_id in folders:
+        for k in range(args.models):
+            path, size = model_files[rng.randrange(len(model_files))]
+            model_rows.append((user_id, folder_id, f"artifact_{folder_id}_{k}.obj",
+                               'Synthetic benchmark model', path, 'obj', size))
+    for start in range(0, len(model_rows), 1000):
+        cursor.executemany("""
+            INSERT INTO models (user_id, folder_id, name, description, file_path, file_type, file_size)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, model_rows[start:start + 1000])
+
+    cursor.execute("SELECT id, user_id FROM models ORDER BY id")
+    models = cursor.fetchall()
+
+    # Tokens are only accepted while their user_sessions row exists
+    fixtures = {}
+    for user_id, username in users:
+        session_token, _ = api.session_manager.create_session(cursor, user_id)
+        fixtures[user_id] = {
+            'username': username,
+            'token': api.auth_manager.create_jwt_token(user_id, username, session_token),
+            'folders': [],
+            'models': []
+        }
+    cursor.close()
+    conn.close()
+    for folder_id, user_id in folders:
+        if user_id in fixtures:
+            fixtures[user_id]['folders'].append(folder_id)
+    for model_id, user_id in models:
+        if user_id in fixtures:
+            fixtures[user_id]['models'].append(model_id)
+
+    return {
+        'users': fixtures,
+        'upload_payload': synthetic_obj(args.model_grid, args.model_grid),
+        'counts': {'users': len(users), 'folders': len(folders), 'models': len(models)}
+    }
+
+
+def make_request(client, endpoint: str, user: dict, fixtures: dict, rng: random.Random):
+    """Issue one request for an endpoint and return the response"""
+    headers = {'Authorization': f"Bearer {user['token']}"}
+
+    if endpoint == 'login':
+        response = client.post('/api/auth/login',
+                               json={'username': user['username'], 'password': BENCH_PASSWORD})
+        if response.status_code == 200:
+            # Logins past the per-user session cap revoke the oldest sessions,
+            # the seeded one included; keep using the newest
+            user['token'] = response.get_json()['token']
+        return response
+    if endpoint == 'folders':
+        return client.get('/api/folders', headers=headers)
+    if endpoint == 'folder':
+        return client.get(f"/api/folders/{rng.choice(user['folders'])}", headers=headers)
+    if endpoint == 'gallery':
+        return client.get('/api/gallery/models', headers=headers)
+    if endpoint == 'upload':
+        data = {'file': (BytesIO(fixtures['upload_payload']), 'bench_upload.obj'),
+                'description': 'benchmark upload'}
+        return client.post(f"/api/folders/{rng.choice(user['folders'])}/models",
+                           data=data, headers=headers, content_type='multipart/form-data')
+    if endpoint == 'download':
+        return client.get(f"/api/models/{rng.choice(user['models'])}/file", headers=headers)
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+def run_endpoint(api, endpoint: str, fixtures: dict, args, counter: QueryCounter) -> dict:
+    """Drive one endpoint at the configured concurrency and summarise it"""
+    users = [user for user in fixtures['users'].values() if user['folders'] and user['models']]
+    local = threading.local()
+
+    def task(index: int):
+        if not hasattr(local, 'client'):
+            local.client = api.app.test_client()
+        rng = random.Random(args.seed * 1000003 + index)
+        user = users[rng.randrange(len(users))]
+
+        counter.reset()
+        start = time.perf_counter()
+        response = make_request(local.client, endpoint, user, fixtures, rng)
+        body = response.get_data()
+        elapsed = time.perf_counter() - start
+        response.close()
+        queries, query_seconds = counter.snapshot()
+        return elapsed, response.status_code, queries, query_seconds, len(body)
+
+    # Warm up connections, imports and caches outside the measurement
+    for i in range(min(args.warmup, args.requests)):
+        task(-1 - i)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        samples = list(executor.map(task, range(args.requests)))
+    wall_time = time.perf_counter() - started
+
+    latencies = np.array([sample[0] for sample in samples]) * 1000.0
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample[1])] = statuses.get(str(sample[1]), 0) + 1
+    errors = sum(count for status, count in statuses.items() if int(status) >= 400)
+
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'status_codes': statuses,
+        'wall_time_s': wall_time,
+        'requests_per_second': len(samples) / wall_time if wall_time > 0 else 0.0,
+        'latency_ms': {
+            'mean': float(latencies.mean()),
+            'p50': float(np.percentile(latencies, 50)),
+            'p95': float(np.percentile(latencies, 95)),
+            'p99': float(np.percentile(latencies, 99)),
+            'max': float(latencies.max())
+        },
+        'db_queries_per_request': float(np.mean([sample[2] for sample in samples])),
+        'db_time_ms_per_request': float(np.mean([sample[3] for sample in samples]) * 1000.0),
+        'response_bytes_mean': float(np.mean([sample[4] for sample in samples]))
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def print_results(results: dict):
+    print(f"\n{'endpoint':<10} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'errors':>7}")
+    print("-" * 66)
+    for endpoint, stats in results['endpoints'].items():
+        latency = stats['latency_ms']
+        print(f"{endpoint:<10} {stats['requests_per_second']:>9.1f} {latency['p50']:>9.2f} "
+              f"{latency['p95']:>9.2f} {latency['p99']:>9.2f} "
+              f"{stats['db_queries_per_request']:>8.1f} {stats['errors']:>7}")
+
+
+def print_comparison(results: dict, baseline: dict):
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"\nChange vs {baseline.get('timestamp', 'baseline')} ({baseline.get('git_commit', '?')[:8]}):")
+    print(f"{'endpoint':<10} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>9}")
+    print("-" * 58)
+    for endpoint, stats in results['endpoints'].items():
+        old = baseline.get('endpoints', {}).get(endpoint)
+        if not old:
+            continue
+        print(f"{endpoint:<10} "
+              f"{change(stats['requests_per_second'], old['requests_per_second']):>9} "
+              f"{change(stats['latency_ms']['p50'], old['latency_ms']['p50']):>9} "
+              f"{change(stats['latency_ms']['p95'], old['latency_ms']['p95']):>9} "
+              f"{change(stats['latency_ms']['p99'], old['latency_ms']['p99']):>9} "
+              f"{change(stats['db_queries_per_request'], old['db_queries_per_request']):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the API hot paths')
+    parser.add_argument('--db-host', default='localhost')
+    parser.add_argument('--db-port', type=int, default=3306)
+    parser.add_argument('--db-user', default='root')
+    parser.add_argument('--db-password', default='')
+    parser.add_argument('--db-name', default='heritage_bench', help='Database to (re)create for the run')
+    parser.add_argument('--users', type=int, default=20, help='Synthetic users')
+    parser.add_argument('--folders', type=int, default=5, help='Folders per user')
+    parser.add_argument('--models', type=int, default=10, help='Models per folder')
+    parser.add_argument('--model-grid', type=int, default=40, help='Synthetic OBJ grid size (faces ~ 2 * n^2)')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='Comma-separated subset of ' + ', '.join(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per endpoint')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=str, help='Result JSON path (default: bench_api_<timestamp>.json)')
+    parser.add_argument('--compare', type=str, help='Earlier result JSON to compare against')
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    output_file = os.path.abspath(args.output or f"bench_api_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+
+    # The app creates uploads/ and cache/ relative to the working directory
+    workdir = tempfile.mkdtemp(prefix='heritage_bench_')
+    os.chdir(workdir)
+    import app as api
+
+    print(f"Creating benchmark database '{args.db_name}'...")
+    db_config = create_database(args)
+    api.DB_CONFIG.clear()
+    api.DB_CONFIG.update(db_config)
+
+    upload_dir = os.path.join(workdir, 'uploads', 'bench')
+    os.makedirs(upload_dir, exist_ok=True)
+    fixtures = seed_database(api, db_config, args, upload_dir)
+    print(f"Seeded {fixtures['counts']['users']} users, {fixtures['counts']['folders']} folders, "
+          f"{fixtures['counts']['models']} models (workdir: {workdir})")
+
+    counter = QueryCounter()
+    db.add_query_observer(counter)
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key != 'db_password'},
+        'dataset': fixtures['counts'],
+        'endpoints': {}
+    }
+
+    for endpoint in endpoints:
+        print(f"Benchmarking {endpoint} ({args.requests} requests, concurrency {args.concurrency})...")
+        results['endpoints'][endpoint] = run_endpoint(api, endpoint, fixtures, args, counter)
+
+    db.remove_query_observer(counter)
+    api.job_pool.shutdown(wait=False)
+
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print_results(results)
+    if baseline:
+        print_comparison(results, baseline)
+    print(f"\nResults saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Mesh processing micro-benchmarks
+
+Generates synthetic meshes (icospheres and noisy, holed "scans") at a range
+of face counts, writes them in every upload format and times, per loader
+backend: parse, conversion to the canonical trimesh form, metric
+computation (area, volume, bounds, edges, watertightness) and
+serialization. Each case runs in a fresh process so peak memory (max RSS
+above the post-import baseline) is attributable to that case alone.
+
+Results are written as JSON and CSV, and appended to a history CSV so
+trends across commits can be plotted.
+
+Usage:
+  python benchmark_mesh.py                                   # 10k-1M faces, all formats
+  python benchmark_mesh.py --sizes 10000,100000,1000000,10000000
+  python benchmark_mesh.py --formats ply,stl --backends trimesh --repeat 5
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows: fall back to tracemalloc (Python/NumPy heap only)
+    resource = None
+
+# Format name -> (file extension, trimesh export kwargs)
+FORMATS = {
+    'obj': ('obj', {'file_type': 'obj'}),
+    'ply': ('ply', {'file_type': 'ply', 'encoding': 'binary'}),
+    'ply_ascii': ('ply', {'file_type': 'ply', 'encoding': 'ascii'}),
+    'stl': ('stl', {'file_type': 'stl'}),
+    'glb': ('glb', {'file_type': 'glb'})
+}
+SHAPES = ['icosphere', 'scan']
+DEFAULT_SIZES = [10000, 100000, 1000000]
+HISTORY_FILE = 'mesh_bench_history.csv'
+
+
+# --- Synthetic meshes -------------------------------------------------------
+
+def icosphere(target_faces: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Icosphere with the subdivision level closest to target_faces"""
+    import trimesh
+
+    level = int(round(np.log(max(target_faces, 20) / 20.0) / np.log(4.0)))
+    mesh = trimesh.creation.icosphere(subdivisions=max(0, level))
+    return np.asarray(mesh.vertices), np.asarray(mesh.faces)
+
+
+def noisy_scan(target_faces: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scan-like UV sphere: radial noise, a lumpy low-frequency shape and ~1%
+    of faces dropped as holes, with about target_faces triangles.
+    """
+    rng = np.random.default_rng(seed)
+    rows = max(4, int(np.sqrt(target_faces / 4.0)))
+    cols = max(4, int(target_faces / (2.0 * rows)))
+
+    theta = np.linspace(0.05, np.pi - 0.05, rows)[:, None]
+    phi = np.linspace(0.0, 2.0 * np.pi, cols, endpoint=False)[None, :]
+    radius = (1.0 + 0.15 * np.sin(3 * phi) * np.sin(2 * theta)
+              + rng.normal(0.0, 0.004, (rows, cols)))
+    vertices = np.stack((radius * np.sin(theta) * np.cos(phi),
+                         radius * np.cos(theta) + 0 * phi,
+                         radius * np.sin(theta) * np.sin(phi)), axis=-1).reshape(-1, 3)
+
+    index = np.arange(rows * cols).reshape(rows, cols)
+    right = np.roll(index, -1, axis=1)
+    a, b = index[:-1].ravel(), right[:-1].ravel()
+    c, d = index[1:].ravel(), right[1:].ravel()
+    faces = np.vstack((np.column_stack((a, c, b)), np.column_stack((b, c, d))))
+    faces = faces[rng.random(len(faces)) > 0.01]
+    return vertices, faces
+
+
+def generate_file(shape: str, size: int, fmt: str, data_dir: str) -> str:
+    """Write (or reuse) the synthetic mesh file for one case"""
+    import trimesh
+
+    extension, export_kwargs = FORMATS[fmt]
+    path = os.path.join(data_dir, f"{shape}_{size}_{fmt}.{extension}")
+    if os.path.exists(path):
+        return path
+
+    vertices, faces = icosphere(size) if shape == 'icosphere' else noisy_scan(size)
+    mesh = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        data = mesh.export(**export_kwargs)
+        f.write(data.encode('utf-8') if isinstance(data, str) else data)
+    os.replace(tmp_path, path)
+    return path
+
+
+# --- Backends ---------------------------------------------------------------
+
+def parse_trimesh(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    import trimesh
+
+    mesh = trimesh.load(path, force='mesh', process=False)
+    return mesh.vertices, mesh.faces
+
+
+def parse_open3d(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    import open3d as o3d
+
+    mesh = o3d.io.read_triangle_mesh(path)
+    return np.asarray(mesh.vertices), np.asarray(mesh.triangles)
+
+
+def parse_native(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    from native_parsers import read_native
+
+    arrays = read_native(path)
+    return arrays if arrays is not None else parse_trimesh(path)
+
+
+def serialize_trimesh(vertices: np.ndarray, faces: np.ndarray, fmt: str, out_dir: str) -> int:
+    import trimesh
+
+    extension, export_kwargs = FORMATS[fmt]
+    data = trimesh.Trimesh(vertices=vertices, faces=faces, process=False).export(**export_kwargs)
+    return len(data)
+
+
+def serialize_open3d(vertices: np.ndarray, faces: np.ndarray, fmt: str, out_dir: str) -> int:
+    import open3d as o3d
+
+    extension, _ = FORMATS[fmt]
+    mesh = o3d.geometry.TriangleMesh(o3d.utility.Vector3dVector(vertices),
+                                     o3d.utility.Vector3iVector(faces))
+    path = os.path.join(out_dir, f"serialize_{os.getpid()}.{extension}")
+    o3d.io.write_triangle_mesh(path, mesh, write_ascii=(fmt == 'ply_ascii'))
+    size = os.path.getsize(path)
+    os.remove(path)
+    return size
+
+
+# Backend name -> (module it needs, parse, serialize)
+BACKENDS: Dict[str, Tuple[str, Callable, Callable]] = {
+    'trimesh': ('trimesh', parse_trimesh, serialize_trimesh),
+    'open3d': ('open3d', parse_open3d, serialize_open3d),
+    # Binary PLY/STL fast path; other files fall back to trimesh
+    'native': ('native_parsers', parse_native, serialize_trimesh)
+}
+
+
+def available_backends() -> List[str]:
+    names = []
+    for name, (module, _, _) in BACKENDS.items():
+        try:
+            __import__(module)
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+
+# --- Measurement ------------------------------------------------------------
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return usage / 1024 / 1024 if platform.system() == 'Darwin' else usage / 1024
+
+
+def compute_metrics(mesh) -> Dict[str, float]:
+    """The geometry metrics the evaluator and ingest rely on"""
+    return {
+        'area': float(mesh.area),
+        'volume': float(mesh.volume),
+        'extent': float(np.linalg.norm(mesh.extents)),
+        'edges': int(len(mesh.edges_unique)),
+        'watertight': bool(mesh.is_watertight)
+    }
+
+
+def run_case(case: Dict, queue):
+    """Child process entry point: time every stage for one case"""
+    try:
+        import trimesh
+
+        if resource is None:
+            import tracemalloc
+            tracemalloc.start()
+
+        _, parse, serialize = BACKENDS[case['backend']]
+        baseline_mb = peak_rss_mb()
+        timings = {'parse': [], 'convert': [], 'metrics': [], 'serialize': []}
+        counts = {}
+
+        for _ in range(case['repeat']):
+            start = time.perf_counter()
+            vertices, faces = parse(case['path'])
+            timings['parse'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            mesh = trimesh.Trimesh(vertices=np.asarray(vertices), faces=np.asarray(faces))
+            timings['convert'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            compute_metrics(mesh)
+            timings['metrics'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            serialized_bytes = serialize(mesh.vertices, mesh.faces, case['format'], case['out_dir'])
+            timings['serialize'].append(time.perf_counter() - start)
+
+            counts = {'vertices': int(len(mesh.vertices)), 'faces': int(len(mesh.faces)),
+                      'serialized_bytes': int(serialized_bytes)}
+            del vertices, faces, mesh
+
+        result = {stage + '_s': float(np.median(values)) for stage, values in timings.items()}
+        result.update(counts)
+        result['peak_memory_mb'] = max(0.0, peak_rss_mb() - baseline_mb)
+        queue.put(result)
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def measure(case: Dict, timeout: float) -> Dict:
+    """Run one case in a fresh process and collect its result"""
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=run_case, args=(case, queue))
+    process.start()
+    try:
+        result = queue.get(timeout=timeout)
+    except Exception:
+        result = {'error': 'timeout or crash'}
+    process.join(5)
+    if process.is_alive():
+        process.kill()
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def parse_list(value: str, allowed=None) -> List[str]:
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    if allowed is not None:
+        unknown = set(items) - set(allowed)
+        if unknown:
+            raise argparse.ArgumentTypeError(f"unknown values: {', '.join(sorted(unknown))}")
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark mesh I/O and geometry by format and size')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='Comma-separated target face counts')
+    parser.add_argument('--shapes', default=','.join(SHAPES), type=lambda v: parse_list(v, SHAPES))
+    parser.add_argument('--formats', default=','.join(FORMATS), type=lambda v: parse_list(v, FORMATS))
+    parser.add_argument('--backends', default=None, type=lambda v: parse_list(v, BACKENDS),
+                        help='Default: every installed backend')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case (median is reported)')
+    parser.add_argument('--timeout', type=float, default=1800.0, help='Seconds per case')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'heritage_mesh_bench'),
+                        help='Where generated meshes are cached between runs')
+    parser.add_argument('--output-dir', default='bench_results')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in parse_list(args.sizes)]
+    backends = args.backends or available_backends()
+    os.makedirs(args.data_dir, exist_ok=True)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    timestamp = datetime.now()
+    commit = git_commit()
+    rows = []
+
+    for shape in args.shapes:
+        for size in sizes:
+            for fmt in args.formats:
+                print(f"Generating {shape} ~{size} faces as {fmt}...")
+                path = generate_file(shape, size, fmt, args.data_dir)
+                for backend in backends:
+                    case = {'path': path, 'format': fmt, 'backend': backend,
+                            'repeat': args.repeat, 'out_dir': args.data_dir}
+                    result = measure(case, args.timeout)
+                    row = {
+                        'timestamp': timestamp.isoformat(),
+                        'git_commit': commit,
+                        'shape': shape,
+                        'target_faces': size,
+                        'format': fmt,
+                        'backend': backend,
+                        'file_bytes': os.path.getsize(path)
+                    }
+                    row.update(result)
+                    rows.append(row)
+
+                    if 'error' in result:
+                        print(f"  {backend:<8} error: {result['error']}")
+                    else:
+                        print(f"  {backend:<8} parse {result['parse_s']:.3f}s  convert {result['convert_s']:.3f}s  "
+                              f"metrics {result['metrics_s']:.3f}s  serialize {result['serialize_s']:.3f}s  "
+                              f"peak {result['peak_memory_mb']:.0f} MB")
+
+    stem = os.path.join(args.output_dir, f"mesh_bench_{timestamp.strftime('%Y%m%d_%H%M%S')}")
+    with open(stem + '.json', 'w') as f:
+        json.dump({
+            'timestamp': timestamp.isoformat(),
+            'git_commit': commit,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'results': rows
+        }, f, indent=2)
+
+    fields = ['timestamp', 'git_commit', 'shape', 'target_faces', 'format', 'backend', 'file_bytes',
+              'vertices', 'faces', 'parse_s', 'convert_s', 'metrics_s', 'serialize_s',
+              'serialized_bytes', 'peak_memory_mb', 'error']
+    with open(stem + '.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    history_path = os.path.join(args.output_dir, HISTORY_FILE)
+    new_history = not os.path.exists(history_path)
+    with open(history_path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        if new_history:
+            writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"\nResults saved to: {stem}.json, {stem}.csv (history: {history_path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Database access helpers
+
+Every connection is opened through connect(), which wraps cursors in
+InstrumentedCursor. When query observers are registered, each statement
+is timed and reported to them as observer(statement, params, seconds);
+benchmarks and metrics hook in here without touching the route code.
+
+A statement log (see querylog.py) additionally receives each completed
+statement with its execute + fetch time and the rows it returned. It is
+reported as soon as the result is exhausted (immediately for statements
+without a result set), otherwise when the cursor runs its next statement,
+is closed or is garbage collected.
+"""
+
+import time
+import mysql.connector
+from typing import Callable, Dict, List
+
+QueryObserver = Callable[[str, object, float], None]
+
+_observers: List[QueryObserver] = []
+_statement_log = None
+
+
+def add_query_observer(observer: QueryObserver):
+    """Register a callable invoked after every statement"""
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_query_observer(observer: QueryObserver):
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def set_statement_log(log):
+    """Install (or with None, remove) the log receiving completed statements"""
+    global _statement_log
+    _statement_log = log
+
+
+class InstrumentedCursor:
+    """Cursor proxy that reports executed statements to query observers"""
+
+    __slots__ = ('_cursor', '_pending')
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        # [statement, params, seconds, rows] awaiting the statement log
+        self._pending = None
+
+    def _report_pending(self):
+        pending = self._pending
+        self._pending = None
+        log = _statement_log
+        if pending is not None and log is not None:
+            log.record(*pending)
+
+    def _timed(self, method, operation, params, args, kwargs):
+        if self._pending is not None:
+            self._report_pending()
+        if not _observers and _statement_log is None:
+            return method(operation, params, *args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return method(operation, params, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            for observer in list(_observers):
+                observer(operation, params, elapsed)
+            if _statement_log is not None:
+                rows = 0 if self._cursor.with_rows else max(0, self._cursor.rowcount)
+                self._pending = [operation, params, elapsed, rows]
+                if not self._cursor.with_rows:
+                    self._report_pending()
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        return self._timed(self._cursor.execute, operation, params, args, kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return self._timed(self._cursor.executemany, operation, seq_params, args, kwargs)
+
+    def _fetch(self, method, *args):
+        pending = self._pending
+        if pending is None:
+            return method(*args)
+
+        start = time.perf_counter()
+        result = method(*args)
+        pending[2] += time.perf_counter() - start
+        if result is not None:
+            pending[3] += len(result) if isinstance(result, list) else 1
+        return result
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is None and self._pending is not None:
+            self._report_pending()
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._fetch(self._cursor.fetchmany, *args)
+        if not rows and self._pending is not None:
+            self._report_pending()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        if self._pending is not None:
+            self._report_pending()
+        return rows
+
+    def close(self):
+        if self._pending is not None:
+            self._report_pending()
+        return self._cursor.close()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __del__(self):
+        # Cursors dropped without close() on error paths still get logged
+        if self._pending is not None:
+            try:
+                self._report_pending()
+            except Exception:
+                pass
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are InstrumentedCursor instances"""
+
+    __slots__ = ('_conn',)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def connect(db_config: Dict[str, str]) -> InstrumentedConnection:
+    """Open a MySQL connection; raises mysql.connector.Error on failure"""
+    return InstrumentedConnection(mysql.connector.connect(**db_config))
@@ -0,0 +1,70 @@
+"""
+Content-addressed storage for files derived from uploaded models
+
+Derivatives (thumbnails, preview sprites, ...) are keyed by the SHA-256 of
+the source file, so identical uploads share them and a URL never changes
+meaning. That makes them safe to serve with long-lived cache headers.
+"""
+
+import os
+import re
+import hashlib
+from typing import Optional
+
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+# Marker written next to a derivative that could not be built, so it is not retried
+FAILED_SUFFIX = '.failed'
+
+
+def file_content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_valid_hash(content_hash: str) -> bool:
+    return bool(content_hash) and HASH_PATTERN.match(content_hash) is not None
+
+
+class DerivativeStore:
+    def __init__(self, cache_dir: str):
+        self.root = os.path.join(cache_dir, 'derivatives')
+        os.makedirs(self.root, exist_ok=True)
+
+    def directory(self, content_hash: str) -> str:
+        """Directory holding every derivative of one source file"""
+        return os.path.join(self.root, content_hash[:2], content_hash)
+
+    def path(self, content_hash: str, name: str) -> Optional[str]:
+        """Path of a derivative, or None if the hash or name is malformed"""
+        if not is_valid_hash(content_hash) or not NAME_PATTERN.match(name) or name.startswith('.'):
+            return None
+        return os.path.join(self.directory(content_hash), name)
+
+    def exists(self, content_hash: str, name: str) -> bool:
+        path = self.path(content_hash, name)
+        return path is not None and os.path.exists(path)
+
+    def write_bytes(self, content_hash: str, name: str, data: bytes) -> str:
+        """Atomically write a derivative and return its path"""
+        path = self.path(content_hash, name)
+        if path is None:
+            raise ValueError(f"Invalid derivative key: {content_hash}/{name}")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def mark_failed(self, content_hash: str, name: str, reason: str) -> None:
+        """Record that a derivative cannot be built; delete the marker to retry"""
+        self.write_bytes(content_hash, name + FAILED_SUFFIX, reason.encode('utf-8', errors='replace'))
+
+    def has_failed(self, content_hash: str, name: str) -> bool:
+        return self.exists(content_hash, name + FAILED_SUFFIX)
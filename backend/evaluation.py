@@ -8,6 +8,14 @@ import mysql.connector
 from typing import Dict, List, Tuple, Any
 import trimesh
 import open3d as o3d
+from segmentation import segment_mesh
+from mesh_utils import is_out_of_core
+from out_of_core import parse_to_chunks
+from native_parsers import read_native
+from mesh_validation import STATS_FIELDS, format_stats
+
+# Meshes too large for memory are evaluated on a decimated proxy of this size
+PROXY_MAX_FACES = 2000000
 
 class ModelEvaluator:
     def __init__(self, db_config: Dict[str, str]):
@@ -25,7 +33,12 @@ class ModelEvaluator:
     def load_model_from_file(self, file_path: str) -> Any:
         """Load 3D model from file"""
         try:
-            if file_path.endswith('.obj'):
+            if is_out_of_core(file_path):
+                return self.load_model_out_of_core(file_path)
+            arrays = read_native(file_path)
+            if arrays is not None:
+                mesh = trimesh.Trimesh(vertices=arrays[0], faces=arrays[1], process=False)
+            elif file_path.endswith('.obj'):
                 mesh = trimesh.load(file_path)
             elif file_path.endswith('.ply'):
                 mesh = o3d.io.read_triangle_mesh(file_path)
@@ -43,6 +56,15 @@ class ModelEvaluator:
             print(f"Error loading model {file_path}: {e}")
             return None
     
+    def load_model_out_of_core(self, file_path: str) -> Any:
+        """Stream-parse a model too large for memory into a decimated proxy with exact stats"""
+        with parse_to_chunks(file_path) as chunked:
+            stats = chunked.stats()
+            vertices, faces = chunked.decimate_to_budget(PROXY_MAX_FACES)
+        mesh = trimesh.Trimesh(vertices=vertices, faces=faces)
+        mesh.metadata['streamed_stats'] = stats
+        return mesh
+    
     def evaluate_geometric_accuracy(self, mesh: Any) -> float:
         """
         Evaluate geometric accuracy of triangle mesh
@@ -136,8 +158,16 @@ class ModelEvaluator:
         # Feature scores (based on mesh properties)
         triangle_count = len(mesh.faces) if hasattr(mesh, 'faces') else 0
         
-        # Selection capability (based on triangle accessibility)
-        selection_score = min(1.0, triangle_count / 1000) if triangle_count > 0 else 0
+        # Part decomposition drives selection and explosion
+        segment_count = 0
+        if triangle_count > 0:
+            try:
+                segment_count = segment_mesh(mesh.vertices, mesh.faces)['segment_count']
+            except Exception as e:
+                print(f"Error segmenting mesh: {e}")
+        
+        # Selection capability (distinct parts a user can pick)
+        selection_score = min(1.0, segment_count / 5) if segment_count > 0 else 0
         
         # Rotation capability (always available)
         rotation_score = 1.0
@@ -145,8 +175,8 @@ class ModelEvaluator:
         # Zoom capability (always available)
         zoom_score = 1.0
         
-        # Explosion capability (based on face separation possibility)
-        explosion_score = min(1.0, triangle_count / 500) if triangle_count > 0 else 0
+        # Explosion capability (needs more than one part to separate)
+        explosion_score = min(1.0, (segment_count - 1) / 3) if segment_count > 1 else 0
         
         # Coloring capability (based on face count)
         coloring_score = min(1.0, triangle_count / 100) if triangle_count > 0 else 0
@@ -256,10 +286,12 @@ class ModelEvaluator:
         
         try:
             cursor = conn.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT m.*, f.name as folder_name 
+            stats_columns = ''.join(f", ms.{field}" for field in STATS_FIELDS)
+            cursor.execute(f"""
+                SELECT m.*, f.name as folder_name, ms.validated_at{stats_columns}
                 FROM models m 
                 JOIN folders f ON m.folder_id = f.id 
+                LEFT JOIN model_stats ms ON ms.model_id = m.id
                 WHERE m.id = %s
             """, (model_id,))
             
@@ -269,6 +301,8 @@ class ModelEvaluator:
             
             if not model_info:
                 return {"error": "Model not found"}
+            stats = {field: model_info.pop(field) for field in STATS_FIELDS + ['validated_at']}
+            stats = format_stats(stats) if stats['validated_at'] else None
             
             file_path = model_info['file_path']
             if not os.path.exists(file_path):
@@ -304,6 +338,27 @@ class ModelEvaluator:
                 }
             }
             
+            streamed = mesh.metadata.get('streamed_stats') if hasattr(mesh, 'metadata') else None
+            if streamed:
+                # Exact figures for the full mesh; watertightness/volume come from the proxy
+                results['mesh_properties'].update({
+                    'vertex_count': streamed['vertex_count'],
+                    'face_count': streamed['face_count'],
+                    'surface_area': streamed['surface_area'],
+                    'bbox': streamed['bbox'],
+                    'out_of_core': True
+                })
+            
+            if stats and not stats['error']:
+                # Saved at ingest from the full (validated) mesh; the loaded one may be a proxy
+                results['mesh_properties'].update({
+                    field: stats[field] for field in ('vertex_count', 'face_count', 'surface_area', 'bbox',
+                                                      'component_count', 'out_of_core')
+                })
+                for field in ('is_watertight', 'volume'):
+                    if stats[field] is not None:
+                        results['mesh_properties'][field] = stats[field]
+            
             return results
             
         except Exception as e:
@@ -0,0 +1,111 @@
+"""
+Offloaded file responses for model downloads
+
+Modes (FILE_OFFLOAD_MODE):
+
+- python      Flask send_file, bytes pumped by the worker (default)
+- x-accel     empty response with X-Accel-Redirect; nginx streams the file
+              from an `internal` location mapped onto the upload root
+- x-sendfile  empty response with X-Sendfile (Apache mod_xsendfile, lighttpd)
+- sendfile    pure-Python fallback: the body is the server's
+              wsgi.file_wrapper, which gunicorn turns into os.sendfile();
+              single-range requests are answered here with the file
+              pre-seeked; multi-range requests get the whole file
+
+Example nginx location for x-accel with the default prefix:
+
+    location /protected-uploads/ {
+        internal;
+        alias /srv/heritage/backend/uploads/;
+    }
+"""
+
+import os
+from typing import Optional
+from urllib.parse import quote
+
+from flask import Response, request, send_file
+
+MODES = ('python', 'x-accel', 'x-sendfile', 'sendfile')
+BLOCK_SIZE = 256 * 1024
+
+
+def _read_range(f, length: int):
+    """Yield `length` bytes from the file's current position, then close it"""
+    try:
+        while length > 0:
+            chunk = f.read(min(BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+class FileOffload:
+    def __init__(self, mode: str = 'python', root: str = 'uploads',
+                 internal_prefix: str = '/protected-uploads/'):
+        if mode not in MODES:
+            raise ValueError(f"FILE_OFFLOAD_MODE must be one of: {', '.join(MODES)}")
+        self.mode = mode
+        self.root = os.path.abspath(root)
+        self.internal_prefix = internal_prefix.rstrip('/') + '/'
+
+    def _disposition(self, download_name: str) -> str:
+        return f"inline; filename*=UTF-8''{quote(download_name)}"
+
+    def _internal_uri(self, path: str) -> Optional[str]:
+        relative = os.path.relpath(os.path.abspath(path), self.root)
+        if relative.startswith('..'):
+            return None
+        return self.internal_prefix + quote(relative.replace(os.sep, '/'))
+
+    def send(self, path: str, mimetype: str, download_name: str) -> Response:
+        """Response for a file the caller has already authorized"""
+        if self.mode == 'x-accel':
+            uri = self._internal_uri(path)
+            if uri is not None:
+                response = Response(mimetype=mimetype)
+                response.headers['X-Accel-Redirect'] = uri
+                response.headers['Content-Disposition'] = self._disposition(download_name)
+                return response
+        elif self.mode == 'x-sendfile':
+            response = Response(mimetype=mimetype)
+            response.headers['X-Sendfile'] = os.path.abspath(path)
+            response.headers['Content-Disposition'] = self._disposition(download_name)
+            return response
+        elif self.mode == 'sendfile':
+            return self._sendfile(path, mimetype, download_name)
+
+        return send_file(path, mimetype=mimetype, as_attachment=False, download_name=download_name)
+
+    def _sendfile(self, path: str, mimetype: str, download_name: str) -> Response:
+        size = os.path.getsize(path)
+        start, length, status = 0, size, 200
+
+        ranges = request.range
+        # Multipart byteranges are not supported; several ranges get the whole file (RFC 9110 14.2)
+        if ranges is not None and ranges.units == 'bytes' and len(ranges.ranges) == 1:
+            bounds = ranges.range_for_length(size)
+            if bounds is None:
+                return Response(status=416, headers={'Content-Range': f"bytes */{size}"})
+            start, stop = bounds
+            length, status = stop - start, 206
+
+        f = open(path, 'rb')
+        f.seek(start)
+        file_wrapper = request.environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None and start + length == size:
+            # gunicorn sends Content-Length bytes from the current offset with os.sendfile()
+            body = file_wrapper(f, BLOCK_SIZE)
+        else:
+            body = _read_range(f, length)
+
+        response = Response(body, status=status, mimetype=mimetype, direct_passthrough=True)
+        response.headers['Content-Length'] = str(length)
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.headers['Content-Disposition'] = self._disposition(download_name)
+        if status == 206:
+            response.headers['Content-Range'] = f"bytes {start}-{start + length - 1}/{size}"
+        return response
@@ -0,0 +1,59 @@
+"""
+Background job pool for mesh processing
+
+Derivative builds (thumbnails, segmentation, ...) are queued here so the
+request that triggered them can return immediately. Jobs are keyed, so
+asking for the same derivative twice while it is queued runs it once.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict
+
+
+class JobPool:
+    def __init__(self, max_workers: int = 2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='heritage-job')
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) unless a job with the same key is pending"""
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None and not future.done():
+                return future
+
+            future = self.executor.submit(self._run, key, fn, args, kwargs)
+            self._pending[key] = future
+
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def is_pending(self, key: str) -> bool:
+        """True while a job with this key is queued or running"""
+        with self._lock:
+            future = self._pending.get(key)
+            return future is not None and not future.done()
+
+    def pending_count(self) -> int:
+        """Number of queued or running jobs"""
+        with self._lock:
+            return sum(1 for future in self._pending.values() if not future.done())
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and optionally wait for running ones"""
+        self.executor.shutdown(wait=wait)
+
+    def _run(self, key: str, fn: Callable, args, kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            print(f"Background job {key} failed: {e}")
+            raise
+
+    def _forget(self, key: str, future: Future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
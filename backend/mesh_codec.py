@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Quantization and compression codec for mesh derivatives
+
+Encoding stages:
+
+1. Triangles are reordered for the GPU post-transform vertex cache
+   (Tipsify, Sander et al. 2007) and vertices renumbered in first-use
+   order, which also keeps index deltas small.
+2. Positions are quantized to POSITION_BITS (14-16) per axis over a
+   bounding box, delta-coded along the vertex order and zigzagged.
+3. Normals, if given, are octahedrally mapped to two NORMAL_BITS values.
+4. Indices are coded as `high-water mark - index`, where 0 means "next new
+   vertex": after step 1 most codes fit in one byte.
+5. Each stream is byte-shuffled and deflated (LZ77 + Huffman).
+
+Error bounds (per vertex, guaranteed by construction):
+
+- position: at most half a quantization step per axis,
+  extent / (2 * (2^bits - 1)); 3.1e-5 of the box extent at 14 bits,
+  7.6e-6 at 16 bits (plus float32 rounding of the result);
+- normal: octahedral quantization at 10 bits is within 0.24 degrees,
+  at 8 bits within 0.94, at 12 bits within 0.06 (see normal_error_bound).
+
+Triangle winding and the triangle set are preserved exactly; only their
+order and the vertex numbering change.
+
+Layout: HEADER, then for positions, indices and (optional) normals a
+uint32 byte length followed by the deflated stream.
+
+Usage (size/time report for a model at several bit depths):
+  python mesh_codec.py model.ply --bits 14,15,16
+"""
+
+import argparse
+import json
+import struct
+import time
+import zlib
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b'QMC1'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBBII3f3f')
+LENGTH = struct.Struct('<I')
+
+POSITION_BITS = 14
+NORMAL_BITS = 10
+CACHE_SIZE = 16
+COMPRESS_LEVEL = 9
+
+
+# --- Triangle order ---------------------------------------------------------
+
+def tipsify(faces: np.ndarray, vertex_count: int, cache_size: int = CACHE_SIZE) -> np.ndarray:
+    """Triangle order that reuses recently transformed vertices (returns a permutation)"""
+    faces = np.asarray(faces, dtype=np.int64)
+    if len(faces) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    corners = faces.ravel()
+    live = np.bincount(corners, minlength=vertex_count).tolist()
+    offsets = np.concatenate(([0], np.cumsum(live))).tolist()
+    adjacency = (np.argsort(corners, kind='stable') // 3).tolist()
+    triangles = faces.tolist()
+
+    timestamps = [0] * vertex_count
+    emitted = [False] * len(triangles)
+    dead_end = []
+    order = []
+    clock = cache_size + 1
+    cursor = 0
+    fanning = int(corners[0])
+
+    while fanning >= 0:
+        candidates = []
+        for t in adjacency[offsets[fanning]:offsets[fanning + 1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            order.append(t)
+            for v in triangles[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if clock - timestamps[v] > cache_size:
+                    timestamps[v] = clock
+                    clock += 1
+
+        # Prefer a vertex still in cache whose remaining fan will not evict it
+        fanning, best = -1, -1
+        for v in candidates:
+            if live[v] > 0:
+                age = clock - timestamps[v]
+                priority = age if age + 2 * live[v] <= cache_size else 0
+                if priority > best:
+                    fanning, best = v, priority
+
+        if fanning < 0:
+            while dead_end:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    fanning = v
+                    break
+        if fanning < 0:
+            while cursor < vertex_count and live[cursor] == 0:
+                cursor += 1
+            if cursor < vertex_count:
+                fanning = cursor
+
+    return np.asarray(order, dtype=np.int64)
+
+
+def triangle_order(faces: np.ndarray, vertex_count: int,
+                   segments: Optional[Sequence[int]] = None) -> np.ndarray:
+    """Tipsify permutation, applied within each segment of consecutive faces"""
+    if segments is None:
+        return tipsify(faces, vertex_count)
+    order, start = [], 0
+    for count in segments:
+        order.append(start + tipsify(faces[start:start + count], vertex_count))
+        start += count
+    order.append(np.arange(start, len(faces)))
+    return np.concatenate(order)
+
+
+def first_use_order(faces: np.ndarray, vertex_count: int) -> np.ndarray:
+    """Old vertex id for each new id, numbering vertices by first reference"""
+    corners = np.asarray(faces, dtype=np.int64).ravel()
+    first = np.full(vertex_count, len(corners), dtype=np.int64)
+    np.minimum.at(first, corners[::-1], np.arange(len(corners))[::-1])
+    return np.argsort(first, kind='stable')
+
+
+def acmr(faces: np.ndarray, cache_size: int = CACHE_SIZE) -> float:
+    """Average FIFO cache misses per triangle (0.5 is ideal for large meshes)"""
+    if len(faces) == 0:
+        return 0.0
+    cache, members, misses = [], set(), 0
+    for v in np.asarray(faces).ravel().tolist():
+        if v not in members:
+            misses += 1
+            cache.append(v)
+            members.add(v)
+            if len(cache) > cache_size:
+                members.discard(cache.pop(0))
+    return misses / len(faces)
+
+
+# --- Streams ----------------------------------------------------------------
+
+def _zigzag16(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int16)
+    return ((values.astype(np.int32) << 1) ^ (values.astype(np.int32) >> 15)).astype(np.uint16)
+
+
+def _unzigzag16(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int32)
+    return ((values >> 1) ^ -(values & 1)).astype(np.int16)
+
+
+def _pack(array: np.ndarray) -> bytes:
+    """Byte-shuffle (all low bytes, then the next plane...) and deflate"""
+    array = np.ascontiguousarray(array)
+    planes = array.view(np.uint8).reshape(-1, array.dtype.itemsize).T
+    return zlib.compress(np.ascontiguousarray(planes).tobytes(), COMPRESS_LEVEL)
+
+
+def _unpack(data: bytes, dtype: str, count: int) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    planes = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(dtype.itemsize, count)
+    return np.ascontiguousarray(planes.T).view(dtype).ravel()
+
+
+def octahedral_encode(normals: np.ndarray, bits: int) -> np.ndarray:
+    normals = np.asarray(normals, dtype=np.float64)
+    norm = np.abs(normals).sum(axis=1, keepdims=True)
+    p = np.divide(normals, norm, out=np.zeros_like(normals), where=norm > 0)
+    xy = p[:, :2].copy()
+    lower = p[:, 2] < 0
+    sign = np.where(xy[lower] >= 0, 1.0, -1.0)
+    xy[lower] = (1.0 - np.abs(xy[lower][:, ::-1])) * sign
+    top = (1 << bits) - 1
+    return np.round((xy + 1.0) * 0.5 * top).astype(np.uint16)
+
+
+def octahedral_decode(encoded: np.ndarray, bits: int) -> np.ndarray:
+    top = (1 << bits) - 1
+    xy = encoded.astype(np.float64) / top * 2.0 - 1.0
+    z = 1.0 - np.abs(xy).sum(axis=1)
+    t = np.clip(-z, 0.0, None)[:, None]
+    xy = xy - np.where(xy >= 0, t, -t)
+    normals = np.column_stack((xy, z))
+    return (normals / np.linalg.norm(normals, axis=1, keepdims=True)).astype(np.float32)
+
+
+def normal_error_bound(bits: int, samples: int = 200000) -> float:
+    """Measured worst-case angular error in degrees for octahedral normals"""
+    rng = np.random.default_rng(0)
+    normals = rng.normal(size=(samples, 3))
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    decoded = octahedral_decode(octahedral_encode(normals, bits), bits).astype(np.float64)
+    cosines = np.clip((normals * decoded).sum(axis=1), -1.0, 1.0)
+    return float(np.degrees(np.arccos(cosines).max()))
+
+
+# --- Codec ------------------------------------------------------------------
+
+def encode(vertices: np.ndarray, faces: np.ndarray, normals: Optional[np.ndarray] = None,
+           position_bits: int = POSITION_BITS, normal_bits: int = NORMAL_BITS,
+           bounds: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+           segments: Optional[Sequence[int]] = None) -> bytes:
+    """
+    Encode a triangle mesh. Pass `bounds` (lo, hi) to quantize several
+    chunks on one grid so vertices they share decode identically, and
+    `segments` (consecutive face counts) to keep triangles within their
+    ranges while reordering.
+    """
+    if not 1 <= position_bits <= 16 or not 0 <= normal_bits <= 16:
+        raise ValueError("position_bits must be 1-16 and normal_bits 0-16")
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+
+    faces = faces[triangle_order(faces, len(vertices), segments)]
+    order = first_use_order(faces, len(vertices))
+    renumber = np.empty(len(vertices), dtype=np.int64)
+    renumber[order] = np.arange(len(vertices))
+    faces = renumber[faces]
+    vertices = vertices[order]
+
+    if bounds is None:
+        lo = vertices.min(axis=0) if len(vertices) else np.zeros(3)
+        hi = vertices.max(axis=0) if len(vertices) else np.zeros(3)
+    else:
+        lo, hi = (np.asarray(b, dtype=np.float64) for b in bounds)
+    top = (1 << position_bits) - 1
+    scale = np.maximum(hi - lo, 1e-12) / top
+    quantized = np.clip(np.round((vertices - lo) / scale), 0, top).astype(np.uint16)
+    deltas = np.diff(quantized.astype(np.int32), axis=0, prepend=0)
+    positions = _zigzag16(deltas)
+
+    corners = faces.ravel()
+    high_water = np.concatenate(([0], np.maximum.accumulate(corners)[:-1] + 1)) if len(corners) else corners
+    codes = (high_water - corners).astype(np.uint32)
+    index_width = 1 if not len(codes) or codes.max() <= 0xFF else 2 if codes.max() <= 0xFFFF else 4
+    codes = codes.astype(f'<u{index_width}')
+
+    has_normals = normals is not None and normal_bits > 0
+    header = HEADER.pack(MAGIC, VERSION, position_bits, normal_bits if has_normals else 0, index_width,
+                         len(vertices), len(faces), *lo.astype(np.float32), *scale.astype(np.float32))
+    parts = [header]
+    streams = [_pack(positions.astype('<u2')), _pack(codes)]
+    if has_normals:
+        streams.append(_pack(octahedral_encode(np.asarray(normals)[order], normal_bits).astype('<u2')))
+    for stream in streams:
+        parts.append(LENGTH.pack(len(stream)))
+        parts.append(stream)
+    return b''.join(parts)
+
+
+def decode(data: bytes) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """(positions float32, faces uint32, normals float32 or None)"""
+    magic, version, position_bits, normal_bits, index_width, vertex_count, face_count, *box = \
+        HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a QMC1 mesh")
+    lo = np.array(box[:3], dtype=np.float32)
+    scale = np.array(box[3:], dtype=np.float32)
+
+    offset = HEADER.size
+    streams = []
+    while offset < len(data):
+        (length,) = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        streams.append(data[offset:offset + length])
+        offset += length
+
+    deltas = _unzigzag16(_unpack(streams[0], '<u2', vertex_count * 3)).reshape(-1, 3)
+    quantized = np.cumsum(deltas.astype(np.uint16), axis=0, dtype=np.uint16)
+    positions = lo + quantized.astype(np.float32) * scale
+
+    codes = _unpack(streams[1], f'<u{index_width}', face_count * 3).astype(np.int64)
+    # A zero code introduces the next vertex; others count back from that mark
+    high_water = np.cumsum(codes == 0) - (codes == 0)
+    faces = (high_water - codes).astype(np.uint32).reshape(-1, 3)
+
+    normals = None
+    if normal_bits and len(streams) > 2:
+        normals = octahedral_decode(_unpack(streams[2], '<u2', vertex_count * 2).reshape(-1, 2), normal_bits)
+    return positions.astype(np.float32), faces, normals
+
+
+def position_error_bound(bounds: Tuple[np.ndarray, np.ndarray], bits: int) -> float:
+    """Largest per-axis position error for a box and bit depth"""
+    lo, hi = (np.asarray(b, dtype=np.float64) for b in bounds)
+    return float((hi - lo).max() / (2 * ((1 << bits) - 1)))
+
+
+def codec_report(vertices: np.ndarray, faces: np.ndarray, normals: Optional[np.ndarray] = None,
+                 position_bits: int = POSITION_BITS, normal_bits: int = NORMAL_BITS) -> Dict[str, Any]:
+    """Size, time and measured error of encoding one mesh against raw float32/uint32 buffers"""
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    raw_bytes = vertices.shape[0] * 12 + faces.size * 4 + (vertices.shape[0] * 12 if normals is not None else 0)
+
+    start = time.perf_counter()
+    data = encode(vertices, faces, normals, position_bits, normal_bits)
+    encode_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    positions, decoded_faces, decoded_normals = decode(data)
+    decode_ms = (time.perf_counter() - start) * 1000
+
+    # Compare each decoded triangle's corners with the matching original triangle
+    reordered = faces[triangle_order(faces, len(vertices))]
+    error = float(np.abs(positions[decoded_faces] - vertices[reordered]).max()) if len(faces) else 0.0
+    bounds = (vertices.min(axis=0), vertices.max(axis=0))
+    report = {
+        'vertices': int(len(vertices)),
+        'faces': int(len(faces)),
+        'position_bits': position_bits,
+        'raw_bytes': int(raw_bytes),
+        'encoded_bytes': len(data),
+        'ratio': round(raw_bytes / max(len(data), 1), 2),
+        'bits_per_triangle': round(len(data) * 8 / max(len(faces), 1), 2),
+        'encode_ms': round(encode_ms, 2),
+        'decode_ms': round(decode_ms, 2),
+        'acmr_before': round(acmr(faces), 3),
+        'acmr_after': round(acmr(decoded_faces), 3),
+        'max_position_error': error,
+        'position_error_bound': position_error_bound(bounds, position_bits)
+    }
+    if decoded_normals is not None:
+        original = np.asarray(normals, dtype=np.float64)[reordered.ravel()]
+        cosines = np.clip((original * decoded_normals[decoded_faces.ravel()]).sum(axis=1), -1.0, 1.0)
+        report['normal_bits'] = normal_bits
+        report['max_normal_error_deg'] = float(np.degrees(np.arccos(cosines).max()))
+    return report
+
+
+def main():
+    from mesh_utils import load_mesh_arrays, vertex_normals
+
+    parser = argparse.ArgumentParser(description='Report codec size, time and error for a model')
+    parser.add_argument('path')
+    parser.add_argument('--bits', default='14,16', help='Comma-separated position bit depths')
+    parser.add_argument('--normal-bits', type=int, default=NORMAL_BITS, help='0 to leave normals out')
+    args = parser.parse_args()
+
+    vertices, faces = load_mesh_arrays(args.path)
+    normals = vertex_normals(vertices, faces) if args.normal_bits else None
+    for bits in (int(b) for b in args.bits.split(',')):
+        print(json.dumps(codec_report(vertices, faces, normals, bits, args.normal_bits)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Shared mesh arrays handed between processing stages without copies
+
+A MeshHandle is a directory of raw array files on a RAM-backed
+filesystem (/dev/shm where available, MESH_HANDLE_ROOT to override) that
+every process maps with np.memmap. Stages pass a small picklable
+descriptor instead of the arrays themselves. This only pays off across a
+process boundary (e.g. obj_parser's worker pool); threads in one process
+should share the arrays directly, since a handle is a second copy in RAM.
+
+Lifetime is reference counted in a `refcount` file updated under an
+exclusive flock:
+
+    handle = MeshHandle.from_arrays({'vertices': v, 'faces': f})
+    descriptor = handle.share()          # +1 on behalf of the receiver
+    pool.submit(stage, descriptor)
+    handle.release()                     # -1 for the creator
+
+    def stage(descriptor):
+        with MeshHandle.open(descriptor) as mesh:   # adopts the shared reference
+            work(mesh['vertices'], mesh['faces'])   # -1 on exit
+
+The files are deleted when the count reaches zero. Arrays taken from a
+handle stay valid after that (the mapping outlives the file), so a caller
+can release early and keep using its views. A handle that is garbage
+collected without release() releases itself; sweep_stale() removes
+directories left by processes that crashed.
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: handles are then only safe within one process
+    fcntl = None
+
+ROOT = os.environ.get('MESH_HANDLE_ROOT') or (
+    '/dev/shm/heritage_meshes' if os.path.isdir('/dev/shm') else
+    os.path.join(tempfile.gettempdir(), 'heritage_meshes'))
+REFCOUNT = struct.Struct('<q')
+STALE_SECONDS = 6 * 3600
+
+_local_lock = threading.Lock()
+
+
+def _adjust(directory: str, delta: int) -> int:
+    """Add delta to a handle's reference count; returns the new count"""
+    path = os.path.join(directory, 'refcount')
+    with _local_lock, open(path, 'r+b') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        count = REFCOUNT.unpack(f.read(REFCOUNT.size))[0] + delta
+        f.seek(0)
+        f.write(REFCOUNT.pack(count))
+        f.flush()
+    return count
+
+
+def _release(directory: str) -> None:
+    try:
+        if _adjust(directory, -1) <= 0:
+            shutil.rmtree(directory, ignore_errors=True)
+    except FileNotFoundError:
+        pass
+
+
+class MeshHandle:
+    def __init__(self, directory: str, arrays: Dict[str, Tuple[str, Tuple[int, ...]]]):
+        self.directory = directory
+        self.arrays = arrays
+        self._views: Dict[str, np.ndarray] = {}
+        self._finalizer = weakref.finalize(self, _release, directory)
+
+    @classmethod
+    def create(cls, specs: Dict[str, Tuple[Tuple[int, ...], Any]], root: Optional[str] = None) -> 'MeshHandle':
+        """New zero-filled arrays {name: (shape, dtype)} with a reference count of 1"""
+        directory = os.path.join(root or ROOT, uuid.uuid4().hex)
+        os.makedirs(directory)
+        arrays = {}
+        for name, (shape, dtype) in specs.items():
+            dtype = np.dtype(dtype)
+            with open(os.path.join(directory, f"{name}.bin"), 'wb') as f:
+                f.truncate(int(np.prod(shape)) * dtype.itemsize)
+            arrays[name] = (dtype.str, tuple(int(n) for n in shape))
+        with open(os.path.join(directory, 'refcount'), 'wb') as f:
+            f.write(REFCOUNT.pack(1))
+        return cls(directory, arrays)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], root: Optional[str] = None) -> 'MeshHandle':
+        arrays = {name: np.asarray(array) for name, array in arrays.items()}
+        handle = cls.create({name: (array.shape, array.dtype) for name, array in arrays.items()}, root)
+        for name, array in arrays.items():
+            handle[name][...] = array
+        return handle
+
+    @classmethod
+    def open(cls, descriptor: Dict[str, Any]) -> 'MeshHandle':
+        """Handle for a descriptor from share(); takes over the reference it carries"""
+        arrays = {name: (dtype, tuple(shape)) for name, (dtype, shape) in descriptor['arrays'].items()}
+        return cls(descriptor['directory'], arrays)
+
+    def share(self) -> Dict[str, Any]:
+        """Picklable descriptor holding one new reference for the receiver to open()"""
+        _adjust(self.directory, 1)
+        return {'directory': self.directory, 'arrays': dict(self.arrays)}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        view = self._views.get(name)
+        if view is None:
+            dtype, shape = self.arrays[name]
+            if int(np.prod(shape)) == 0:
+                view = np.zeros(shape, dtype=dtype)
+            else:
+                view = np.asarray(np.memmap(os.path.join(self.directory, f"{name}.bin"),
+                                            dtype=dtype, mode='r+', shape=shape))
+            self._views[name] = view
+        return view
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.arrays
+
+    def release(self) -> None:
+        """Drop this handle's reference (idempotent); views already taken stay valid"""
+        self._views = {}
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def sweep_stale(root: Optional[str] = None, max_age: float = STALE_SECONDS) -> int:
+    """Remove handle directories untouched for max_age seconds; returns how many"""
+    root = root or ROOT
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    cutoff = time.time() - max_age
+    for name in os.listdir(root):
+        refcount = os.path.join(root, name, 'refcount')
+        try:
+            if os.path.getmtime(refcount) < cutoff:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
@@ -0,0 +1,113 @@
+"""
+Shared mesh loading and level-of-detail helpers
+"""
+
+import os
+
+import numpy as np
+from typing import Tuple
+
+# Files at least this large are processed out of core (see out_of_core.py)
+OUT_OF_CORE_BYTES = int(os.environ.get('MESH_OUT_OF_CORE_BYTES', 512 * 1024 * 1024))
+
+
+def load_mesh_arrays(file_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Load a model as (vertices, faces) arrays with duplicate vertices merged"""
+    from native_parsers import read_native, weld
+
+    arrays = read_native(file_path)
+    if arrays is not None:
+        vertices, faces = arrays
+        # Indexed PLYs share vertices already; only triangle soups need welding
+        if len(faces) and len(vertices) >= 3 * len(faces):
+            return weld(np.ascontiguousarray(vertices[faces].reshape(-1, 3), dtype=np.float32) + np.float32(0.0))
+        return vertices, faces
+
+    import trimesh
+
+    mesh = trimesh.load(file_path, force='mesh')
+    return np.asarray(mesh.vertices), np.asarray(mesh.faces)
+
+
+def is_out_of_core(file_path: str) -> bool:
+    return os.path.getsize(file_path) >= OUT_OF_CORE_BYTES
+
+
+def load_mesh_bounded(file_path: str, max_faces: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Like load_mesh_arrays, but files over OUT_OF_CORE_BYTES are stream-parsed
+    and decimated to max_faces instead of being materialized in full.
+    """
+    if is_out_of_core(file_path):
+        from out_of_core import parse_to_chunks
+
+        with parse_to_chunks(file_path) as mesh:
+            return mesh.decimate_to_budget(max_faces)
+    return load_mesh_arrays(file_path)
+
+
+def decimate_vertex_clustering(vertices: np.ndarray, faces: np.ndarray,
+                               grid_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Simplify a mesh by snapping vertices to a grid_size^3 lattice over its
+    bounding box. Each occupied cell becomes one vertex at the mean of its
+    members; collapsed and duplicate faces are dropped.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    if len(faces) == 0:
+        return vertices, faces
+
+    lo = vertices.min(axis=0)
+    extent = np.maximum(vertices.max(axis=0) - lo, 1e-12)
+    cells = np.minimum(((vertices - lo) / extent * grid_size).astype(np.int64), grid_size - 1)
+    cell_keys = (cells[:, 0] * grid_size + cells[:, 1]) * grid_size + cells[:, 2]
+
+    unique_keys, cluster = np.unique(cell_keys, return_inverse=True)
+    cluster = cluster.ravel()
+    counts = np.bincount(cluster, minlength=len(unique_keys)).astype(np.float64)
+    new_vertices = np.column_stack([
+        np.bincount(cluster, weights=vertices[:, axis], minlength=len(unique_keys)) / counts
+        for axis in range(3)
+    ])
+
+    new_faces = cluster[faces]
+    valid = ((new_faces[:, 0] != new_faces[:, 1]) &
+             (new_faces[:, 1] != new_faces[:, 2]) &
+             (new_faces[:, 2] != new_faces[:, 0]))
+    new_faces = new_faces[valid]
+
+    # Remove faces that collapsed onto the same three cells
+    _, first = np.unique(np.sort(new_faces, axis=1), axis=0, return_index=True)
+    return new_vertices, new_faces[np.sort(first)]
+
+
+def decimate_to_budget(vertices: np.ndarray, faces: np.ndarray,
+                       max_faces: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Vertex-cluster a mesh with shrinking grids until it fits max_faces"""
+    if len(faces) <= max_faces:
+        return np.asarray(vertices), np.asarray(faces)
+
+    # A surface over a g^3 grid keeps roughly 2 * g^2 triangles
+    grid_size = max(2, int(np.sqrt(max_faces / 2.0)))
+    while True:
+        new_vertices, new_faces = decimate_vertex_clustering(vertices, faces, grid_size)
+        if len(new_faces) <= max_faces or grid_size <= 2:
+            return new_vertices, new_faces
+        grid_size = max(2, int(grid_size * 0.8))
+
+
+def vertex_normals(vertices: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """Area-weighted unit vertex normals (zero for unreferenced vertices)"""
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    tri = vertices[faces]
+    # Unnormalized cross products weight each face by its area
+    face_normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    corners = faces.ravel()
+    normals = np.column_stack([
+        np.bincount(corners, weights=np.repeat(face_normals[:, axis], 3), minlength=len(vertices))
+        for axis in range(3)
+    ])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
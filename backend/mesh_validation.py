@@ -0,0 +1,390 @@
+"""
+Ingest validation, repair and mesh statistics
+
+Every upload goes through check() once, before any derivative is built:
+
+1. faces referencing missing or non-finite (NaN/inf) vertices are dropped;
+2. bit-identical vertices are merged;
+3. degenerate faces (repeated corner or zero area) and duplicate faces
+   (same corners in any order) are removed, unreferenced vertices dropped;
+4. winding is made consistent across every manifold edge and closed
+   components are flipped to face outwards, which fixes the normals.
+
+Statistics are computed on the cleaned mesh in the same pass and saved to
+the model_stats table (plus models.triangle_count), so listings and the
+evaluator read them instead of reparsing the file. The uploaded file is
+never modified; with repair disabled the derivative stages get the mesh
+as parsed and the statistics still describe the cleaned geometry. A file
+that cannot be loaded gets a row with `error` set, so it is reported
+rather than re-validated on every request.
+"""
+
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+import mysql.connector
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import breadth_first_order, connected_components
+
+import db
+from mesh_utils import is_out_of_core, load_mesh_arrays
+
+ISSUE_FIELDS = ['nan_vertices', 'invalid_faces', 'duplicate_vertices', 'degenerate_faces',
+                'duplicate_faces', 'unreferenced_vertices', 'flipped_faces']
+STATS_FIELDS = ['vertex_count', 'face_count', 'bbox_min_x', 'bbox_min_y', 'bbox_min_z',
+                'bbox_max_x', 'bbox_max_y', 'bbox_max_z', 'surface_area', 'volume',
+                'is_watertight', 'is_winding_consistent', 'component_count',
+                'boundary_edges', 'non_manifold_edges'] + ISSUE_FIELDS + ['repaired', 'out_of_core', 'error']
+ERROR_LENGTH = 500
+
+
+def drop_invalid(vertices: np.ndarray, faces: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int, int]:
+    """
+    Remove non-finite vertices and faces that reference them or missing
+    vertices: (vertices, faces, dropped faces, dropped vertices)
+    """
+    finite = np.isfinite(vertices).all(axis=1)
+    valid = ((faces >= 0) & (faces < len(vertices))).all(axis=1)
+    valid[valid] = finite[faces[valid]].all(axis=1)
+    remap = np.cumsum(finite) - 1
+    return vertices[finite], remap[faces[valid]], int((~valid).sum()), int((~finite).sum())
+
+
+def merge_duplicate_vertices(vertices: np.ndarray, faces: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Merge bit-identical vertices: (vertices, faces, merged count)"""
+    # + 0.0 turns -0.0 into 0.0 so both merge
+    unique, inverse = np.unique(vertices + 0.0, axis=0, return_inverse=True)
+    return unique, inverse.reshape(-1)[faces], len(vertices) - len(unique)
+
+
+def remove_bad_faces(vertices: np.ndarray, faces: np.ndarray) -> Tuple[np.ndarray, int, int]:
+    """Drop degenerate and duplicate faces: (faces, degenerate, duplicates)"""
+    repeated = (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 0] == faces[:, 2])
+    tris = vertices[faces]
+    zero_area = ~np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0]).any(axis=1)
+    degenerate = repeated | zero_area
+    faces = faces[~degenerate]
+
+    # A face and its flipped twin are duplicates too; the first one is kept
+    _, first = np.unique(np.sort(faces, axis=1), axis=0, return_index=True)
+    first.sort()
+    return faces[first], int(degenerate.sum()), len(faces) - len(first)
+
+
+def drop_unreferenced(vertices: np.ndarray, faces: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+    used = np.zeros(len(vertices), dtype=bool)
+    used[faces] = True
+    remap = np.cumsum(used) - 1
+    return vertices[used], remap[faces], int((~used).sum())
+
+
+def edge_table(faces: np.ndarray, vertex_count: int) -> Dict[str, np.ndarray]:
+    """
+    Directed face edges grouped by undirected edge: sort order, group start
+    of every sorted edge, edge use counts and whether each edge runs from
+    its lower to its higher vertex.
+    """
+    directed = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    low, high = directed.min(axis=1), directed.max(axis=1)
+    keys = low * np.int64(vertex_count) + high
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    is_new = np.empty(len(order), dtype=bool)
+    is_new[:1] = True
+    is_new[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    starts = np.flatnonzero(is_new)
+    counts = np.diff(np.append(starts, len(order)))
+    return {
+        'order': order,
+        'starts': starts,
+        'counts': counts,
+        'forward': directed[:, 0] < directed[:, 1]
+    }
+
+
+def _manifold_pairs(edges: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Face pairs across edges used exactly twice, and whether they disagree on winding"""
+    starts = edges['starts'][edges['counts'] == 2]
+    first, second = edges['order'][starts], edges['order'][starts + 1]
+    pairs = np.column_stack((first // 3, second // 3))
+    # Consistent neighbours traverse their shared edge in opposite directions
+    conflict = edges['forward'][first] == edges['forward'][second]
+    return pairs, conflict
+
+
+def _face_graph(pairs: np.ndarray, face_count: int) -> sparse.csr_matrix:
+    ones = np.ones(len(pairs), dtype=np.int8)
+    return sparse.coo_matrix((ones, (pairs[:, 0], pairs[:, 1])), shape=(face_count, face_count)).tocsr()
+
+
+def orient_faces(vertices: np.ndarray, faces: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Make winding consistent across manifold edges and point closed
+    components outwards: (faces, number flipped). Non-orientable patches
+    (e.g. a Moebius strip) are left with their remaining conflicts.
+    """
+    face_count = len(faces)
+    if face_count == 0:
+        return faces, 0
+    pairs, conflict = _manifold_pairs(edge_table(faces, len(vertices)))
+
+    # A virtual root joined to one face of every component lets a single BFS
+    # reach all faces; each face then flips if the parity of conflicts on its
+    # tree path to the root is odd.
+    component_count, labels = connected_components(_face_graph(pairs, face_count), directed=False)
+    _, seeds = np.unique(labels, return_index=True)
+    root = face_count
+    tree_pairs = np.concatenate((pairs, np.column_stack((np.full(len(seeds), root), seeds))))
+    tree_conflict = np.concatenate((conflict, np.zeros(len(seeds), dtype=bool)))
+    _, parent = breadth_first_order(_face_graph(tree_pairs, face_count + 1), root, directed=False,
+                                    return_predecessors=True)
+    parent[root] = root
+
+    # Conflict flag of the (face, parent) tree edge, looked up by sorted pair key
+    n = np.int64(face_count + 1)
+    lookup = np.minimum(tree_pairs[:, 0], tree_pairs[:, 1]) * n + np.maximum(tree_pairs[:, 0], tree_pairs[:, 1])
+    by_key = np.argsort(lookup)
+    nodes = np.arange(face_count + 1)
+    wanted = np.minimum(nodes, parent) * n + np.maximum(nodes, parent)
+    hit = by_key[np.minimum(np.searchsorted(lookup[by_key], wanted), len(by_key) - 1)]
+    parity = tree_conflict[hit] & (nodes != root)
+
+    # Pointer jumping: parity to the root in O(log depth) vectorized steps
+    while (parent != root).any():
+        parity = parity ^ parity[parent]
+        parent = parent[parent]
+    flip = parity[:face_count]
+
+    faces = faces.copy()
+    faces[flip] = faces[flip][:, ::-1]
+
+    # Closed components with negative signed volume are inside out
+    edges = edge_table(faces, len(vertices))
+    open_edges = edges['order'][edges['starts'][edges['counts'] != 2]] // 3
+    closed = np.ones(component_count, dtype=bool)
+    closed[labels[open_edges]] = False
+    volume = np.bincount(labels, weights=signed_volumes(vertices, faces), minlength=component_count)
+    inverted = (closed & (volume < 0))[labels]
+    faces[inverted] = faces[inverted][:, ::-1]
+
+    return faces, int((flip ^ inverted).sum())
+
+
+def signed_volumes(vertices: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """Signed volume of the tetrahedron each face spans with the origin"""
+    tris = vertices[faces]
+    return np.einsum('ij,ij->i', tris[:, 0], np.cross(tris[:, 1], tris[:, 2])) / 6.0
+
+
+def mesh_statistics(vertices: np.ndarray, faces: np.ndarray) -> Dict[str, Any]:
+    """Counts, bounding box, area, volume and topology of a cleaned mesh"""
+    stats = {'vertex_count': len(vertices), 'face_count': len(faces)}
+    if len(faces) == 0:
+        stats.update({'bbox': None, 'surface_area': 0.0, 'volume': None, 'is_watertight': False,
+                      'is_winding_consistent': True, 'component_count': 0,
+                      'boundary_edges': 0, 'non_manifold_edges': 0})
+        return stats
+
+    tris = vertices[faces]
+    area = 0.5 * np.linalg.norm(np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0]), axis=1).sum()
+
+    edges = edge_table(faces, len(vertices))
+    boundary = int((edges['counts'] == 1).sum())
+    non_manifold = int((edges['counts'] > 2).sum())
+    _, conflict = _manifold_pairs(edges)
+    consistent = not conflict.any()
+    watertight = boundary == 0 and non_manifold == 0 and consistent
+
+    # Components over shared vertices, like trimesh's split(only_watertight=False)
+    corners = faces[:, [0, 1, 1, 2]].reshape(-1, 2)
+    graph = sparse.coo_matrix((np.ones(len(corners), dtype=np.int8), (corners[:, 0], corners[:, 1])),
+                              shape=(len(vertices), len(vertices)))
+    component_count, labels = connected_components(graph, directed=False)
+    labels = labels[faces[:, 0]]
+
+    # Volume enclosed by the closed components (an open scan has none)
+    open_faces = edges['order'][edges['starts'][edges['counts'] != 2]] // 3
+    closed = np.ones(component_count, dtype=bool)
+    closed[labels[open_faces]] = False
+    volumes = np.bincount(labels, weights=signed_volumes(vertices, faces), minlength=component_count)
+
+    stats.update({
+        'bbox': [vertices.min(axis=0).tolist(), vertices.max(axis=0).tolist()],
+        'surface_area': float(area),
+        'volume': float(np.abs(volumes[closed]).sum()) if closed.any() else None,
+        'is_watertight': watertight,
+        'is_winding_consistent': consistent,
+        'component_count': int(component_count),
+        'boundary_edges': boundary,
+        'non_manifold_edges': non_manifold
+    })
+    return stats
+
+
+def failure_report(error: Exception) -> Dict[str, Any]:
+    return {'vertex_count': 0, 'face_count': 0, 'repaired': False, 'out_of_core': False,
+            'error': (str(error) or type(error).__name__)[:ERROR_LENGTH]}
+
+
+def _row(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a report into model_stats columns"""
+    row = {field: stats.get(field) for field in STATS_FIELDS}
+    bbox = stats.get('bbox')
+    if bbox:
+        for i, axis in enumerate('xyz'):
+            row[f'bbox_min_{axis}'] = bbox[0][i]
+            row[f'bbox_max_{axis}'] = bbox[1][i]
+    row.update(stats.get('issues', {}))
+    for field in ('is_watertight', 'is_winding_consistent', 'repaired', 'out_of_core'):
+        if row[field] is not None:
+            row[field] = bool(row[field])
+    return row
+
+
+class MeshValidator:
+    def __init__(self, db_config: Dict[str, str], repair: bool = True):
+        self.db_config = db_config
+        self.repair = repair
+
+    def get_db_connection(self):
+        """Get database connection"""
+        try:
+            return db.connect(self.db_config)
+        except mysql.connector.Error as err:
+            print(f"Database connection error: {err}")
+            return None
+
+    def check(self, vertices: np.ndarray, faces: np.ndarray) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+        """
+        Validate a mesh: (vertices, faces, report). The arrays returned are
+        the repaired mesh when repair is enabled and the input otherwise.
+        Raises ValueError if no valid face is left.
+        """
+        original = (vertices, faces)
+        clean_vertices = np.asarray(vertices, dtype=np.float64)
+        clean_faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+
+        issues = {}
+        clean_vertices, clean_faces, issues['invalid_faces'], issues['nan_vertices'] = \
+            drop_invalid(clean_vertices, clean_faces)
+        clean_vertices, clean_faces, issues['duplicate_vertices'] = \
+            merge_duplicate_vertices(clean_vertices, clean_faces)
+        clean_faces, issues['degenerate_faces'], issues['duplicate_faces'] = \
+            remove_bad_faces(clean_vertices, clean_faces)
+        clean_vertices, clean_faces, issues['unreferenced_vertices'] = \
+            drop_unreferenced(clean_vertices, clean_faces)
+        clean_faces, issues['flipped_faces'] = orient_faces(clean_vertices, clean_faces)
+
+        if len(clean_faces) == 0:
+            raise ValueError("Mesh has no valid faces")
+
+        report = mesh_statistics(clean_vertices, clean_faces)
+        report['issues'] = issues
+        report['repaired'] = self.repair
+        report['out_of_core'] = False
+        if self.repair:
+            return clean_vertices, clean_faces, report
+        return original[0], original[1], report
+
+    def stream_stats(self, file_path: str) -> Dict[str, Any]:
+        """Counts, bounding box and area of a file too large to load; topology is left unknown"""
+        from out_of_core import parse_to_chunks
+
+        with parse_to_chunks(file_path) as chunked:
+            report = chunked.stats()
+        report.update({'volume': None, 'is_watertight': None, 'is_winding_consistent': None,
+                       'component_count': None, 'boundary_edges': None, 'non_manifold_edges': None,
+                       'repaired': False, 'out_of_core': True})
+        return report
+
+    def validate_model(self, model_id: int, file_path: str,
+                       mesh: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Optional[Dict[str, Any]]:
+        """Check a stored model and save its statistics; returns the report"""
+        try:
+            if mesh is None and is_out_of_core(file_path):
+                report = self.stream_stats(file_path)
+            else:
+                vertices, faces = mesh if mesh is not None else load_mesh_arrays(file_path)
+                report = self.check(vertices, faces)[2]
+        except Exception as e:
+            print(f"Error validating model {file_path}: {e}")
+            report = failure_report(e)
+        self.save(model_id, report)
+        return report
+
+    def save_failure(self, model_id: int, error: Exception) -> bool:
+        """Record that a model could not be loaded or validated"""
+        return self.save(model_id, failure_report(error))
+
+    def save(self, model_id: int, report: Dict[str, Any]) -> bool:
+        """Write model_stats and models.triangle_count in one transaction"""
+        conn = self.get_db_connection()
+        if not conn:
+            return False
+
+        row = _row(report)
+        columns = ', '.join(['model_id'] + STATS_FIELDS)
+        placeholders = ', '.join(['%s'] * (len(STATS_FIELDS) + 1))
+        updates = ', '.join(f"{field} = VALUES({field})" for field in STATS_FIELDS)
+        try:
+            conn.start_transaction()
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                INSERT INTO model_stats ({columns}) VALUES ({placeholders})
+                ON DUPLICATE KEY UPDATE {updates}, validated_at = CURRENT_TIMESTAMP
+            """, [model_id] + [row[field] for field in STATS_FIELDS])
+            cursor.execute("UPDATE models SET triangle_count = %s WHERE id = %s",
+                           (report['face_count'], model_id))
+            conn.commit()
+            cursor.close()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error saving model stats: {e}")
+            try:
+                conn.rollback()
+                conn.close()
+            except mysql.connector.Error:
+                pass
+            return False
+
+    def get_stats(self, model_id: int) -> Optional[Dict[str, Any]]:
+        """Saved statistics for a model, or None if it has not been validated"""
+        conn = self.get_db_connection()
+        if not conn:
+            return None
+
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"""
+                SELECT {', '.join(STATS_FIELDS)}, validated_at
+                FROM model_stats
+                WHERE model_id = %s
+            """, (model_id,))
+            row = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            return format_stats(row) if row else None
+
+        except Exception as e:
+            print(f"Error reading model stats: {e}")
+            return None
+
+
+def format_stats(row: Dict[str, Any]) -> Dict[str, Any]:
+    """model_stats columns (as selected by STATS_FIELDS) back into report form"""
+    stats = {}
+    for field, value in row.items():
+        if isinstance(value, Decimal):
+            value = float(value)
+        stats[field] = value
+    corners = [stats.pop(f'bbox_{end}_{axis}', None) for end in ('min', 'max') for axis in 'xyz']
+    stats['bbox'] = [corners[:3], corners[3:]] if None not in corners else None
+    stats['issues'] = {field: stats.pop(field, None) for field in ISSUE_FIELDS}
+    for field in ('is_watertight', 'is_winding_consistent', 'repaired', 'out_of_core'):
+        if stats.get(field) is not None:
+            stats[field] = bool(stats[field])
+    if stats.get('validated_at') is not None:
+        stats['validated_at'] = stats['validated_at'].isoformat()
+    return stats
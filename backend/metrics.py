@@ -0,0 +1,295 @@
+"""
+Prometheus-style request metrics
+
+Small in-process counters, gauges and histograms rendered in the
+Prometheus text exposition format, plus Flask hooks that record per-route
+latency, in-flight requests, request/response sizes, DB queries (via the
+db query observer), upload throughput and file-serving bytes.
+
+Recording is a dict lookup, a bisect and an uncontended lock per metric,
+which keeps the per-request overhead to a few microseconds.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from flask import Response, request
+
+import db
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+THROUGHPUT_BUCKETS = (65536, 262144, 1048576, 4194304, 16777216, 67108864, 268435456)
+
+# Endpoint (view function) names whose bodies are model uploads / file downloads
+UPLOAD_ENDPOINTS = {'upload_model'}
+FILE_ENDPOINTS = {'download_model', 'get_derivative', 'get_model_segments', 'get_signed_file'}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+                                for labels, value in items]
+
+
+class Gauge(Counter):
+    metric_type = 'gauge'
+
+    def dec(self, labels: Tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def set(self, labels: Tuple = (), value: float = 0):
+        with self._lock:
+            self._values[labels] = value
+
+
+class CallbackGauge(_Metric):
+    """Gauge whose value is read from a callable at scrape time"""
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, help_text: str, callback: Callable[[], float]):
+        super().__init__(name, help_text)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception as e:
+            print(f"Error reading gauge {self.name}: {e}")
+            return self.header()
+        return self.header() + [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, labels: Tuple, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(entry[0]), entry[1], entry[2]) for labels, entry in self._values.items()]
+
+        lines = self.header()
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class RequestMetrics:
+    """Registry of API metrics plus the Flask hooks that feed it"""
+
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+        self._local = threading.local()
+
+        self.requests_total = self.add(Counter(
+            'http_requests_total', 'HTTP requests by route and status',
+            ('method', 'route', 'status')))
+        self.request_duration = self.add(Histogram(
+            'http_request_duration_seconds', 'Request latency by route',
+            ('method', 'route'), LATENCY_BUCKETS))
+        self.in_flight = self.add(Gauge(
+            'http_requests_in_flight', 'Requests currently being handled'))
+        self.request_size = self.add(Counter(
+            'http_request_bytes_total', 'Request body bytes received by route', ('route',)))
+        self.response_size = self.add(Histogram(
+            'http_response_size_bytes', 'Response body size by route', ('route',), SIZE_BUCKETS))
+        self.request_queries = self.add(Histogram(
+            'http_request_db_queries', 'DB statements executed per request', ('route',), QUERY_COUNT_BUCKETS))
+        self.db_queries = self.add(Counter(
+            'db_queries_total', 'DB statements executed by verb', ('verb',)))
+        self.db_duration = self.add(Histogram(
+            'db_query_duration_seconds', 'DB statement latency by verb', ('verb',), LATENCY_BUCKETS))
+        self.upload_bytes = self.add(Counter(
+            'upload_bytes_total', 'Model upload bytes received'))
+        self.upload_throughput = self.add(Histogram(
+            'upload_throughput_bytes_per_second', 'Per-request model upload throughput',
+            buckets=THROUGHPUT_BUCKETS))
+        self.file_bytes = self.add(Counter(
+            'file_served_bytes_total', 'Bytes served from file endpoints', ('route',)))
+
+    def add(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_callback_gauge(self, name: str, help_text: str, callback: Callable[[], float]):
+        self.add(CallbackGauge(name, help_text, callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    # --- hooks -------------------------------------------------------------
+
+    def _observe_query(self, statement, params, seconds):
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN'
+        labels = (verb,)
+        self.db_queries.inc(labels)
+        self.db_duration.observe(labels, seconds)
+
+        current = getattr(self._local, 'current', None)
+        if current is not None:
+            current['queries'] += 1
+
+    def _before_request(self):
+        self._local.current = {'start': time.perf_counter(), 'queries': 0, 'streamed': False}
+        self.in_flight.inc()
+
+    def _after_request(self, response):
+        current = getattr(self._local, 'current', None)
+        if current is None or current['streamed']:
+            return response
+
+        # Resolve the context-local proxy once; each proxied access costs ~1us
+        req = request._get_current_object()
+        rule = req.url_rule
+        content_length = req.environ.get('CONTENT_LENGTH')
+        current.update(
+            method=req.method,
+            route=rule.rule if rule is not None else 'unmatched',
+            endpoint=req.endpoint,
+            status=response.status_code,
+            request_bytes=int(content_length) if content_length and content_length.isdigit() else 0,
+            # File responses carry Content-Length without being read here
+            response_bytes=response.content_length
+        )
+
+        if not response.is_streamed:
+            self._local.current = None
+            self._record(current)
+            return response
+
+        # The body (and any queries it runs) executes after this hook; record once the
+        # server has sent it and closed the response
+        current['streamed'] = True
+        if current['response_bytes'] is None and not response.direct_passthrough:
+            current['response_bytes'] = 0
+            response.response = self._count_bytes(response.response, current)
+        response.call_on_close(lambda: self._close_streamed(current))
+        return response
+
+    def _count_bytes(self, body, current):
+        try:
+            for chunk in body:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                current['response_bytes'] += len(chunk)
+                yield chunk
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+    def _close_streamed(self, current):
+        if getattr(self._local, 'current', None) is current:
+            self._local.current = None
+        self._record(current)
+
+    def _record(self, current):
+        self.in_flight.dec()
+        elapsed = time.perf_counter() - current['start']
+        method, route, endpoint = current['method'], current['route'], current['endpoint']
+        status = current['status']
+
+        self.requests_total.inc((method, route, str(status)))
+        self.request_duration.observe((method, route), elapsed)
+        self.request_queries.observe((route,), current['queries'])
+
+        request_bytes = current['request_bytes']
+        if request_bytes:
+            self.request_size.inc((route,), request_bytes)
+            if endpoint in UPLOAD_ENDPOINTS:
+                self.upload_bytes.inc((), request_bytes)
+                if elapsed > 0:
+                    self.upload_throughput.observe((), request_bytes / elapsed)
+
+        response_bytes = current['response_bytes']
+        if response_bytes is not None:
+            self.response_size.observe((route,), response_bytes)
+            if endpoint in FILE_ENDPOINTS and status in (200, 206):
+                self.file_bytes.inc((route,), response_bytes)
+
+    def _teardown_request(self, exc):
+        # Requests that raised skip after_request; keep the gauge honest
+        current = getattr(self._local, 'current', None)
+        if current is not None and not current['streamed']:
+            self._local.current = None
+            self.in_flight.dec()
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        db.add_query_observer(self._observe_query)
+
+        app.add_url_rule('/metrics', 'metrics', lambda: Response(
+            self.render(), mimetype='text/plain; version=0.0.4; charset=utf-8'))
+        app.request_metrics = self
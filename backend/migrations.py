@@ -0,0 +1,166 @@
+"""
+Idempotent upgrades for databases created from an older schema
+
+schema_with_auth.sql only uses CREATE TABLE IF NOT EXISTS, so a column or
+index added to an existing table never reaches a database that was
+initialized before it. Each migration here checks information_schema
+first and does nothing when it has already been applied, so /api/init-db
+runs all of them every time.
+"""
+
+from typing import Callable, List, Tuple
+
+
+def column_exists(cursor, table: str, column: str) -> bool:
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def index_exists(cursor, table: str, index: str) -> bool:
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index))
+    return cursor.fetchone()[0] > 0
+
+
+def add_indexes(cursor, table: str, indexes: List[Tuple[str, str]]) -> bool:
+    """
+    Add each missing (name, definition) index to table; True if any was added.
+    One ALTER per index: InnoDB builds a single FULLTEXT index at a time.
+    """
+    changed = False
+    for name, definition in indexes:
+        if not index_exists(cursor, table, name):
+            cursor.execute(f"ALTER TABLE {table} ADD {definition}")
+            changed = True
+    return changed
+
+
+def add_model_content_hash(cursor) -> bool:
+    """models.content_hash keys the derivative cache (thumbnails, progressive, ...)"""
+    if column_exists(cursor, 'models', 'content_hash'):
+        return False
+    cursor.execute("""
+        ALTER TABLE models
+        ADD COLUMN content_hash CHAR(64) AFTER triangle_count,
+        ADD INDEX idx_content_hash (content_hash)
+    """)
+    return True
+
+
+def add_activity_user_agent_id(cursor) -> bool:
+    """
+    user_activity_log.user_agent (TEXT per row) becomes user_agent_id into
+    user_agents. Existing strings are copied into user_agents and linked
+    before the old column is dropped; ua_hash is SHA1 of the string, as in
+    ActivityLog._user_agent_id.
+    """
+    changed = False
+    if not column_exists(cursor, 'user_activity_log', 'user_agent_id'):
+        cursor.execute("""
+            ALTER TABLE user_activity_log
+            ADD COLUMN user_agent_id INT AFTER ip_address,
+            ADD FOREIGN KEY (user_agent_id) REFERENCES user_agents(id)
+        """)
+        changed = True
+
+    if column_exists(cursor, 'user_activity_log', 'user_agent'):
+        cursor.execute("""
+            INSERT IGNORE INTO user_agents (ua_hash, user_agent)
+            SELECT DISTINCT SHA1(user_agent), user_agent
+            FROM user_activity_log
+            WHERE user_agent IS NOT NULL AND user_agent <> ''
+        """)
+        cursor.execute("""
+            UPDATE user_activity_log l
+            JOIN user_agents ua ON ua.ua_hash = SHA1(l.user_agent)
+            SET l.user_agent_id = ua.id
+            WHERE l.user_agent IS NOT NULL AND l.user_agent_id IS NULL
+        """)
+        cursor.execute("ALTER TABLE user_activity_log DROP COLUMN user_agent")
+        changed = True
+
+    # Archive rotation selects by created_at alone
+    if not index_exists(cursor, 'user_activity_log', 'idx_activity_created'):
+        cursor.execute("ALTER TABLE user_activity_log ADD INDEX idx_activity_created (created_at)")
+        changed = True
+    return changed
+
+
+def add_user_indexes(cursor) -> bool:
+    """Sort and filter columns of the paginated admin user list (user_directory.py)"""
+    return add_indexes(cursor, 'users', [
+        ('idx_users_organization', "INDEX idx_users_organization (organization)"),
+        ('idx_users_created', "INDEX idx_users_created (created_at)"),
+        ('idx_users_last_login', "INDEX idx_users_last_login (last_login)"),
+    ])
+
+
+def add_session_indexes(cursor) -> bool:
+    """Session validation, the per-user cap and the batched purge (sessions.py)"""
+    return add_indexes(cursor, 'user_sessions', [
+        ('idx_session_user', "INDEX idx_session_user (user_id, expires_at)"),
+        ('idx_session_expires', "INDEX idx_session_expires (expires_at)"),
+    ])
+
+
+def add_search_indexes(cursor) -> bool:
+    """
+    FULLTEXT and facet indexes used by search.py, plus the unique key that
+    makes ModelSearch.save_metadata an upsert. Rows saved before the key
+    existed may repeat a model; the newest row per model is kept.
+    """
+    changed = add_indexes(cursor, 'models', [
+        ('idx_file_type', "INDEX idx_file_type (file_type)"),
+        ('idx_triangle_count', "INDEX idx_triangle_count (triangle_count)"),
+        ('idx_uploaded_at', "INDEX idx_uploaded_at (uploaded_at)"),
+        ('ft_model_text', "FULLTEXT INDEX ft_model_text (name, description)"),
+    ])
+
+    if not index_exists(cursor, 'model_metadata', 'unique_model_metadata'):
+        cursor.execute("""
+            DELETE older FROM model_metadata older
+            JOIN model_metadata newer ON newer.model_id = older.model_id AND newer.id > older.id
+        """)
+        cursor.execute("ALTER TABLE model_metadata ADD UNIQUE KEY unique_model_metadata (model_id)")
+        changed = True
+
+    return add_indexes(cursor, 'model_metadata', [
+        ('idx_culture', "INDEX idx_culture (culture)"),
+        ('idx_period', "INDEX idx_period (period)"),
+        ('idx_material', "INDEX idx_material (material)"),
+        ('idx_dimensions', "INDEX idx_dimensions (dimensions_x, dimensions_y, dimensions_z)"),
+        ('ft_metadata_notes', "FULLTEXT INDEX ft_metadata_notes (notes)"),
+    ]) or changed
+
+
+def add_model_stats_error(cursor) -> bool:
+    """model_stats.error marks models whose file could not be validated"""
+    if column_exists(cursor, 'model_stats', 'error'):
+        return False
+    cursor.execute("ALTER TABLE model_stats ADD COLUMN error VARCHAR(500) AFTER out_of_core")
+    return True
+
+
+# Applied in order; each returns True if it changed the database
+MIGRATIONS: List[Tuple[str, Callable]] = [
+    ('models.content_hash', add_model_content_hash),
+    ('search indexes', add_search_indexes),
+    ('session indexes', add_session_indexes),
+    ('user indexes', add_user_indexes),
+    ('user_activity_log.user_agent_id', add_activity_user_agent_id),
+    ('model_stats.error', add_model_stats_error),
+]
+
+
+def apply_migrations(cursor) -> List[str]:
+    """Run every pending migration; returns the names of those applied"""
+    applied = []
+    for name, migrate in MIGRATIONS:
+        if migrate(cursor):
+            applied.append(name)
+    return applied
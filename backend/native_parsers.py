@@ -0,0 +1,114 @@
+"""
+Fast-path parsers for binary PLY and STL (and OBJ via obj_parser)
+
+Both formats are fixed-layout records, so the file is memory-mapped with
+a structured dtype and coordinates/indices are returned as views of the
+mapping (copy-on-write, so callers may modify them without touching the
+file). STL corners are welded with one vectorized unique over their raw
+bytes.
+
+Each reader returns None for variants it does not handle (ASCII files,
+polygon faces, list properties outside the face element, ...) so callers
+fall back to trimesh/open3d.
+"""
+
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
+
+from obj_parser import read_obj
+from out_of_core import read_ply_header
+
+STL_RECORD = np.dtype([('normal', '<f4', 3), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+
+MeshArrays = Tuple[np.ndarray, np.ndarray]
+
+
+def read_binary_stl(path: str) -> Optional[MeshArrays]:
+    size = os.path.getsize(path)
+    if size < 84:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(80)
+        count = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+    if size != 84 + STL_RECORD.itemsize * count:
+        return None
+    if count == 0:
+        return np.zeros((0, 3), dtype=np.float32), np.zeros((0, 3), dtype=np.int64)
+
+    records = np.memmap(path, dtype=STL_RECORD, mode='r', offset=84, shape=(count,))
+    # + 0.0 turns -0.0 into 0.0 so both weld
+    corners = np.ascontiguousarray(records['vertices'].reshape(-1, 3)) + np.float32(0.0)
+    return weld(corners)
+
+
+def weld(corners: np.ndarray) -> MeshArrays:
+    """Merge bit-identical float32 corners: (unique vertices, faces)"""
+    bits = corners.view(np.uint32)
+    # Two sort keys instead of three: x and y bits packed into one uint64
+    order = np.lexsort((bits[:, 2], (bits[:, 0].astype(np.uint64) << np.uint64(32)) | bits[:, 1]))
+    ordered = bits[order]
+    is_new = np.empty(len(order), dtype=bool)
+    is_new[:1] = True
+    is_new[1:] = (ordered[1:] != ordered[:-1]).any(axis=1)
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = np.cumsum(is_new) - 1
+    return corners[order[is_new]], inverse.reshape(-1, 3)
+
+
+def read_binary_ply(path: str) -> Optional[MeshArrays]:
+    with open(path, 'rb') as f:
+        try:
+            fmt, elements = read_ply_header(f)
+        except (ValueError, KeyError):
+            return None
+        offset = f.tell()
+    if fmt == 'ascii':
+        return None
+    endian = '<' if fmt == 'binary_little_endian' else '>'
+
+    vertices = faces = None
+    for name, count, props in elements:
+        if any(len(prop) == 3 for prop in props):
+            if name != 'face' or len(props) != 1 or props[0][0] not in ('vertex_indices', 'vertex_index'):
+                return None
+            _, count_type, index_type = props[0]
+            # Fixed-size records are only right if every face is a triangle (checked below)
+            record = np.dtype([('n', endian + count_type), ('indices', endian + index_type, 3)])
+        else:
+            record = np.dtype([(prop[0], endian + prop[1]) for prop in props])
+
+        if offset + record.itemsize * count > os.path.getsize(path):
+            return None
+        rows = np.memmap(path, dtype=record, mode='c', offset=offset, shape=(count,)) if count else \
+            np.zeros(0, dtype=record)
+        if name == 'vertex':
+            if not {'x', 'y', 'z'} <= set(record.names):
+                return None
+            vertices = np.asarray(structured_to_unstructured(rows[['x', 'y', 'z']]))
+        elif name == 'face':
+            if count and not (rows['n'] == 3).all():
+                return None
+            faces = np.asarray(rows['indices'])
+        offset += record.itemsize * count
+
+    if vertices is None or faces is None:
+        return None
+    return vertices, faces
+
+
+READERS = {'.stl': read_binary_stl, '.ply': read_binary_ply, '.obj': read_obj}
+
+
+def read_native(path: str) -> Optional[MeshArrays]:
+    """(vertices, faces) via a fast path, or None if the file needs a general loader"""
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        return None
+    try:
+        return reader(path)
+    except (OSError, ValueError) as e:
+        print(f"Native parser failed for {path}, falling back: {e}")
+        return None
@@ -0,0 +1,232 @@
+"""
+Parallel OBJ reader
+
+The file is split into byte ranges at line boundaries and parsed in a
+process pool in two passes:
+
+1. each range counts its `v` lines and the triangles its `f` lines
+   fan-triangulate to; prefix sums give every range its offset in the
+   output and the number of vertices defined before it (needed for
+   negative, i.e. relative, indices);
+2. each range tokenizes its bytes with vectorized NumPy operations and
+   writes its vertices and triangles straight into a shared MeshHandle,
+   whose arrays are returned without a copy.
+
+Only the vertex index of `v/vt/vn` corners is kept. Files below
+PARALLEL_MIN_BYTES are parsed in-process with the same code. Files using
+line continuations (`\\` at end of line) return None so callers fall back
+to trimesh.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from mesh_handle import MeshHandle
+
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+# Tokenizing holds a few int32/bool arrays per input byte
+CHUNK_BYTES = 8 * 1024 * 1024
+
+NEWLINE, SPACE, TAB, CR, SLASH, BACKSLASH = (ord(c) for c in '\n \t\r/\\')
+WHITESPACE = bytes.maketrans(b'\t\r\n', b'   ')
+IS_SPACE = np.zeros(256, dtype=bool)
+IS_SPACE[[SPACE, TAB, CR, NEWLINE]] = True
+
+
+def split_ranges(path: str, parts: int) -> List[Tuple[int, int]]:
+    """About `parts` byte ranges of the file, each ending just after a newline"""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(max(bounds[-1], size * i // parts))
+            f.readline()
+            if f.tell() >= size:
+                break
+            if f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return [(start, stop) for start, stop in zip(bounds, bounds[1:]) if stop > start]
+
+
+def _read(path: str, start: int, stop: int) -> np.ndarray:
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    if not data.endswith(b'\n'):
+        data += b'\n'
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+class _Lines:
+    """Vectorized view of the lines in a byte buffer"""
+
+    def __init__(self, buf: np.ndarray):
+        self.buf = buf
+        ends = np.flatnonzero(buf == NEWLINE)
+        self.starts = np.concatenate(([0], ends[:-1] + 1))
+        self.ends = ends
+        # Offset of each line's keyword, after any indentation
+        self.keys = self.starts
+        first = buf[np.minimum(self.starts, len(buf) - 1)]
+        if ((first == SPACE) | (first == TAB)).any():
+            blank = (buf == SPACE) | (buf == TAB)
+            # Next non-blank byte at or after each position; a line's newline stops the search
+            offsets = np.where(blank, len(buf), np.arange(len(buf), dtype=np.int32))
+            self.keys = np.minimum.accumulate(offsets[::-1])[::-1][self.starts]
+            del blank, offsets
+            first = buf[self.keys]
+        second = buf[np.minimum(self.keys + 1, len(buf) - 1)]
+        separated = (second == SPACE) | (second == TAB)
+        self.is_vertex = (first == ord('v')) & separated & (self.ends > self.keys + 1)
+        self.is_face = (first == ord('f')) & separated & (self.ends > self.keys + 1)
+
+    def continued(self) -> bool:
+        ends = self.ends[self.ends > 0]
+        last = self.buf[ends - 1]
+        last = np.where(last == CR, self.buf[np.maximum(ends - 2, 0)], last)
+        return bool((last == BACKSLASH).any())
+
+    def _bodies(self, mask: np.ndarray) -> np.ndarray:
+        """Byte mask of the selected lines after their keyword (closing newline included)"""
+        selected = np.repeat(mask, self.ends - self.starts + 1)
+        selected[self.keys[mask]] = False
+        selected[self.keys[mask] + 1] = False
+        return selected
+
+    def _space(self) -> np.ndarray:
+        return IS_SPACE[self.buf]
+
+    def _counts(self, keep: np.ndarray, space: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        token_start = keep & ~space
+        token_start[1:] &= space[:-1]
+        return np.add.reduceat(token_start, self.starts, dtype=np.int64)[mask]
+
+    def token_counts(self, mask: np.ndarray) -> np.ndarray:
+        """Whitespace-separated tokens on each selected line (after the keyword)"""
+        if not mask.any():
+            return np.zeros(0, dtype=np.int64)
+        return self._counts(self._bodies(mask), self._space(), mask)
+
+    def tokens(self, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Numbers on the selected lines (after the keyword) and how many each
+        line has; within a token only the part before the first '/' counts.
+        """
+        if not mask.any():
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+
+        buf = self.buf
+        keep = self._bodies(mask)
+        space = self._space()
+        slash = buf == SLASH
+        if slash.any():
+            slashes = np.cumsum(slash, dtype=np.int32)
+            # Slashes seen before the current token started
+            before_token = np.maximum.accumulate(np.where(space, slashes, 0))
+            keep &= space | (slashes == before_token)
+            del slashes, before_token
+
+        text = buf[keep].tobytes().translate(WHITESPACE)
+        counts = self._counts(keep, space, mask)
+        return np.fromstring(text.decode('ascii', errors='replace'), sep=' '), counts
+
+
+def _triangle_count(sizes: np.ndarray) -> int:
+    return int(np.maximum(sizes - 2, 0).sum())
+
+
+def count_range(path: str, start: int, stop: int) -> Tuple[int, int, bool]:
+    """(vertex lines, triangles, uses line continuations) for a byte range"""
+    lines = _Lines(_read(path, start, stop))
+    # "1/2/3" is one token either way, so corners can be counted without parsing
+    sizes = lines.token_counts(lines.is_face)
+    return int(lines.is_vertex.sum()), _triangle_count(sizes), lines.continued()
+
+
+def parse_range(path: str, start: int, stop: int, vertex_offset: int, face_offset: int,
+                descriptor: Dict[str, Any]) -> None:
+    """Parse a byte range into its slices of the shared vertex/face arrays"""
+    with MeshHandle.open(descriptor) as mesh:
+        _parse_into(path, start, stop, vertex_offset, face_offset, mesh['vertices'], mesh['faces'])
+
+
+def _parse_into(path: str, start: int, stop: int, vertex_offset: int, face_offset: int,
+                vertex_out: np.ndarray, face_out: np.ndarray) -> None:
+    lines = _Lines(_read(path, start, stop))
+
+    values, counts = lines.tokens(lines.is_vertex)
+    if len(counts):
+        # x y z [w] or x y z r g b: keep the first three numbers of each line
+        first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        columns = first[:, None] + np.arange(3)
+        vertices = values[np.minimum(columns, len(values) - 1)]
+        vertex_out[vertex_offset:vertex_offset + len(vertices)] = vertices
+
+    values, sizes = lines.tokens(lines.is_face)
+    if len(sizes):
+        indices = values.astype(np.int64)
+        # Vertices defined before each face line, for relative (negative) indices
+        defined = vertex_offset + np.cumsum(lines.is_vertex)[lines.is_face]
+        line_of_corner = np.repeat(np.arange(len(sizes)), sizes)
+        indices = np.where(indices > 0, indices - 1, defined[line_of_corner] + indices)
+
+        # Fan triangulation: (c0, ci, ci+1) for i in 1..size-2
+        corner_start = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        triangles = np.maximum(sizes - 2, 0)
+        fan = np.repeat(corner_start, triangles)
+        step = np.arange(triangles.sum()) - np.repeat(np.cumsum(triangles) - triangles, triangles) + 1
+        faces = np.column_stack((indices[fan], indices[fan + step], indices[fan + step + 1]))
+        face_out[face_offset:face_offset + len(faces)] = faces
+
+
+def read_obj(path: str, workers: Optional[int] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """(vertices float64, faces int64) of an OBJ file, or None if it needs a general loader"""
+    size = os.path.getsize(path)
+    workers = workers or os.cpu_count() or 1
+    parallel = workers > 1 and size >= PARALLEL_MIN_BYTES
+    parts = max(workers, -(-size // CHUNK_BYTES)) if parallel else max(1, -(-size // CHUNK_BYTES))
+    ranges = split_ranges(path, parts)
+
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) if parallel else None
+    try:
+        if executor:
+            counted = list(executor.map(count_range, *zip(*((path, s, e) for s, e in ranges))))
+        else:
+            counted = [count_range(path, s, e) for s, e in ranges]
+        if any(continued for _, _, continued in counted):
+            return None
+
+        vertex_offsets = np.concatenate(([0], np.cumsum([c[0] for c in counted])))
+        face_offsets = np.concatenate(([0], np.cumsum([c[1] for c in counted])))
+        vertex_total, face_total = int(vertex_offsets[-1]), int(face_offsets[-1])
+        if vertex_total == 0:
+            return None
+
+        if not executor:
+            vertices = np.empty((vertex_total, 3), dtype=np.float64)
+            faces = np.empty((face_total, 3), dtype=np.int64)
+            for i, (s, e) in enumerate(ranges):
+                _parse_into(path, s, e, int(vertex_offsets[i]), int(face_offsets[i]), vertices, faces)
+        else:
+            handle = MeshHandle.create({'vertices': ((vertex_total, 3), np.float64),
+                                        'faces': ((face_total, 3), np.int64)})
+            try:
+                jobs = [(path, s, e, int(vertex_offsets[i]), int(face_offsets[i]), handle.share())
+                        for i, (s, e) in enumerate(ranges)]
+                list(executor.map(parse_range, *zip(*jobs)))
+                # Views outlive the handle's files, so nothing is copied
+                vertices, faces = handle['vertices'], handle['faces']
+            finally:
+                handle.release()
+    finally:
+        if executor:
+            executor.shutdown()
+
+    if len(faces) and (faces.min() < 0 or faces.max() >= vertex_total):
+        raise ValueError("OBJ face references a vertex that does not exist")
+    return vertices, faces
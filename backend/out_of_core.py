@@ -0,0 +1,417 @@
+"""
+Out-of-core mesh processing for models larger than RAM
+
+OBJ, PLY (ASCII and binary) and STL files are stream-parsed CHUNK_ROWS
+records at a time into raw files on disk, which are then opened as
+memory-mapped arrays:
+
+    vertices.bin   float64 (vertex_count, 3)
+    faces.bin      uint32  (face_count, 3)   (polygons fan-triangulated)
+
+Vertices are kept in double precision: scanned and georeferenced models
+often sit at coordinates around 1e5-1e6, where float32 spacing is
+centimetres to decimetres.
+
+Statistics (counts, bounding box, surface area) and vertex-clustering
+decimation run over those arrays chunk by chunk. Resident memory is
+bounded by the chunk size plus, for decimation, the occupied grid cells
+(O(grid^2) for a surface); mapped file pages are page cache and can be
+reclaimed by the OS at any time.
+
+STL vertices are not welded (that would need a global hash table);
+decimation merges them anyway since coincident corners share a grid cell.
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+CHUNK_ROWS = 1 << 19
+MAX_VERTICES = 0xFFFFFFFF
+
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'
+}
+
+
+class ChunkedMesh:
+    """Memory-mapped vertex/face arrays in a directory, processed in chunks"""
+
+    def __init__(self, directory: str, vertex_count: int, face_count: int,
+                 chunk_rows: int = CHUNK_ROWS, owns_directory: bool = False):
+        self.directory = directory
+        self.vertex_count = vertex_count
+        self.face_count = face_count
+        self.chunk_rows = chunk_rows
+        self.owns_directory = owns_directory
+        self.vertices = self._map('vertices.bin', np.float64, vertex_count)
+        self.faces = self._map('faces.bin', np.uint32, face_count)
+
+    def _map(self, name: str, dtype, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.zeros((0, 3), dtype=dtype)
+        return np.memmap(os.path.join(self.directory, name), dtype=dtype, mode='r', shape=(rows, 3))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Drop the mappings and delete the directory if it was created for this mesh"""
+        self.vertices = self.faces = None
+        if self.owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def vertex_chunks(self) -> Iterator[np.ndarray]:
+        for start in range(0, self.vertex_count, self.chunk_rows):
+            yield self.vertices[start:start + self.chunk_rows]
+
+    def face_chunks(self) -> Iterator[np.ndarray]:
+        for start in range(0, self.face_count, self.chunk_rows):
+            yield np.asarray(self.faces[start:start + self.chunk_rows], dtype=np.int64)
+
+    def bounding_box(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        if self.vertex_count == 0:
+            return None
+        lo = np.full(3, np.inf)
+        hi = np.full(3, -np.inf)
+        for chunk in self.vertex_chunks():
+            lo = np.minimum(lo, chunk.min(axis=0))
+            hi = np.maximum(hi, chunk.max(axis=0))
+        return lo, hi
+
+    def surface_area(self) -> float:
+        area = 0.0
+        for faces in self.face_chunks():
+            tri = self.vertices[faces.ravel()].reshape(-1, 3, 3)
+            area += 0.5 * float(np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]),
+                                               axis=1).sum())
+        return area
+
+    def stats(self) -> Dict[str, Any]:
+        box = self.bounding_box()
+        return {
+            'vertex_count': self.vertex_count,
+            'face_count': self.face_count,
+            'bbox': [box[0].tolist(), box[1].tolist()] if box else None,
+            'surface_area': self.surface_area()
+        }
+
+    def decimate(self, grid_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vertex clustering on a grid_size^3 lattice (same result as
+        mesh_utils.decimate_vertex_clustering) in two passes over the chunks.
+        """
+        box = self.bounding_box()
+        if box is None or self.face_count == 0:
+            return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+        lo, hi = box
+        extent = np.maximum(hi - lo, 1e-12)
+
+        # Pass 1: cell key per vertex (kept on disk) and running per-cell sums
+        keys = np.memmap(os.path.join(self.directory, 'cluster_keys.bin'), dtype=np.int64,
+                         mode='w+', shape=(self.vertex_count,))
+        cell_keys = np.zeros(0, dtype=np.int64)
+        sums = np.zeros((0, 3))
+        counts = np.zeros(0)
+        for start in range(0, self.vertex_count, self.chunk_rows):
+            chunk = np.asarray(self.vertices[start:start + self.chunk_rows])
+            cells = np.minimum(((chunk - lo) / extent * grid_size).astype(np.int64), grid_size - 1)
+            chunk_keys = (cells[:, 0] * grid_size + cells[:, 1]) * grid_size + cells[:, 2]
+            keys[start:start + len(chunk)] = chunk_keys
+
+            merged, inverse = np.unique(np.concatenate((cell_keys, chunk_keys)), return_inverse=True)
+            inverse = inverse.ravel()
+            weights = np.concatenate((sums, chunk))
+            sums = np.column_stack([np.bincount(inverse, weights=weights[:, axis], minlength=len(merged))
+                                    for axis in range(3)])
+            counts = np.bincount(inverse, weights=np.concatenate((counts, np.ones(len(chunk)))),
+                                 minlength=len(merged))
+            cell_keys = merged
+        keys.flush()
+        new_vertices = sums / counts[:, None]
+
+        # Pass 2: faces onto clusters, dropping collapsed and repeated triangles
+        new_faces = np.zeros((0, 3), dtype=np.int64)
+        for faces in self.face_chunks():
+            clustered = np.searchsorted(cell_keys, np.asarray(keys[faces.ravel()])).reshape(-1, 3)
+            valid = ((clustered[:, 0] != clustered[:, 1]) &
+                     (clustered[:, 1] != clustered[:, 2]) &
+                     (clustered[:, 2] != clustered[:, 0]))
+            new_faces = np.concatenate((new_faces, clustered[valid]))
+            _, first = np.unique(np.sort(new_faces, axis=1), axis=0, return_index=True)
+            new_faces = new_faces[np.sort(first)]
+        del keys
+        os.remove(os.path.join(self.directory, 'cluster_keys.bin'))
+        return new_vertices, new_faces
+
+    def decimate_to_budget(self, max_faces: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Shrink the clustering grid until the result fits max_faces"""
+        if self.face_count <= max_faces:
+            return (np.asarray(self.vertices, dtype=np.float64),
+                    np.asarray(self.faces, dtype=np.int64))
+
+        grid_size = max(2, int(np.sqrt(max_faces / 2.0)))
+        while True:
+            new_vertices, new_faces = self.decimate(grid_size)
+            if len(new_faces) <= max_faces or grid_size <= 2:
+                return new_vertices, new_faces
+            grid_size = max(2, int(grid_size * 0.8))
+
+
+class ChunkWriter:
+    """Appends vertex/face blocks to the raw files of a ChunkedMesh"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vertex_count = 0
+        self.face_count = 0
+        self._vertices = open(os.path.join(directory, 'vertices.bin'), 'wb')
+        self._faces = open(os.path.join(directory, 'faces.bin'), 'wb')
+
+    def add_vertices(self, vertices) -> None:
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        if self.vertex_count + len(vertices) > MAX_VERTICES:
+            raise ValueError("Mesh has more vertices than 32-bit indices can address")
+        self._vertices.write(vertices.tobytes())
+        self.vertex_count += len(vertices)
+
+    def add_faces(self, faces) -> None:
+        faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+        self._faces.write(faces.astype(np.uint32).tobytes())
+        self.face_count += len(faces)
+
+    def add_polygons(self, polygons: List[List[int]]) -> None:
+        """Fan-triangulate polygons of any size"""
+        self.add_faces([(polygon[0], polygon[i], polygon[i + 1])
+                        for polygon in polygons for i in range(1, len(polygon) - 1)])
+
+    def close(self) -> None:
+        self._vertices.close()
+        self._faces.close()
+
+
+# --- Streaming parsers ------------------------------------------------------
+
+def stream_obj(path: str, writer: ChunkWriter, chunk_rows: int = CHUNK_ROWS) -> None:
+    vertices: List[List[float]] = []
+    polygons: List[List[int]] = []
+    seen = 0
+    with open(path, 'r', errors='replace') as f:
+        for line in f:
+            if line.startswith('v '):
+                vertices.append(line.split()[1:4])
+                seen += 1
+                if len(vertices) >= chunk_rows:
+                    writer.add_vertices(np.array(vertices, dtype=np.float64))
+                    vertices = []
+            elif line.startswith('f '):
+                # v, v/vt, v//vn or v/vt/vn; negative indices count back from the last vertex
+                indices = [int(token.split('/', 1)[0]) for token in line.split()[1:]]
+                polygons.append([i - 1 if i > 0 else seen + i for i in indices])
+                if len(polygons) >= chunk_rows:
+                    writer.add_polygons(polygons)
+                    polygons = []
+    if vertices:
+        writer.add_vertices(np.array(vertices, dtype=np.float64))
+    if polygons:
+        writer.add_polygons(polygons)
+
+
+def stream_stl(path: str, writer: ChunkWriter, chunk_rows: int = CHUNK_ROWS) -> None:
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(80)
+        header = f.read(4)
+        count = int(np.frombuffer(header, dtype='<u4')[0]) if len(header) == 4 else -1
+        if size == 84 + 50 * count:
+            record = np.dtype([('normal', '<f4', 3), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+            while count > 0:
+                records = np.fromfile(f, dtype=record, count=min(chunk_rows, count))
+                first = writer.vertex_count
+                writer.add_vertices(records['vertices'].reshape(-1, 3))
+                writer.add_faces(np.arange(first, first + 3 * len(records)).reshape(-1, 3))
+                count -= len(records)
+            return
+
+    corners: List[List[str]] = []
+    with open(path, 'r', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('vertex'):
+                corners.append(line.split()[1:4])
+                if len(corners) >= 3 * chunk_rows:
+                    _flush_stl_corners(writer, corners)
+                    corners = []
+    if corners:
+        _flush_stl_corners(writer, corners)
+
+
+def _flush_stl_corners(writer: ChunkWriter, corners: List[List[str]]) -> None:
+    first = writer.vertex_count
+    writer.add_vertices(np.array(corners, dtype=np.float64))
+    writer.add_faces(np.arange(first, first + len(corners)).reshape(-1, 3))
+
+
+def read_ply_header(f) -> Tuple[str, List[Tuple[str, int, List[Tuple]]]]:
+    """
+    Format and elements of a PLY file, leaving f at the first data byte.
+    Properties are (name, type) or (name, count_type, item_type) for lists.
+    """
+    if f.readline().strip() != b'ply':
+        raise ValueError("Not a PLY file")
+    fmt = None
+    elements: List[Tuple[str, int, List[Tuple]]] = []
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError("PLY header has no end_header")
+        words = line.decode('ascii', errors='replace').split()
+        if not words or words[0] in ('comment', 'obj_info'):
+            continue
+        if words[0] == 'end_header':
+            break
+        if words[0] == 'format':
+            fmt = words[1]
+        elif words[0] == 'element':
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == 'property':
+            if words[1] == 'list':
+                elements[-1][2].append((words[4], PLY_TYPES[words[2]], PLY_TYPES[words[3]]))
+            else:
+                elements[-1][2].append((words[2], PLY_TYPES[words[1]]))
+    if fmt not in ('ascii', 'binary_little_endian', 'binary_big_endian'):
+        raise ValueError(f"Unsupported PLY format: {fmt}")
+    return fmt, elements
+
+
+def _ply_read_list_record(f, endian: str, props: List[Tuple]) -> Optional[List[int]]:
+    """Read one record of an element that has list properties; returns its vertex_indices"""
+    indices = None
+    for prop in props:
+        if len(prop) == 3:
+            count_dtype = np.dtype(endian + prop[1])
+            count = int(np.frombuffer(f.read(count_dtype.itemsize), dtype=count_dtype)[0])
+            item_dtype = np.dtype(endian + prop[2])
+            values = np.frombuffer(f.read(count * item_dtype.itemsize), dtype=item_dtype)
+            if prop[0] in ('vertex_indices', 'vertex_index'):
+                indices = values.tolist()
+        else:
+            f.read(np.dtype(prop[1]).itemsize)
+    return indices
+
+
+def stream_ply(path: str, writer: ChunkWriter, chunk_rows: int = CHUNK_ROWS) -> None:
+    with open(path, 'rb') as f:
+        fmt, elements = read_ply_header(f)
+        if fmt == 'ascii':
+            _stream_ply_ascii(f, elements, writer, chunk_rows)
+            return
+
+        endian = '<' if fmt == 'binary_little_endian' else '>'
+        for name, count, props in elements:
+            has_lists = any(len(prop) == 3 for prop in props)
+            if name == 'vertex':
+                record = np.dtype([(prop[0], endian + prop[1]) for prop in props])
+                while count > 0:
+                    rows = np.fromfile(f, dtype=record, count=min(chunk_rows, count))
+                    writer.add_vertices(np.column_stack((rows['x'], rows['y'], rows['z'])))
+                    count -= len(rows)
+            elif name == 'face' and props == [props[0]] and len(props[0]) == 3:
+                _stream_ply_triangles(f, endian, props[0], count, writer, chunk_rows)
+            elif not has_lists:
+                f.seek(count * np.dtype([(prop[0], endian + prop[1]) for prop in props]).itemsize, 1)
+            else:
+                polygons = []
+                for _ in range(count):
+                    indices = _ply_read_list_record(f, endian, props)
+                    if name == 'face' and indices:
+                        polygons.append(indices)
+                        if len(polygons) >= chunk_rows:
+                            writer.add_polygons(polygons)
+                            polygons = []
+                if polygons:
+                    writer.add_polygons(polygons)
+
+
+def _stream_ply_triangles(f, endian: str, prop: Tuple, count: int, writer: ChunkWriter,
+                          chunk_rows: int) -> None:
+    """Faces as fixed-size triangle records, switching to per-record reads at the first polygon"""
+    record = np.dtype([('n', endian + prop[1]), ('indices', endian + prop[2], 3)])
+    while count > 0:
+        start = f.tell()
+        rows = np.fromfile(f, dtype=record, count=min(chunk_rows, count))
+        polygon = np.flatnonzero(rows['n'] != 3)
+        if len(polygon) == 0:
+            writer.add_faces(rows['indices'])
+            count -= len(rows)
+            continue
+        writer.add_faces(rows['indices'][:polygon[0]])
+        count -= int(polygon[0])
+        f.seek(start + int(polygon[0]) * record.itemsize)
+        polygons = []
+        for _ in range(min(chunk_rows, count)):
+            polygons.append(_ply_read_list_record(f, endian, [prop]))
+        writer.add_polygons(polygons)
+        count -= len(polygons)
+
+
+def _stream_ply_ascii(f, elements, writer: ChunkWriter, chunk_rows: int) -> None:
+    for name, count, props in elements:
+        names = [prop[0] for prop in props]
+        rows = []
+        for _ in range(count):
+            values = f.readline().split()
+            if name == 'vertex':
+                rows.append([values[names.index(axis)] for axis in ('x', 'y', 'z')])
+                if len(rows) >= chunk_rows:
+                    writer.add_vertices(np.array(rows, dtype=np.float64))
+                    rows = []
+            elif name == 'face':
+                # Assumes vertex_indices is the face's first property, as every exporter writes it
+                n = int(values[0])
+                rows.append([int(v) for v in values[1:1 + n]])
+                if len(rows) >= chunk_rows:
+                    writer.add_polygons(rows)
+                    rows = []
+        if rows and name == 'vertex':
+            writer.add_vertices(np.array(rows, dtype=np.float64))
+        elif rows and name == 'face':
+            writer.add_polygons(rows)
+
+
+PARSERS = {'obj': stream_obj, 'ply': stream_ply, 'stl': stream_stl}
+
+
+def parse_to_chunks(file_path: str, directory: Optional[str] = None,
+                    chunk_rows: int = CHUNK_ROWS) -> ChunkedMesh:
+    """Stream a model file into a ChunkedMesh (in a temporary directory unless given)"""
+    extension = os.path.splitext(file_path)[1].lower().lstrip('.')
+    parser = PARSERS.get(extension)
+    if parser is None:
+        raise ValueError(f"Unsupported file format: {file_path}")
+
+    owns_directory = directory is None
+    if owns_directory:
+        directory = tempfile.mkdtemp(prefix='mesh_ooc_')
+    else:
+        os.makedirs(directory, exist_ok=True)
+
+    writer = ChunkWriter(directory)
+    try:
+        parser(file_path, writer, chunk_rows)
+    except Exception:
+        writer.close()
+        if owns_directory:
+            shutil.rmtree(directory, ignore_errors=True)
+        raise
+    writer.close()
+    return ChunkedMesh(directory, writer.vertex_count, writer.face_count, chunk_rows, owns_directory)
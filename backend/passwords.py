@@ -0,0 +1,88 @@
+"""
+Bounded bcrypt worker pool
+
+The calling request thread still waits for its hash; the pool only
+bounds concurrency. At most max_workers hashes run at once (bcrypt
+releases the GIL, so unbounded logins would saturate every core and
+starve other requests), and at most max_queue are queued or running;
+beyond that, hash()/verify() raise PasswordHasherBusy immediately so the
+API can answer 429 instead of letting requests pile up behind a
+quarter-second of work each.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+DEFAULT_ROUNDS = 12
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+def hash_rounds(hashed: str) -> Optional[int]:
+    """Cost factor encoded in a bcrypt hash ($2b$<rounds>$...)"""
+    parts = hashed.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int = DEFAULT_ROUNDS, max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None):
+        self.rounds = rounds
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue or self.max_workers * 4
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._lock = threading.Lock()
+        self._depth = 0
+        self.rejected = 0
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy()
+
+        with self._lock:
+            self._depth += 1
+        try:
+            # Blocks this thread until a worker is free and the hash is done
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._depth -= 1
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        salt = bcrypt.gensalt(self.rounds)
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return hash_rounds(hashed) != self.rounds
+
+    def queue_depth(self) -> int:
+        return self._depth
+
+    def stats(self):
+        return {
+            "rounds": self.rounds,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queue_depth": self._depth,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,232 @@
+"""
+Opt-in per-request profiling
+
+A request is profiled when it carries `X-Profile: <PROFILE_TOKEN>` or is
+picked by PROFILE_SAMPLE_RATE. While it runs, a sampler thread snapshots
+the request thread's stack every millisecond (in practice no finer than
+the interpreter's GIL switch interval, 5 ms by default); the result is written as a
+collapsed-stack file (flamegraph.pl / speedscope input) plus a JSON
+summary attributing time to DB, bcrypt, file I/O, JSON serialization and
+application code. PROFILE_MODE=cprofile writes a .prof file instead.
+
+When neither a token nor a sample rate is configured no hooks are
+installed, so disabled profiling costs nothing.
+"""
+
+import cProfile
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from flask import g, request
+
+import db
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+SAMPLE_INTERVAL = 0.001
+NAME_PATTERN = re.compile(r'^[0-9]{8}_[0-9]{6}_[A-Za-z0-9_]+_[0-9a-f]{8}\.(collapsed|prof|json)$')
+
+CATEGORIES = ['db', 'bcrypt', 'file_io', 'json', 'app']
+
+
+def categorize(frames: List[Any]) -> str:
+    """Attribute a stack (leaf first) to the innermost recognisable cost"""
+    for frame in frames:
+        filename = frame.f_code.co_filename
+        function = frame.f_code.co_name
+        if 'mysql' in filename or filename.endswith(os.sep + 'db.py'):
+            return 'db'
+        if 'bcrypt' in filename or function in ('hash_password', 'verify_password'):
+            return 'bcrypt'
+        if 'json' in filename:
+            return 'json'
+        if ('shutil' in filename or function in ('send_file', 'save', 'file_content_hash', 'sendfile')
+                or filename.endswith(os.sep + 'wsgi.py') and function == '__next__'):
+            return 'file_io'
+    return 'app'
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name='heritage-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.categories: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(frame)
+                frame = frame.f_back
+
+            self.categories[categorize(frames)] += 1
+            self.stacks[';'.join(f"{f.f_globals.get('__name__', '?')}:{f.f_code.co_name}"
+                                 for f in reversed(frames))] += 1
+            self.samples += 1
+            del frames
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfiler:
+    def __init__(self, output_dir: str, token: Optional[str] = None,
+                 sample_rate: float = 0.0, mode: str = 'sampler'):
+        self.output_dir = output_dir
+        self.token = token
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    def _wants_profile(self) -> bool:
+        if self.token:
+            supplied = request.environ.get(PROFILE_HEADER)
+            if supplied and hmac.compare_digest(supplied, self.token):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _observe_query(self, statement, params, seconds):
+        state = getattr(self._local, 'profile', None)
+        if state is not None:
+            state['db_seconds'] += seconds
+            state['db_queries'] += 1
+
+    def _before_request(self):
+        if not self._wants_profile():
+            return
+
+        state = {'start': time.perf_counter(), 'db_seconds': 0.0, 'db_queries': 0}
+        if self.mode == 'cprofile':
+            state['profile'] = cProfile.Profile()
+            state['profile'].enable()
+        else:
+            state['sampler'] = StackSampler(threading.get_ident())
+            state['sampler'].start()
+
+        self._local.profile = state
+        g.profile_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+    def _describe(self, state: Dict[str, Any], status_code: int):
+        """Capture the request fields the summary needs while the request context is active"""
+        endpoint = re.sub(r'[^A-Za-z0-9_]', '_', request.endpoint or 'unmatched')
+        stamp, suffix = g.profile_id.rsplit('_', 1)
+        state['id'] = f"{stamp}_{endpoint}_{suffix}"
+        state['request'] = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': status_code
+        }
+
+    def _finish(self, state: Dict[str, Any]):
+        if getattr(self._local, 'profile', None) is state:
+            self._local.profile = None
+
+        elapsed = time.perf_counter() - state['start']
+        base = os.path.join(self.output_dir, state['id'])
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        summary = {
+            'id': state['id'],
+            **state['request'],
+            'duration_ms': elapsed * 1000.0,
+            'db_queries': state['db_queries'],
+            'db_ms': state['db_seconds'] * 1000.0,
+            'mode': self.mode,
+            'created_at': datetime.now().isoformat()
+        }
+
+        if 'sampler' in state:
+            sampler = state['sampler']
+            sampler.stop()
+            with open(base + '.collapsed', 'w') as f:
+                for stack, count in sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            total = max(1, sampler.samples)
+            summary['samples'] = sampler.samples
+            summary['attribution_ms'] = {category: elapsed * 1000.0 * sampler.categories[category] / total
+                                         for category in CATEGORIES}
+            summary['output'] = state['id'] + '.collapsed'
+        else:
+            profile = state['profile']
+            profile.disable()
+            profile.dump_stats(base + '.prof')
+            summary['output'] = state['id'] + '.prof'
+
+        with open(base + '.json', 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    def _after_request(self, response):
+        state = getattr(self._local, 'profile', None)
+        if state is None or 'id' in state:
+            return response
+        self._describe(state, response.status_code)
+        response.headers['X-Profile-Id'] = state['id']
+
+        if response.is_streamed:
+            # Keep profiling while the server sends the body; it runs after this hook
+            response.call_on_close(lambda: self._finish(state))
+        else:
+            self._finish(state)
+        return response
+
+    def _teardown_request(self, exc):
+        # Only still unfinished here if the view raised before after_request ran
+        state = getattr(self._local, 'profile', None)
+        if state is not None and 'id' not in state:
+            self._describe(state, 500)
+            self._finish(state)
+
+    def list_profiles(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Newest profile summaries first"""
+        if not os.path.isdir(self.output_dir):
+            return []
+        names = sorted((name for name in os.listdir(self.output_dir) if name.endswith('.json')),
+                       reverse=True)[:limit]
+        summaries = []
+        for name in names:
+            try:
+                with open(os.path.join(self.output_dir, name), 'r') as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Error reading profile {name}: {e}")
+        return summaries
+
+    def profile_path(self, name: str) -> Optional[str]:
+        """Path of a stored profile artifact, or None if the name is invalid"""
+        if not NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(self.output_dir, name)
+        return path if os.path.exists(path) else None
+
+    def init_app(self, app):
+        app.request_profiler = self
+        if not self.enabled:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        db.add_query_observer(self._observe_query)
@@ -0,0 +1,259 @@
+"""
+Progressive mesh encoding for incremental viewer loading
+
+At ingest a model is split into separately addressable derivatives:
+
+- progressive_base.bin: a coarse vertex-clustered version of the whole
+  model (BASE_FACES triangles) that renders within the first request;
+- progressive_NNNN.bin: full-resolution meshlets, each the faces whose
+  centroids fall in one leaf of a kd-split of the model (CHUNK_FACES at
+  most), listed in order of surface area so the most visible regions
+  arrive first;
+- progressive.json: the manifest.
+
+The base mesh's faces are grouped by the same kd leaves and the manifest
+records each leaf's range in the base index buffer, so a client can hide
+a region's coarse faces as soon as that region's meshlet has arrived.
+
+Chunk layout (little-endian): float32 positions (vertex_count * 3)
+followed by indices (face_count * 3) of `index_dtype`, indices local to
+the chunk. Each chunk also has a mesh_codec encoding (`encoded` in the
+manifest, .qmc) with octahedral normals; all chunks are quantized on the
+model's bounding box so vertices on chunk borders decode identically.
+The manifest's `codec` entry reports sizes, encode/decode time and the
+position error bound for the model.
+
+Everything is stored in the content-addressed DerivativeStore and served
+with immutable caching.
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import mesh_codec
+from derivatives import DerivativeStore
+from mesh_utils import decimate_to_budget, load_mesh_bounded, vertex_normals
+
+MANIFEST_NAME = 'progressive.json'
+BASE_NAME = 'progressive_base.bin'
+CHUNK_NAME = 'progressive_{:04d}.bin'
+FORMAT_VERSION = 2
+
+BASE_FACES = 4096
+CHUNK_FACES = 32768
+# Files too large for memory are encoded from a decimated proxy of this size
+MAX_FACES = 5000000
+
+
+def face_areas(vertices: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    tri = vertices[faces]
+    return 0.5 * np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1)
+
+
+def kd_split(points: np.ndarray, max_leaf: int) -> Tuple[List[Tuple[int, float, int, int]], List[np.ndarray]]:
+    """
+    Split points by median along the widest axis until every leaf holds at
+    most max_leaf points. Returns the tree as (axis, value, left, right)
+    nodes (negative children are ~leaf ids) and each leaf's point indices.
+    """
+    nodes: List[Tuple[int, float, int, int]] = []
+    leaves: List[np.ndarray] = []
+
+    def build(indices: np.ndarray) -> int:
+        if len(indices) <= max_leaf:
+            leaves.append(indices)
+            return ~(len(leaves) - 1)
+
+        subset = points[indices]
+        axis = int(np.argmax(subset.max(axis=0) - subset.min(axis=0)))
+        order = np.argsort(subset[:, axis], kind='stable')
+        half = len(indices) // 2
+        value = float(subset[order[half], axis])
+
+        node_id = len(nodes)
+        nodes.append((axis, value, 0, 0))
+        left = build(indices[order[:half]])
+        right = build(indices[order[half:]])
+        nodes[node_id] = (axis, value, left, right)
+        return node_id
+
+    root = build(np.arange(len(points)))
+    if root < 0:
+        nodes.append((0, 0.0, root, root))
+    return nodes, leaves
+
+
+def kd_route(nodes: List[Tuple[int, float, int, int]], points: np.ndarray) -> np.ndarray:
+    """Leaf id of each point under a tree from kd_split"""
+    leaf_of = np.empty(len(points), dtype=np.int64)
+    stack = [(0, np.arange(len(points)))]
+    while stack:
+        node_id, indices = stack.pop()
+        axis, value, left, right = nodes[node_id]
+        goes_right = points[indices, axis] >= value
+        for child, members in ((left, indices[~goes_right]), (right, indices[goes_right])):
+            if len(members) == 0:
+                continue
+            if child < 0:
+                leaf_of[members] = ~child
+            else:
+                stack.append((child, members))
+    return leaf_of
+
+
+def pack_chunk(vertices: np.ndarray, faces: np.ndarray) -> Tuple[bytes, Dict[str, Any]]:
+    """Reindex faces onto the vertices they use and serialize them"""
+    used, local_faces = np.unique(faces.ravel(), return_inverse=True)
+    positions = vertices[used].astype('<f4')
+    index_dtype = '<u2' if len(used) <= 0xFFFF else '<u4'
+    indices = local_faces.astype(index_dtype)
+
+    data = positions.tobytes() + indices.tobytes()
+    bbox = [positions.min(axis=0).tolist(), positions.max(axis=0).tolist()] if len(positions) else None
+    return data, {
+        'vertex_count': int(len(used)),
+        'face_count': int(len(faces)),
+        'index_dtype': 'uint16' if index_dtype == '<u2' else 'uint32',
+        'bytes': len(data),
+        'bbox': bbox
+    }
+
+
+class ProgressiveEncoder:
+    def __init__(self, store: DerivativeStore, base_faces: int = BASE_FACES,
+                 chunk_faces: int = CHUNK_FACES, position_bits: int = mesh_codec.POSITION_BITS):
+        self.store = store
+        self.base_faces = base_faces
+        self.chunk_faces = chunk_faces
+        self.position_bits = position_bits
+
+    def _encode_chunk(self, vertices: np.ndarray, faces: np.ndarray, normals: np.ndarray,
+                      bounds: Tuple[np.ndarray, np.ndarray], segments: Optional[List[int]]) -> bytes:
+        used, local_faces = np.unique(faces.ravel(), return_inverse=True)
+        return mesh_codec.encode(vertices[used], local_faces.reshape(-1, 3), normals[used],
+                                 self.position_bits, bounds=bounds, segments=segments)
+
+    def has_encoding(self, content_hash: str) -> bool:
+        return self.store.exists(content_hash, MANIFEST_NAME)
+
+    def has_failed(self, content_hash: str) -> bool:
+        """True if encoding this file failed before; it is not retried"""
+        return self.store.has_failed(content_hash, MANIFEST_NAME)
+
+    def encode_arrays(self, vertices: np.ndarray, faces: np.ndarray) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+        """Manifest and {name: bytes} for a mesh"""
+        vertices = np.asarray(vertices, dtype=np.float64)
+        faces = np.asarray(faces, dtype=np.int64)
+
+        centroids = vertices[faces].mean(axis=1)
+        nodes, leaves = kd_split(centroids, self.chunk_faces)
+        areas = face_areas(vertices, faces)
+        leaf_areas = np.array([areas[leaf].sum() for leaf in leaves])
+        # Most surface first; leaf ids are renumbered to this order
+        order = np.argsort(-leaf_areas, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+
+        bounds = (vertices.min(axis=0), vertices.max(axis=0))
+        normals = vertex_normals(vertices, faces)
+        codec = {'position_bits': self.position_bits, 'normal_bits': mesh_codec.NORMAL_BITS,
+                 'raw_bytes': 0, 'encoded_bytes': 0, 'encode_ms': 0.0, 'decode_ms': 0.0}
+        files: Dict[str, bytes] = {}
+
+        def add(name: str, chunk_vertices, chunk_faces, chunk_normals, segments=None) -> Dict[str, Any]:
+            files[name], info = pack_chunk(chunk_vertices, chunk_faces)
+            encoded_name = name[:-len('.bin')] + '.qmc'
+            start = time.perf_counter()
+            files[encoded_name] = self._encode_chunk(chunk_vertices, chunk_faces, chunk_normals,
+                                                     bounds, segments)
+            middle = time.perf_counter()
+            mesh_codec.decode(files[encoded_name])
+            codec['encode_ms'] += (middle - start) * 1000
+            codec['decode_ms'] += (time.perf_counter() - middle) * 1000
+            # Raw equivalent carries float32 normals too
+            codec['raw_bytes'] += info['bytes'] + info['vertex_count'] * 12
+            codec['encoded_bytes'] += len(files[encoded_name])
+            info['encoded'] = {'name': encoded_name, 'bytes': len(files[encoded_name])}
+            return dict(info, name=name)
+
+        chunks = []
+        for position, leaf_id in enumerate(order):
+            chunk = add(CHUNK_NAME.format(position), vertices, faces[leaves[leaf_id]], normals)
+            chunks.append(dict(chunk, area=float(leaf_areas[leaf_id])))
+
+        base_vertices, base_faces = decimate_to_budget(vertices, faces, self.base_faces)
+        base_faces = np.asarray(base_faces, dtype=np.int64)
+        if len(base_faces):
+            base_leaf = rank[kd_route(nodes, np.asarray(base_vertices)[base_faces].mean(axis=1))]
+            sort = np.argsort(base_leaf, kind='stable')
+            base_faces, base_leaf = base_faces[sort], base_leaf[sort]
+            starts = np.searchsorted(base_leaf, np.arange(len(chunks)))
+            ends = np.searchsorted(base_leaf, np.arange(len(chunks)), side='right')
+        else:
+            starts = ends = np.zeros(len(chunks), dtype=np.int64)
+        for chunk, start, end in zip(chunks, starts, ends):
+            chunk['base_faces'] = [int(start), int(end - start)]
+
+        base_vertices = np.asarray(base_vertices)
+        # Per-region ranges of the base mesh survive the codec's reordering
+        base = add(BASE_NAME, base_vertices, base_faces, vertex_normals(base_vertices, base_faces),
+                   segments=[chunk['base_faces'][1] for chunk in chunks])
+        codec['encode_ms'] = round(codec['encode_ms'], 2)
+        codec['decode_ms'] = round(codec['decode_ms'], 2)
+        codec['ratio'] = round(codec['raw_bytes'] / max(codec['encoded_bytes'], 1), 2)
+        codec['position_error_bound'] = mesh_codec.position_error_bound(bounds, self.position_bits)
+
+        manifest = {
+            'version': FORMAT_VERSION,
+            'vertex_count': int(len(vertices)),
+            'face_count': int(len(faces)),
+            'bbox': [vertices.min(axis=0).tolist(), vertices.max(axis=0).tolist()],
+            'layout': 'float32 positions, then indices; little-endian',
+            'base': base,
+            'chunks': chunks,
+            'codec': codec
+        }
+        return manifest, files
+
+    def encode_model(self, file_path: str, content_hash: str,
+                     mesh: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Optional[Dict[str, Any]]:
+        """Encode a model (or its loaded mesh) into the derivative store (no-op if already encoded)"""
+        if self.has_encoding(content_hash):
+            return self.manifest(content_hash)
+
+        try:
+            vertices, faces = mesh or load_mesh_bounded(file_path, MAX_FACES)
+            if len(faces) == 0:
+                raise ValueError("Mesh has no faces")
+            manifest, files = self.encode_arrays(vertices, faces)
+            for name, data in files.items():
+                self.store.write_bytes(content_hash, name, data)
+            # Manifest last: its presence means every chunk is in place
+            self.store.write_bytes(content_hash, MANIFEST_NAME, json.dumps(manifest).encode('utf-8'))
+            return manifest
+        except Exception as e:
+            print(f"Error encoding progressive mesh for {file_path}: {e}")
+            self.store.mark_failed(content_hash, MANIFEST_NAME, str(e))
+            return None
+
+    def manifest(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        path = self.store.path(content_hash, MANIFEST_NAME)
+        if not path:
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+def decode_chunk(data: bytes, info: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """(positions, faces) from a chunk's bytes and its manifest entry"""
+    vertex_bytes = info['vertex_count'] * 12
+    positions = np.frombuffer(data, dtype='<f4', count=info['vertex_count'] * 3).reshape(-1, 3)
+    index_dtype = '<u2' if info['index_dtype'] == 'uint16' else '<u4'
+    faces = np.frombuffer(data, dtype=index_dtype, offset=vertex_bytes).reshape(-1, 3)
+    return positions, faces
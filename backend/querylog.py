@@ -0,0 +1,190 @@
+"""
+Slow query log and per-fingerprint statement statistics
+
+Every statement completed through db.connect() is normalized into a
+fingerprint (literals and placeholders replaced by ?, IN lists folded,
+whitespace collapsed) and aggregated: count, total/max time and rows.
+Statements slower than the threshold are appended as JSON lines to the
+log file with their parameter shapes (types and sizes, never values), and
+the first slow occurrence of each fingerprint gets an EXPLAIN captured on
+a separate, uninstrumented connection.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import mysql.connector
+
+import db
+
+DEFAULT_THRESHOLD_MS = 100.0
+MAX_FINGERPRINTS = 2000
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+_COMMENT = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+_VALUES_LIST = re.compile(r'\bVALUES\s*(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*', re.I)
+_SPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def normalize(statement: str) -> str:
+    """Statement text with literals removed, suitable for grouping"""
+    sql = _COMMENT.sub(' ', statement)
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    sql = _IN_LIST.sub('IN (?+)', sql)
+    return _VALUES_LIST.sub(r'VALUES \1+', sql)
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def param_shape(value: Any) -> str:
+    """Type and size of a parameter without its value"""
+    if value is None:
+        return 'null'
+    if isinstance(value, (str, bytes, bytearray)):
+        return f"{type(value).__name__}({len(value)})"
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def params_shape(params: Any) -> Any:
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {key: param_shape(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        # executemany passes a sequence of parameter rows
+        if params and isinstance(params[0], (list, tuple, dict)):
+            return {'rows': len(params), 'row': params_shape(params[0])}
+        return [param_shape(value) for value in params]
+    return [param_shape(params)]
+
+
+class SlowQueryLog:
+    def __init__(self, db_config: Dict[str, str], log_path: Optional[str] = None,
+                 threshold_ms: float = DEFAULT_THRESHOLD_MS):
+        self.db_config = db_config
+        self.log_path = log_path
+        self.threshold = threshold_ms / 1000.0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._explain_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='explain')
+
+    def record(self, statement: Any, params: Any, seconds: float, rows: int):
+        """Aggregate one completed statement; log and EXPLAIN it if slow"""
+        if isinstance(statement, (bytes, bytearray)):
+            statement = statement.decode('utf-8', 'replace')
+        normalized = normalize(statement)
+        key = fingerprint(normalized)
+        slow = seconds >= self.threshold
+        explain = False
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= MAX_FINGERPRINTS:
+                    # Drop the cheapest fingerprint to stay bounded
+                    del self._stats[min(self._stats, key=lambda k: self._stats[k]['total_seconds'])]
+                stats = self._stats[key] = {
+                    'fingerprint': key, 'sql': normalized, 'count': 0, 'total_seconds': 0.0,
+                    'max_seconds': 0.0, 'rows': 0, 'slow_count': 0, 'plan': None, 'explained': False
+                }
+            stats['count'] += 1
+            stats['total_seconds'] += seconds
+            stats['rows'] += rows
+            if seconds > stats['max_seconds']:
+                stats['max_seconds'] = seconds
+            if slow:
+                stats['slow_count'] += 1
+                stats['last_slow_params'] = params_shape(params)
+                if not stats['explained']:
+                    stats['explained'] = explain = True
+
+        if slow:
+            self._write_entry({
+                'time': datetime.now().isoformat(),
+                'fingerprint': key,
+                'sql': normalized,
+                'duration_ms': round(seconds * 1000.0, 3),
+                'rows': rows,
+                'params': params_shape(params)
+            })
+        if explain and normalized.split(' ', 1)[0].upper() in EXPLAINABLE:
+            self._explain_pool.submit(self._capture_plan, key, statement, params)
+
+    def _write_entry(self, entry: Dict[str, Any]):
+        if not self.log_path:
+            return
+        try:
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(entry, default=str) + '\n')
+        except OSError as e:
+            print(f"Error writing slow query log: {e}")
+
+    def _capture_plan(self, key: str, statement: str, params: Any):
+        # Plain mysql.connector connection so the EXPLAIN is not itself recorded
+        try:
+            conn = mysql.connector.connect(**self.db_config)
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute('EXPLAIN ' + statement, params)
+            plan = cursor.fetchall()
+            cursor.close()
+            conn.close()
+        except Exception as e:
+            print(f"Error capturing EXPLAIN for {key}: {e}")
+            plan = [{'error': str(e)}]
+
+        with self._lock:
+            if key in self._stats:
+                self._stats[key]['plan'] = plan
+
+    def top_queries(self, limit: int = 20, sort: str = 'total') -> List[Dict[str, Any]]:
+        """Fingerprints ordered by total, average or max time, or by count"""
+        sort_keys = {
+            'total': lambda s: s['total_seconds'],
+            'avg': lambda s: s['total_seconds'] / s['count'],
+            'max': lambda s: s['max_seconds'],
+            'count': lambda s: s['count']
+        }
+        with self._lock:
+            entries = [dict(stats) for stats in self._stats.values()]
+        entries.sort(key=sort_keys.get(sort, sort_keys['total']), reverse=True)
+
+        results = []
+        for stats in entries[:limit]:
+            results.append({
+                'fingerprint': stats['fingerprint'],
+                'sql': stats['sql'],
+                'count': stats['count'],
+                'total_ms': round(stats['total_seconds'] * 1000.0, 3),
+                'avg_ms': round(stats['total_seconds'] * 1000.0 / stats['count'], 3),
+                'max_ms': round(stats['max_seconds'] * 1000.0, 3),
+                'avg_rows': stats['rows'] / stats['count'],
+                'slow_count': stats['slow_count'],
+                'last_slow_params': stats.get('last_slow_params'),
+                'plan': stats['plan']
+            })
+        return results
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def install(self):
+        db.set_statement_log(self)
@@ -14,7 +14,22 @@ CREATE TABLE IF NOT EXISTS users (
   role ENUM('researcher', 'curator', 'student', 'admin') DEFAULT 'researcher',
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   last_login TIMESTAMP NULL,
-  is_active BOOLEAN DEFAULT TRUE
+  is_active BOOLEAN DEFAULT TRUE,
+  INDEX idx_users_organization (organization),
+  INDEX idx_users_created (created_at),
+  INDEX idx_users_last_login (last_login)
+);
+
+-- Per-user totals maintained by the API (see user_directory.py) for the admin user list
+CREATE TABLE IF NOT EXISTS user_stats (
+  user_id INT PRIMARY KEY,
+  model_count INT UNSIGNED NOT NULL DEFAULT 0,
+  total_bytes BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  last_activity_at TIMESTAMP NULL,
+  FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+  INDEX idx_stats_models (model_count),
+  INDEX idx_stats_bytes (total_bytes),
+  INDEX idx_stats_activity (last_activity_at)
 );
 
 -- Create user_databases table to track each user's database
@@ -34,7 +49,9 @@ CREATE TABLE IF NOT EXISTS user_sessions (
   session_token VARCHAR(255) UNIQUE NOT NULL,
   expires_at TIMESTAMP NOT NULL,
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-  FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+  FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+  INDEX idx_session_user (user_id, expires_at),
+  INDEX idx_session_expires (expires_at)
 );
 
 -- Create folders table (now user-specific)
@@ -60,11 +77,17 @@ CREATE TABLE IF NOT EXISTS models (
   file_type ENUM('obj', 'ply', 'stl', 'glb', 'gltf') NOT NULL,
   file_size INT NOT NULL,
   triangle_count INT DEFAULT 0,
+  content_hash CHAR(64),
   uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
   FOREIGN KEY (folder_id) REFERENCES folders(id) ON DELETE CASCADE,
   INDEX idx_user_models (user_id),
-  INDEX idx_folder_models (folder_id)
+  INDEX idx_folder_models (folder_id),
+  INDEX idx_content_hash (content_hash),
+  INDEX idx_file_type (file_type),
+  INDEX idx_triangle_count (triangle_count),
+  INDEX idx_uploaded_at (uploaded_at),
+  FULLTEXT INDEX ft_model_text (name, description)
 );
 
 -- Create model_metadata table for additional 3D model information
@@ -80,10 +103,56 @@ CREATE TABLE IF NOT EXISTS model_metadata (
   dimensions_z DECIMAL(10,3),
   acquisition_method ENUM('photogrammetry', '3d_scanning', 'manual_modeling', 'other'),
   notes TEXT,
-  FOREIGN KEY (model_id) REFERENCES models(id) ON DELETE CASCADE
+  FOREIGN KEY (model_id) REFERENCES models(id) ON DELETE CASCADE,
+  UNIQUE KEY unique_model_metadata (model_id),
+  INDEX idx_culture (culture),
+  INDEX idx_period (period),
+  INDEX idx_material (material),
+  INDEX idx_dimensions (dimensions_x, dimensions_y, dimensions_z),
+  FULLTEXT INDEX ft_metadata_notes (notes)
+);
+
+-- Mesh statistics and repair counts computed once at ingest (mesh_validation.py)
+CREATE TABLE IF NOT EXISTS model_stats (
+  model_id INT PRIMARY KEY,
+  vertex_count INT NOT NULL,
+  face_count INT NOT NULL,
+  bbox_min_x DOUBLE,
+  bbox_min_y DOUBLE,
+  bbox_min_z DOUBLE,
+  bbox_max_x DOUBLE,
+  bbox_max_y DOUBLE,
+  bbox_max_z DOUBLE,
+  surface_area DOUBLE,
+  volume DOUBLE,
+  is_watertight BOOLEAN,
+  is_winding_consistent BOOLEAN,
+  component_count INT,
+  boundary_edges INT,
+  non_manifold_edges INT,
+  nan_vertices INT DEFAULT 0,
+  invalid_faces INT DEFAULT 0,
+  duplicate_vertices INT DEFAULT 0,
+  degenerate_faces INT DEFAULT 0,
+  duplicate_faces INT DEFAULT 0,
+  unreferenced_vertices INT DEFAULT 0,
+  flipped_faces INT DEFAULT 0,
+  repaired BOOLEAN NOT NULL DEFAULT FALSE,
+  out_of_core BOOLEAN NOT NULL DEFAULT FALSE,
+  error VARCHAR(500),
+  validated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (model_id) REFERENCES models(id) ON DELETE CASCADE,
+  INDEX idx_watertight (is_watertight)
 );
 
--- Create user_activity_log table for tracking user actions
+-- Distinct user-agent strings, referenced by id from the activity log
+CREATE TABLE IF NOT EXISTS user_agents (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  ua_hash CHAR(40) NOT NULL UNIQUE,
+  user_agent TEXT NOT NULL
+);
+
+-- Create user_activity_log table for tracking user actions (recent days only, see activity.py)
 CREATE TABLE IF NOT EXISTS user_activity_log (
   id INT AUTO_INCREMENT PRIMARY KEY,
   user_id INT NOT NULL,
@@ -92,14 +161,49 @@ CREATE TABLE IF NOT EXISTS user_activity_log (
   resource_id INT,
   details JSON,
   ip_address VARCHAR(45),
-  user_agent TEXT,
+  user_agent_id INT,
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-  INDEX idx_user_activity (user_id, created_at)
+  FOREIGN KEY (user_agent_id) REFERENCES user_agents(id),
+  INDEX idx_user_activity (user_id, created_at),
+  INDEX idx_activity_created (created_at)
+);
+
+-- Older activity rotated out of user_activity_log, kept until the retention window passes
+CREATE TABLE IF NOT EXISTS user_activity_archive (
+  id INT PRIMARY KEY,
+  user_id INT NOT NULL,
+  action VARCHAR(100) NOT NULL,
+  resource_type VARCHAR(50),
+  resource_id INT,
+  details JSON,
+  ip_address VARCHAR(45),
+  user_agent_id INT,
+  created_at TIMESTAMP NOT NULL,
+  INDEX idx_archive_user (user_id, created_at),
+  INDEX idx_archive_created (created_at)
+);
+
+-- Daily activity rollups used by admin analytics
+CREATE TABLE IF NOT EXISTS activity_daily_user (
+  day DATE NOT NULL,
+  user_id INT NOT NULL,
+  action VARCHAR(100) NOT NULL,
+  count INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, user_id, action),
+  INDEX idx_daily_user (user_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS activity_daily_action (
+  day DATE NOT NULL,
+  action VARCHAR(100) NOT NULL,
+  count INT NOT NULL DEFAULT 0,
+  users INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, action)
 );
 
--- Insert sample users
-INSERT INTO users (username, email, password_hash, first_name, last_name, organization, role) VALUES 
+-- Insert sample users (skipped if they exist, so init-db can be re-run)
+INSERT IGNORE INTO users (username, email, password_hash, first_name, last_name, organization, role) VALUES 
   ('admin', 'admin@heritage.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewdBPj/VJWZp/k/K', 'Admin', 'User', 'Heritage Institute', 'admin'),
   ('researcher1', 'researcher@heritage.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewdBPj/VJWZp/k/K', 'John', 'Smith', 'University Museum', 'researcher'),
   ('curator1', 'curator@heritage.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewdBPj/VJWZp/k/K', 'Jane', 'Doe', 'National Gallery', 'curator');
@@ -0,0 +1,271 @@
+"""
+Full-text and faceted search over models and model_metadata
+
+Text matching uses the FULLTEXT indexes on models(name, description) and
+model_metadata(notes); facet counts and range filters use the plain
+column indexes declared in schema_with_auth.sql.
+"""
+
+import re
+import mysql.connector
+import db
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple
+
+FACET_COLUMNS = {
+    'culture': 'mm.culture',
+    'period': 'mm.period',
+    'material': 'mm.material',
+    'file_type': 'm.file_type'
+}
+
+# Query parameter -> (column, comparison)
+RANGE_FILTERS = {
+    'min_triangles': ('m.triangle_count', '>='),
+    'max_triangles': ('m.triangle_count', '<='),
+    'min_dim_x': ('mm.dimensions_x', '>='),
+    'max_dim_x': ('mm.dimensions_x', '<='),
+    'min_dim_y': ('mm.dimensions_y', '>='),
+    'max_dim_y': ('mm.dimensions_y', '<='),
+    'min_dim_z': ('mm.dimensions_z', '>='),
+    'max_dim_z': ('mm.dimensions_z', '<=')
+}
+
+METADATA_FIELDS = ['artifact_type', 'period', 'culture', 'material',
+                   'dimensions_x', 'dimensions_y', 'dimensions_z',
+                   'acquisition_method', 'notes']
+
+DEFAULT_PER_PAGE = 24
+MAX_PER_PAGE = 100
+FACET_LIMIT = 50
+
+
+def to_boolean_query(text: str) -> str:
+    """Turn free text into a prefix-matching FULLTEXT boolean query"""
+    words = re.findall(r'\w+', text, flags=re.UNICODE)
+    return ' '.join(f"{word}*" for word in words[:20])
+
+
+class ModelSearch:
+    def __init__(self, db_config: Dict[str, str]):
+        self.db_config = db_config
+
+    def get_db_connection(self):
+        """Get database connection"""
+        try:
+            return db.connect(self.db_config)
+        except mysql.connector.Error as err:
+            print(f"Database connection error: {err}")
+            return None
+
+    def parse_params(self, args) -> Dict[str, Any]:
+        """Validate request arguments into a search spec or {'error': ...}"""
+        spec = {'filters': {}, 'ranges': {}}
+
+        spec['text'] = to_boolean_query(args.get('q', ''))
+
+        for facet in FACET_COLUMNS:
+            value = args.get(facet)
+            if value:
+                spec['filters'][facet] = value
+
+        for name in RANGE_FILTERS:
+            value = args.get(name)
+            if value in (None, ''):
+                continue
+            try:
+                spec['ranges'][name] = float(value)
+            except ValueError:
+                return {"error": f"Invalid number for {name}"}
+
+        try:
+            spec['page'] = max(1, int(args.get('page', 1)))
+            spec['per_page'] = min(MAX_PER_PAGE, max(1, int(args.get('per_page', DEFAULT_PER_PAGE))))
+        except ValueError:
+            return {"error": "page and per_page must be integers"}
+
+        return spec
+
+    def _where(self, spec: Dict[str, Any], skip_facet: Optional[str] = None) -> Tuple[str, List[Any]]:
+        """WHERE clause over models m / model_metadata mm for a search spec"""
+        clauses = []
+        params = []
+
+        if spec['text']:
+            # Union of two index-backed lookups instead of an OR across the join
+            clauses.append("""m.id IN (
+                SELECT id FROM models WHERE MATCH(name, description) AGAINST (%s IN BOOLEAN MODE)
+                UNION
+                SELECT model_id FROM model_metadata WHERE MATCH(notes) AGAINST (%s IN BOOLEAN MODE)
+            )""")
+            params.extend([spec['text'], spec['text']])
+
+        for facet, value in spec['filters'].items():
+            if facet == skip_facet:
+                continue
+            clauses.append(f"{FACET_COLUMNS[facet]} = %s")
+            params.append(value)
+
+        for name, value in spec['ranges'].items():
+            column, op = RANGE_FILTERS[name]
+            clauses.append(f"{column} {op} %s")
+            params.append(value)
+
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def search(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a parsed search: one page of ranked results plus facet counts"""
+        conn = self.get_db_connection()
+        if not conn:
+            return {"error": "Database connection failed"}
+
+        try:
+            cursor = conn.cursor(dictionary=True)
+            where, params = self._where(spec)
+
+            cursor.execute(f"""
+                SELECT COUNT(*) AS total
+                FROM models m
+                LEFT JOIN model_metadata mm ON mm.model_id = m.id
+                {where}
+            """, params)
+            total = cursor.fetchone()['total']
+
+            if spec['text']:
+                relevance = """(MATCH(m.name, m.description) AGAINST (%s IN BOOLEAN MODE) * 2
+                    + COALESCE(MATCH(mm.notes) AGAINST (%s IN BOOLEAN MODE), 0))"""
+                relevance_params = [spec['text'], spec['text']]
+                order_by = "relevance DESC, m.uploaded_at DESC"
+            else:
+                relevance = "0"
+                relevance_params = []
+                order_by = "m.uploaded_at DESC"
+
+            offset = (spec['page'] - 1) * spec['per_page']
+            cursor.execute(f"""
+                SELECT
+                    m.id,
+                    m.name,
+                    m.description,
+                    m.file_type,
+                    m.file_size,
+                    m.triangle_count,
+                    m.uploaded_at,
+                    m.folder_id,
+                    m.file_path,
+                    m.content_hash,
+                    f.name as folder_name,
+                    u.username as uploader_username,
+                    CONCAT(u.first_name, ' ', u.last_name) as uploader_name,
+                    u.organization as uploader_organization,
+                    mm.artifact_type,
+                    mm.period,
+                    mm.culture,
+                    mm.material,
+                    mm.dimensions_x,
+                    mm.dimensions_y,
+                    mm.dimensions_z,
+                    {relevance} AS relevance
+                FROM models m
+                JOIN folders f ON m.folder_id = f.id
+                JOIN users u ON m.user_id = u.id
+                LEFT JOIN model_metadata mm ON mm.model_id = m.id
+                {where}
+                ORDER BY {order_by}
+                LIMIT %s OFFSET %s
+            """, relevance_params + params + [spec['per_page'], offset])
+            results = cursor.fetchall()
+
+            for row in results:
+                if row['uploaded_at']:
+                    row['uploaded_at'] = row['uploaded_at'].strftime('%Y-%m-%d')
+                for key, value in row.items():
+                    if isinstance(value, Decimal):
+                        row[key] = float(value)
+                row['relevance'] = float(row['relevance'] or 0)
+
+            # Each facet ignores its own filter so the other values stay selectable
+            facets = {}
+            for facet, column in FACET_COLUMNS.items():
+                facet_where, facet_params = self._where(spec, skip_facet=facet)
+                cursor.execute(f"""
+                    SELECT {column} AS value, COUNT(*) AS count
+                    FROM models m
+                    LEFT JOIN model_metadata mm ON mm.model_id = m.id
+                    {facet_where}
+                    GROUP BY {column}
+                    ORDER BY count DESC
+                    LIMIT {FACET_LIMIT}
+                """, facet_params)
+                facets[facet] = [row for row in cursor.fetchall() if row['value'] is not None]
+
+            cursor.close()
+            conn.close()
+
+            return {
+                "results": results,
+                "facets": facets,
+                "total": total,
+                "page": spec['page'],
+                "per_page": spec['per_page'],
+                "pages": (total + spec['per_page'] - 1) // spec['per_page']
+            }
+
+        except Exception as e:
+            print(f"Search error: {e}")
+            return {"error": f"Search failed: {str(e)}"}
+
+    def get_metadata(self, model_id: int) -> Optional[Dict[str, Any]]:
+        """Metadata row for a model, or None if none has been saved"""
+        conn = self.get_db_connection()
+        if not conn:
+            return None
+
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"""
+                SELECT {', '.join(METADATA_FIELDS)}
+                FROM model_metadata
+                WHERE model_id = %s
+            """, (model_id,))
+            metadata = cursor.fetchone()
+            cursor.close()
+            conn.close()
+
+            if metadata:
+                for key, value in metadata.items():
+                    if isinstance(value, Decimal):
+                        metadata[key] = float(value)
+            return metadata
+
+        except Exception as e:
+            print(f"Error reading model metadata: {e}")
+            return None
+
+    def save_metadata(self, model_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert or update the metadata row for a model"""
+        fields = [field for field in METADATA_FIELDS if field in data]
+        if not fields:
+            return {"error": "No metadata fields to update"}
+
+        conn = self.get_db_connection()
+        if not conn:
+            return {"error": "Database connection failed"}
+
+        try:
+            cursor = conn.cursor()
+            columns = ', '.join(['model_id'] + fields)
+            placeholders = ', '.join(['%s'] * (len(fields) + 1))
+            updates = ', '.join(f"{field} = VALUES({field})" for field in fields)
+            cursor.execute(f"""
+                INSERT INTO model_metadata ({columns})
+                VALUES ({placeholders})
+                ON DUPLICATE KEY UPDATE {updates}
+            """, [model_id] + [data[field] for field in fields])
+            cursor.close()
+            conn.close()
+            return {"success": True}
+
+        except Exception as e:
+            print(f"Error saving model metadata: {e}")
+            return {"error": f"Metadata update failed: {str(e)}"}
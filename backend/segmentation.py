@@ -0,0 +1,203 @@
+"""
+Mesh segmentation for artifact part decomposition
+
+Splits a triangle mesh into connected components and then into smooth
+regions separated by sharp creases (dihedral-angle region growing), e.g.
+the base, body and handle of a vessel. Everything is computed on a face
+adjacency graph built with vectorized NumPy / SciPy sparse operations.
+"""
+
+import os
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from typing import Dict, Any, Optional, Tuple
+
+from mesh_utils import load_mesh_arrays
+
+DEFAULT_ANGLE_THRESHOLD = 30.0  # degrees between neighbouring face normals
+DEFAULT_MIN_SEGMENT_FACES = 50
+
+
+def compact_dtype(max_value: int) -> np.dtype:
+    """Smallest unsigned integer dtype able to hold max_value"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def face_adjacency(faces: np.ndarray, vertex_count: int) -> np.ndarray:
+    """
+    Return an (M, 2) array of face index pairs sharing an edge.
+    Non-manifold edges (more than two faces) chain their faces together.
+    """
+    faces = np.asarray(faces, dtype=np.int64)
+    face_count = len(faces)
+    if face_count == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    edges = np.sort(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    keys = edges[:, 0] * np.int64(vertex_count) + edges[:, 1]
+    owners = np.repeat(np.arange(face_count, dtype=np.int64), 3)
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    shared = sorted_keys[1:] == sorted_keys[:-1]
+
+    pairs = np.column_stack((owners[order[:-1][shared]], owners[order[1:][shared]]))
+    # Drop self pairs produced by degenerate faces repeating an edge
+    return pairs[pairs[:, 0] != pairs[:, 1]]
+
+
+def face_normals(vertices: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """Unit face normals (zero for degenerate faces)"""
+    tris = vertices[faces]
+    normals = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1.0
+    return normals / lengths[:, None]
+
+
+def _label_graph(pairs: np.ndarray, face_count: int) -> Tuple[int, np.ndarray]:
+    """Connected components of the face graph given by pairs"""
+    graph = sparse.coo_matrix(
+        (np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])),
+        shape=(face_count, face_count)
+    ).tocsr()
+    return connected_components(graph, directed=False)
+
+
+def _relabel_by_size(labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Renumber labels so segment 0 is the largest; returns (labels, sizes)"""
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    order = np.argsort(-counts, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[inverse.ravel()], counts[order]
+
+
+def _merge_small_segments(labels: np.ndarray, pairs: np.ndarray,
+                          min_faces: int) -> np.ndarray:
+    """
+    Fold segments smaller than min_faces into their largest neighbouring
+    segment in the same component. Segments without neighbours are kept.
+    """
+    sizes = np.bincount(labels)
+    small = sizes < min_faces
+    if not small.any() or len(pairs) == 0:
+        return labels
+
+    a, b = labels[pairs[:, 0]], labels[pairs[:, 1]]
+    crossing = a != b
+    src = np.concatenate((a[crossing], b[crossing]))
+    dst = np.concatenate((b[crossing], a[crossing]))
+    keep = small[src] & ~small[dst]
+    src, dst = src[keep], dst[keep]
+    if len(src) == 0:
+        return labels
+
+    # For every small segment pick the neighbour with the most faces
+    order = np.lexsort((-sizes[dst], src))
+    src, dst = src[order], dst[order]
+    first = np.ones(len(src), dtype=bool)
+    first[1:] = src[1:] != src[:-1]
+
+    target = np.arange(len(sizes))
+    target[src[first]] = dst[first]
+    return target[labels]
+
+
+def segment_mesh(vertices: np.ndarray, faces: np.ndarray,
+                 angle_threshold: float = DEFAULT_ANGLE_THRESHOLD,
+                 min_segment_faces: int = DEFAULT_MIN_SEGMENT_FACES) -> Dict[str, Any]:
+    """
+    Decompose a mesh into parts.
+
+    Faces are first grouped into connected components, then each component
+    is split where the dihedral angle between neighbouring faces exceeds
+    angle_threshold. Returned labels are ordered by segment size.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    face_count = len(faces)
+
+    if face_count == 0:
+        return {
+            'component_count': 0,
+            'segment_count': 0,
+            'labels': np.empty(0, dtype=np.uint8),
+            'segment_sizes': np.empty(0, dtype=np.int64)
+        }
+
+    pairs = face_adjacency(faces, len(vertices))
+    component_count, _ = _label_graph(pairs, face_count)
+
+    normals = face_normals(vertices, faces)
+    cos_angle = np.einsum('ij,ij->i', normals[pairs[:, 0]], normals[pairs[:, 1]])
+    smooth = cos_angle >= np.cos(np.radians(angle_threshold))
+    _, labels = _label_graph(pairs[smooth], face_count)
+
+    if min_segment_faces > 1:
+        labels = _merge_small_segments(labels, pairs, min_segment_faces)
+
+    labels, sizes = _relabel_by_size(labels)
+
+    return {
+        'component_count': int(component_count),
+        'segment_count': int(len(sizes)),
+        'labels': labels.astype(compact_dtype(len(sizes) - 1)),
+        'segment_sizes': sizes
+    }
+
+
+class MeshSegmenter:
+    """Computes and caches face-to-segment arrays per model"""
+
+    def __init__(self, cache_dir: str,
+                 angle_threshold: float = DEFAULT_ANGLE_THRESHOLD,
+                 min_segment_faces: int = DEFAULT_MIN_SEGMENT_FACES):
+        self.cache_dir = os.path.join(cache_dir, 'segments')
+        self.angle_threshold = angle_threshold
+        self.min_segment_faces = min_segment_faces
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def cache_path(self, model_id: int) -> str:
+        """Cache file for a model's labels with the current parameters"""
+        name = f"model_{model_id}_{self.angle_threshold:g}_{self.min_segment_faces}.npy"
+        return os.path.join(self.cache_dir, name)
+
+    def load_mesh(self, file_path: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Load vertices and faces, merging duplicate vertices so edges are shared"""
+        try:
+            return load_mesh_arrays(file_path)
+        except Exception as e:
+            print(f"Error loading model for segmentation {file_path}: {e}")
+            return None
+
+    def get_labels(self, model_id: int, file_path: str) -> Optional[np.ndarray]:
+        """Face-to-segment labels for a model, computed once and then cached"""
+        path = self.cache_path(model_id)
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(file_path):
+            return np.load(path)
+
+        loaded = self.load_mesh(file_path)
+        if loaded is None:
+            return None
+
+        result = segment_mesh(*loaded, angle_threshold=self.angle_threshold,
+                              min_segment_faces=self.min_segment_faces)
+        labels = result['labels']
+
+        # Write through a temp file so concurrent readers never see partial data
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, labels)
+        os.replace(tmp_path, path)
+        return labels
+
+    def invalidate(self, model_id: int):
+        """Drop cached labels for a model"""
+        prefix = f"model_{model_id}_"
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix):
+                os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,381 @@
+"""
+Configuration, shared objects and helpers behind the API servers
+
+Both the Flask app (app.py) and the async transfer server
+(async_server.py) import this module, so importing it only builds
+objects: no thread is started and nothing is swept or purged. The
+periodic work (session purge, activity maintenance, stale mesh handle
+cleanup, ingest of uploads registered by the async server) is started by
+start_background_workers(), which only the Flask process calls.
+"""
+
+import os
+import threading
+import time
+import uuid
+import mysql.connector
+from werkzeug.utils import secure_filename
+import db
+from auth import AuthManager
+from passwords import PasswordHasher
+from sessions import SessionManager
+from activity import ActivityLog
+from user_directory import UserDirectory, record_model_added
+from file_offload import FileOffload
+from signed_urls import UrlSigner, MAX_TTL
+from segmentation import MeshSegmenter
+from jobs import JobPool
+from mesh_handle import sweep_stale
+from mesh_utils import is_out_of_core, load_mesh_arrays
+from mesh_validation import MeshValidator
+from derivatives import DerivativeStore, file_content_hash
+from thumbnails import ThumbnailRenderer, THUMBNAIL_NAME, THUMBNAIL_PNG_NAME, TURNTABLE_NAME
+from progressive import ProgressiveEncoder
+from search import ModelSearch
+from similarity import SimilarityIndex
+from querylog import SlowQueryLog
+
+config = {}
+config['SECRET_KEY'] = 'your-secret-key-change-this-in-production-2024'
+
+# Configuration
+UPLOAD_FOLDER = 'uploads'
+CACHE_FOLDER = 'cache'
+ALLOWED_EXTENSIONS = {'obj', 'ply', 'stl', 'glb', 'gltf'}
+MODEL_MIME_TYPES = {
+    'obj': 'text/plain',
+    'ply': 'application/octet-stream',
+    'stl': 'application/octet-stream',
+    'glb': 'model/gltf-binary',
+    'gltf': 'model/gltf+json'
+}
+config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+config['CACHE_FOLDER'] = CACHE_FOLDER
+config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max upload size
+
+# Opt-in request profiling: send `X-Profile: <token>` or sample a fraction of requests
+config['PROFILE_FOLDER'] = os.path.join(CACHE_FOLDER, 'profiles')
+config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN')
+config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+config['PROFILE_MODE'] = os.environ.get('PROFILE_MODE', 'sampler')  # or 'cprofile'
+
+# Statements slower than this are logged with an EXPLAIN of their first occurrence
+config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+config['SLOW_QUERY_LOG'] = os.path.join(CACHE_FOLDER, 'slow_queries.log')
+
+# How model files are served: python | x-accel | x-sendfile | sendfile (see file_offload.py)
+config['FILE_OFFLOAD_MODE'] = os.environ.get('FILE_OFFLOAD_MODE', 'python')
+config['FILE_OFFLOAD_PREFIX'] = os.environ.get('FILE_OFFLOAD_PREFIX', '/protected-uploads/')
+
+# bcrypt runs on its own bounded pool; logins past the queue limit get a 429
+config['BCRYPT_ROUNDS'] = int(os.environ.get('BCRYPT_ROUNDS', 12))
+config['BCRYPT_WORKERS'] = int(os.environ.get('BCRYPT_WORKERS', os.cpu_count() or 1))
+config['BCRYPT_MAX_QUEUE'] = int(os.environ.get('BCRYPT_MAX_QUEUE', 4 * config['BCRYPT_WORKERS']))
+
+# Login sessions: lifetime, concurrent cap per user, and expired-row purge cadence
+config['SESSION_TTL_HOURS'] = 24
+config['MAX_SESSIONS_PER_USER'] = 10
+config['SESSION_PURGE_BATCH'] = 1000
+config['SESSION_PURGE_INTERVAL'] = 300  # seconds
+
+# Activity log: days kept in the live table, days kept in the archive, batch size for moves/deletes
+config['ACTIVITY_HOT_DAYS'] = 30
+config['ACTIVITY_RETENTION_DAYS'] = 365
+config['ACTIVITY_BATCH_SIZE'] = 5000
+config['ACTIVITY_MAINTENANCE_INTERVAL'] = 3600  # seconds
+
+# Repair uploads at ingest (the file is kept as uploaded; derivatives use the repaired mesh)
+config['INGEST_REPAIR'] = os.environ.get('INGEST_REPAIR', '1').lower() not in ('0', 'false', 'no')
+
+# Uploads registered without ingest (async server) are picked up by the Flask process
+config['INGEST_SWEEP_INTERVAL'] = 30  # seconds
+config['INGEST_SWEEP_HOURS'] = 24  # how far back to look for models without stats
+config['INGEST_SWEEP_BATCH'] = 100
+
+# Ensure upload directory exists
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(CACHE_FOLDER, exist_ok=True)
+
+# Database connection configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'heritage_user',
+    'password': 'heritage_password123',
+    'database': 'cultural_heritage',
+    'autocommit': True
+}
+
+# Per-fingerprint statement stats and slow query log; each server installs it
+slow_query_log = SlowQueryLog(DB_CONFIG, config['SLOW_QUERY_LOG'], config['SLOW_QUERY_MS'])
+
+# Initialize auth manager
+password_hasher = PasswordHasher(config['BCRYPT_ROUNDS'], config['BCRYPT_WORKERS'],
+                                 config['BCRYPT_MAX_QUEUE'])
+session_manager = SessionManager(DB_CONFIG, config['SESSION_TTL_HOURS'],
+                                 config['MAX_SESSIONS_PER_USER'],
+                                 config['SESSION_PURGE_BATCH'], config['SESSION_PURGE_INTERVAL'])
+activity_log = ActivityLog(DB_CONFIG, config['ACTIVITY_HOT_DAYS'], config['ACTIVITY_RETENTION_DAYS'],
+                           config['ACTIVITY_BATCH_SIZE'], config['ACTIVITY_MAINTENANCE_INTERVAL'])
+auth_manager = AuthManager(DB_CONFIG, config['SECRET_KEY'], password_hasher, session_manager,
+                           activity_log)
+
+# Mesh part decomposition, cached per model under CACHE_FOLDER
+segmenter = MeshSegmenter(CACHE_FOLDER)
+
+# Background processing and content-addressed derivatives (thumbnails, ...)
+job_pool = JobPool(max_workers=2)
+derivative_store = DerivativeStore(CACHE_FOLDER)
+thumbnail_renderer = ThumbnailRenderer(derivative_store)
+progressive_encoder = ProgressiveEncoder(derivative_store)
+
+# Model downloads, optionally handed to the front proxy or os.sendfile
+file_offload = FileOffload(config['FILE_OFFLOAD_MODE'], UPLOAD_FOLDER, config['FILE_OFFLOAD_PREFIX'])
+
+# Expiring signed URLs for model files and derivatives, served without DB access
+url_signer = UrlSigner(config['SECRET_KEY'], {'uploads': UPLOAD_FOLDER, 'cache': CACHE_FOLDER})
+# Long enough for a viewer to stream every chunk of a large model
+PROGRESSIVE_URL_TTL = MAX_TTL
+# Preview images are the only derivatives served without an ownership check
+PUBLIC_DERIVATIVES = {THUMBNAIL_NAME, THUMBNAIL_PNG_NAME, TURNTABLE_NAME}
+
+# Admin user listing over maintained per-user stats
+user_directory = UserDirectory(DB_CONFIG)
+
+# Full-text / faceted search over models and model_metadata
+model_search = ModelSearch(DB_CONFIG)
+
+# Shape descriptors for geometric similarity, computed at ingest
+similarity_index = SimilarityIndex(CACHE_FOLDER)
+
+# Validation/repair and the model_stats row, computed at ingest
+mesh_validator = MeshValidator(DB_CONFIG, config['INGEST_REPAIR'])
+
+# Database connection
+def get_db_connection():
+    try:
+        conn = db.connect(DB_CONFIG)
+        return conn
+    except mysql.connector.Error as err:
+        print(f"Database connection error: {err}")
+        return None
+
+def get_user_db_connection(user_id: int):
+    """Get connection to user's database"""
+    return get_db_connection()
+
+# Helper function to check allowed file extensions
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def queue_thumbnail_render(file_path: str, content_hash: str):
+    """Render gallery previews in the background unless they exist or failed before"""
+    if (content_hash and not thumbnail_renderer.has_previews(content_hash)
+            and not thumbnail_renderer.has_failed(content_hash)):
+        job_pool.submit(f"thumbnail:{content_hash}", thumbnail_renderer.render_model,
+                        file_path, content_hash)
+
+# Models uploaded before content hashing whose file is gone; not retried per request
+unhashable_models = set()
+
+def backfill_content_hash(model_id: int, file_path: str):
+    """Hash a model uploaded before content hashing, store it and queue its previews"""
+    if not os.path.exists(file_path):
+        print(f"Cannot hash model {model_id}: {file_path} not found")
+        unhashable_models.add(model_id)
+        return None
+    
+    content_hash = file_content_hash(file_path)
+    conn = get_db_connection()
+    if not conn:
+        return None
+    cursor = conn.cursor()
+    cursor.execute("UPDATE models SET content_hash = %s WHERE id = %s AND content_hash IS NULL",
+                   (content_hash, model_id))
+    cursor.close()
+    conn.close()
+    queue_thumbnail_render(file_path, content_hash)
+    return content_hash
+
+def queue_content_hash(model_id: int, file_path: str):
+    """Backfill a legacy model's content hash once, in the background"""
+    if model_id not in unhashable_models:
+        job_pool.submit(f"hash:{model_id}", backfill_content_hash, model_id, file_path)
+
+def queue_progressive_encoding(file_path: str, content_hash: str):
+    """Split a model into base mesh + meshlet chunks in the background"""
+    if (content_hash and not progressive_encoder.has_encoding(content_hash)
+            and not progressive_encoder.has_failed(content_hash)):
+        job_pool.submit(f"progressive:{content_hash}", progressive_encoder.encode_model,
+                        file_path, content_hash)
+
+def ingest_model(model_id: int, file_path: str, content_hash: str):
+    """Parse an upload once, validate it and hand the mesh to every derivative stage"""
+    # model_stats (or its failure row) is written before any stage is queued, so the
+    # ingest sweep never picks the model up again whichever stages later bail out
+    try:
+        if is_out_of_core(file_path):
+            # Statistics are streamed; each stage streams its own bounded proxy
+            mesh_validator.validate_model(model_id, file_path)
+            mesh = None
+        else:
+            vertices, faces = load_mesh_arrays(file_path)
+            vertices, faces, report = mesh_validator.check(vertices, faces)
+            mesh_validator.save(model_id, report)
+            mesh = (vertices, faces)
+    except Exception as e:
+        print(f"Error loading model for ingest {file_path}: {e}")
+        mesh_validator.save_failure(model_id, e)
+        return
+    
+    stages = [(f"similarity:{model_id}", similarity_index.index_model, model_id, file_path)]
+    if content_hash and not thumbnail_renderer.has_previews(content_hash):
+        stages.append((f"thumbnail:{content_hash}", thumbnail_renderer.render_model, file_path, content_hash))
+    if (content_hash and not progressive_encoder.has_encoding(content_hash)
+            and not progressive_encoder.has_failed(content_hash)):
+        stages.append((f"progressive:{content_hash}", progressive_encoder.encode_model, file_path, content_hash))
+    
+    # Stages run on this process's thread pool, so they share the arrays as
+    # they are (read-only); a stage already queued from the file path is kept
+    for key, fn, *args in stages:
+        if mesh is None:
+            job_pool.submit(key, fn, *args)
+        else:
+            job_pool.submit(key, fn, *args, mesh=mesh)
+
+def user_owns_folder(folder_id: int, user_id: int):
+    """True/False, or None if the database is unavailable"""
+    conn = get_user_db_connection(user_id)
+    if not conn:
+        return None
+    
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM folders WHERE id = %s AND user_id = %s", (folder_id, user_id))
+    owned = cursor.fetchone() is not None
+    cursor.close()
+    conn.close()
+    return owned
+
+def new_upload_path(user_id: int, filename: str):
+    """(secure name, extension, unique path under the user's upload dir)"""
+    user_upload_dir = os.path.join(config['UPLOAD_FOLDER'], f"user_{user_id}")
+    os.makedirs(user_upload_dir, exist_ok=True)
+    
+    filename = secure_filename(filename)
+    file_extension = filename.rsplit('.', 1)[1].lower()
+    unique_filename = f"{uuid.uuid4()}.{file_extension}"
+    return filename, file_extension, os.path.join(user_upload_dir, unique_filename)
+
+def register_uploaded_model(user_id: int, folder_id: int, filename: str, file_extension: str,
+                            file_path: str, description: str, content_hash: str = None, ingest: bool = True):
+    """
+    Record a saved upload and queue its derivatives; returns the API response body.
+    With ingest=False the Flask process's ingest sweep picks the model up instead.
+    """
+    file_size = os.path.getsize(file_path)
+    if content_hash is None:
+        content_hash = file_content_hash(file_path)
+    
+    conn = get_user_db_connection(user_id)
+    if not conn:
+        raise mysql.connector.Error("Database connection failed")
+    
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO models (user_id, folder_id, name, description, file_path, file_type, file_size, content_hash)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """, (user_id, folder_id, filename, description, file_path, file_extension, file_size, content_hash))
+    
+    model_id = cursor.lastrowid
+    record_model_added(cursor, user_id, file_size)
+    cursor.close()
+    conn.close()
+    
+    if ingest:
+        job_pool.submit(f"ingest:{model_id}", ingest_model, model_id, file_path, content_hash)
+    
+    auth_manager.log_user_activity(
+        user_id=user_id,
+        action='upload_model',
+        resource_type='model',
+        resource_id=model_id,
+        details={'filename': filename, 'file_size': file_size}
+    )
+    
+    return {
+        "id": model_id,
+        "name": filename,
+        "file_type": file_extension,
+        "file_size": file_size
+    }
+
+def get_model_file(model_id: int, user_id: int):
+    """file_path/name/file_type of a user's model, None if missing; raises if the DB is down"""
+    conn = get_user_db_connection(user_id)
+    if not conn:
+        raise mysql.connector.Error("Database connection failed")
+    
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT file_path, name, file_type, content_hash 
+        FROM models 
+        WHERE id = %s AND user_id = %s
+    """, (model_id, user_id))
+    model = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return model
+
+def model_mime_type(file_type: str) -> str:
+    return MODEL_MIME_TYPES.get(file_type, 'application/octet-stream')
+
+
+def queue_pending_ingests() -> int:
+    """Ingest recent uploads that have no model_stats row yet; returns how many were queued"""
+    conn = get_db_connection()
+    if not conn:
+        return 0
+    
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT m.id, m.file_path, m.content_hash
+            FROM models m
+            LEFT JOIN model_stats s ON s.model_id = m.id
+            WHERE s.model_id IS NULL AND m.uploaded_at >= NOW() - INTERVAL %s HOUR
+            ORDER BY m.id
+            LIMIT %s
+        """, (config['INGEST_SWEEP_HOURS'], config['INGEST_SWEEP_BATCH']))
+        rows = cursor.fetchall()
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        print(f"Error finding models to ingest: {e}")
+        return 0
+    
+    # Keyed like register_uploaded_model's job, so a queued or running ingest is not
+    # repeated; once it has run the model has a model_stats row and drops out of this query
+    for model_id, file_path, content_hash in rows:
+        job_pool.submit(f"ingest:{model_id}", ingest_model, model_id, file_path, content_hash)
+    return len(rows)
+
+_background_started = False
+_background_lock = threading.Lock()
+
+def _ingest_sweep_loop():
+    while True:
+        time.sleep(config['INGEST_SWEEP_INTERVAL'])
+        queue_pending_ingests()
+
+def start_background_workers():
+    """Start this process's periodic maintenance; call from one server process only (idempotent)"""
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    
+    session_manager.start_purger()
+    activity_log.start()
+    # Shared mesh arrays left behind by a crashed worker
+    sweep_stale()
+    threading.Thread(target=_ingest_sweep_loop, name='ingest-sweep', daemon=True).start()
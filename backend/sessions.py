@@ -0,0 +1,180 @@
+"""
+Login session lifecycle
+
+Each login creates a user_sessions row whose token is carried in the JWT
+(`sid`), so a JWT is only accepted while its session exists and has not
+expired; deleting the row revokes it. Users keep at most
+max_per_user sessions (oldest dropped on login), and a background thread
+purges expired rows in bounded batches using idx_session_expires.
+"""
+
+import secrets
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import mysql.connector
+
+import db
+
+
+class SessionManager:
+    def __init__(self, db_config: Dict[str, str], ttl_hours: int = 24, max_per_user: int = 10,
+                 purge_batch: int = 1000, purge_interval: int = 300):
+        self.db_config = db_config
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_per_user = max_per_user
+        self.purge_batch = purge_batch
+        self.purge_interval = purge_interval
+        self.purged_total = 0
+        self.last_purge = None
+        self._purger = None
+        self._stop = threading.Event()
+
+    def get_db_connection(self):
+        """Get database connection"""
+        try:
+            return db.connect(self.db_config)
+        except mysql.connector.Error as err:
+            print(f"Database connection error: {err}")
+            return None
+
+    def create_session(self, cursor, user_id: int) -> Tuple[str, datetime]:
+        """Insert a session on the caller's cursor and enforce the per-user cap"""
+        session_token = secrets.token_urlsafe(32)
+        expires_at = datetime.now() + self.ttl
+        cursor.execute("""
+            INSERT INTO user_sessions (user_id, session_token, expires_at)
+            VALUES (%s, %s, %s)
+        """, (user_id, session_token, expires_at))
+
+        # Newest session that falls outside the cap; it and everything older goes
+        cursor.execute("""
+            SELECT id FROM user_sessions
+            WHERE user_id = %s
+            ORDER BY id DESC
+            LIMIT 1 OFFSET %s
+        """, (user_id, self.max_per_user))
+        cutoff = cursor.fetchone()
+        if cutoff:
+            cutoff_id = cutoff['id'] if isinstance(cutoff, dict) else cutoff[0]
+            cursor.execute("DELETE FROM user_sessions WHERE user_id = %s AND id <= %s",
+                           (user_id, cutoff_id))
+
+        return session_token, expires_at
+
+    def revoke(self, session_id: int) -> bool:
+        """Delete one session; JWTs that carry it stop working immediately"""
+        conn = self.get_db_connection()
+        if not conn:
+            return False
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM user_sessions WHERE id = %s", (session_id,))
+            revoked = cursor.rowcount > 0
+            cursor.close()
+            conn.close()
+            return revoked
+        except Exception as e:
+            print(f"Error revoking session: {e}")
+            return False
+
+    def revoke_all(self, user_id: int) -> int:
+        """Delete every session of a user; returns how many were removed"""
+        conn = self.get_db_connection()
+        if not conn:
+            return 0
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM user_sessions WHERE user_id = %s", (user_id,))
+            revoked = cursor.rowcount
+            cursor.close()
+            conn.close()
+            return revoked
+        except Exception as e:
+            print(f"Error revoking sessions: {e}")
+            return 0
+
+    def purge_expired(self, max_batches: int = 100) -> int:
+        """Delete expired sessions in LIMITed batches so no single DELETE holds locks for long"""
+        conn = self.get_db_connection()
+        if not conn:
+            return 0
+
+        purged = 0
+        try:
+            cursor = conn.cursor()
+            for _ in range(max_batches):
+                cursor.execute("""
+                    DELETE FROM user_sessions
+                    WHERE expires_at < NOW()
+                    ORDER BY expires_at
+                    LIMIT %s
+                """, (self.purge_batch,))
+                purged += cursor.rowcount
+                if cursor.rowcount < self.purge_batch or self._stop.wait(0.05):
+                    break
+            cursor.close()
+            conn.close()
+        except Exception as e:
+            print(f"Error purging sessions: {e}")
+
+        self.purged_total += purged
+        self.last_purge = datetime.now()
+        return purged
+
+    def _purge_loop(self):
+        while not self._stop.wait(self.purge_interval):
+            self.purge_expired()
+
+    def start_purger(self):
+        """Start the background purge thread (idempotent)"""
+        if self._purger is None:
+            self._purger = threading.Thread(target=self._purge_loop, name='session-purger', daemon=True)
+            self._purger.start()
+
+    def stop_purger(self):
+        self._stop.set()
+
+    def stats(self) -> Optional[Dict[str, Any]]:
+        """Session counts for the admin dashboard, or None if the DB is down"""
+        conn = self.get_db_connection()
+        if not conn:
+            return None
+
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT
+                    SUM(expires_at >= NOW()) AS active,
+                    SUM(expires_at < NOW()) AS expired,
+                    COUNT(DISTINCT CASE WHEN expires_at >= NOW() THEN user_id END) AS users
+                FROM user_sessions
+            """)
+            counts = cursor.fetchone()
+            cursor.execute("""
+                SELECT COUNT(*) AS sessions
+                FROM user_sessions
+                WHERE expires_at >= NOW()
+                GROUP BY user_id
+                ORDER BY sessions DESC
+                LIMIT 1
+            """)
+            busiest = cursor.fetchone()
+            cursor.close()
+            conn.close()
+
+            return {
+                "active_sessions": int(counts['active'] or 0),
+                "expired_pending_purge": int(counts['expired'] or 0),
+                "users_with_sessions": int(counts['users'] or 0),
+                "max_sessions_for_one_user": busiest['sessions'] if busiest else 0,
+                "max_per_user": self.max_per_user,
+                "purged_total": self.purged_total,
+                "last_purge": self.last_purge.isoformat() if self.last_purge else None
+            }
+        except Exception as e:
+            print(f"Error reading session stats: {e}")
+            return None
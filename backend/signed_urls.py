@@ -0,0 +1,91 @@
+"""
+Short-lived HMAC-signed file URLs
+
+An authenticated endpoint does the ownership check once and issues a URL
+whose token carries everything needed to serve the file: model id,
+derivative name, user id, expiry and the file's location relative to a
+known root. The file route only checks the signature and expiry, so
+ranged/chunked loads hit no DB and no auth lookup, and the response can
+be cached (publicly) until the URL expires.
+
+Expiry is rounded up to EXPIRY_GRANULARITY so URLs issued for the same
+file within that window are identical and share cache entries.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_TTL = 300
+MAX_TTL = 3600
+EXPIRY_GRANULARITY = 60
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class UrlSigner:
+    def __init__(self, secret_key: str, roots: Dict[str, str]):
+        # Separate key so signed URLs cannot be confused with other uses of SECRET_KEY
+        self.key = hashlib.sha256(b'signed-file-urls:' + secret_key.encode('utf-8')).digest()
+        self.roots = {name: os.path.abspath(path) for name, path in roots.items()}
+
+    def _signature(self, payload: bytes) -> str:
+        return _b64encode(hmac.new(self.key, payload, hashlib.sha256).digest())
+
+    def issue(self, model_id: int, derivative: str, user_id: int, path: str, mimetype: str,
+              download_name: str, ttl: int = DEFAULT_TTL) -> Optional[Dict[str, Any]]:
+        """Token and expiry for a file under one of the roots, or None if it is outside them"""
+        location = None
+        absolute = os.path.abspath(path)
+        for root_name, root in self.roots.items():
+            if absolute.startswith(root + os.sep):
+                location = [root_name, os.path.relpath(absolute, root)]
+                break
+        if location is None:
+            return None
+
+        ttl = max(1, min(ttl, MAX_TTL))
+        expires = -(-(int(time.time()) + ttl) // EXPIRY_GRANULARITY) * EXPIRY_GRANULARITY
+        payload = json.dumps({
+            'm': model_id, 'd': derivative, 'u': user_id, 'e': expires,
+            'l': location, 't': mimetype, 'n': download_name
+        }, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        return {
+            'token': f"{_b64encode(payload)}.{self._signature(payload)}",
+            'expires_at': expires
+        }
+
+    def verify(self, token: str) -> Optional[Dict[str, Any]]:
+        """Claims of a valid, unexpired token with the resolved file path; None otherwise"""
+        encoded, _, signature = token.partition('.')
+        try:
+            payload = _b64decode(encoded)
+        except (ValueError, TypeError):
+            return None
+        if not signature or not hmac.compare_digest(signature, self._signature(payload)):
+            return None
+
+        claims = json.loads(payload)
+        if claims['e'] < time.time():
+            return None
+
+        root_name, relative = claims['l']
+        root = self.roots.get(root_name)
+        if root is None:
+            return None
+        path = os.path.abspath(os.path.join(root, relative))
+        if not path.startswith(root + os.sep):
+            return None
+
+        claims['path'] = path
+        return claims
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Geometric similarity search across the collection
+
+Every model gets a compact fixed-length shape descriptor at ingest:
+  - D2 shape distribution (distances between random surface points)
+  - A3 distribution (angles between random surface point triples)
+  - normalized second-moment signature (covariance eigenvalue ratios)
+Descriptors are stored in an append-only log shared by every process and
+searched with an IVF (k-means inverted file) index once the collection
+outgrows brute force.
+
+Usage:
+  python similarity.py                  # Index every model not yet indexed
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+import mysql.connector
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: the log is then only safe within one process
+    fcntl = None
+
+from mesh_utils import load_mesh_bounded
+
+D2_BINS = 48
+A3_BINS = 16
+MOMENT_DIMS = 2
+DESCRIPTOR_SIZE = D2_BINS + A3_BINS + MOMENT_DIMS
+SAMPLE_POINTS = 4096
+SAMPLE_PAIRS = 65536
+# Meshes too large for memory are decimated to this before sampling
+DESCRIPTOR_MAX_FACES = 500000
+
+# Exact search is both faster and exact below this many models
+EXACT_SEARCH_LIMIT = 5000
+IVF_PROBES = 4
+
+# One descriptor log record; the latest record for a model decides its state
+RECORD = np.dtype([('model_id', '<i8'), ('op', 'u1'), ('descriptor', '<f4', (DESCRIPTOR_SIZE,))])
+OP_REMOVE, OP_ADD, OP_FAILED = 0, 1, 2
+COMPACT_RATIO = 2
+COMPACT_MIN_RECORDS = 1024
+
+
+def sample_surface(vertices: np.ndarray, faces: np.ndarray, count: int,
+                   rng: np.random.Generator) -> np.ndarray:
+    """Area-weighted uniform random points on a triangle mesh"""
+    tris = vertices[faces]
+    areas = np.linalg.norm(np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0]), axis=1)
+    cumulative = np.cumsum(areas)
+    if cumulative[-1] <= 0:
+        return vertices[rng.integers(0, len(vertices), count)]
+
+    picked = np.searchsorted(cumulative, rng.random(count) * cumulative[-1])
+    picked = np.minimum(picked, len(faces) - 1)
+    u, v = rng.random(count), rng.random(count)
+    flip = u + v > 1.0
+    u[flip], v[flip] = 1.0 - u[flip], 1.0 - v[flip]
+
+    t = tris[picked]
+    return t[:, 0] + u[:, None] * (t[:, 1] - t[:, 0]) + v[:, None] * (t[:, 2] - t[:, 0])
+
+
+def shape_descriptor(vertices: np.ndarray, faces: np.ndarray, seed: int = 0) -> np.ndarray:
+    """Fixed-length, scale/rotation/translation invariant shape descriptor"""
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    descriptor = np.zeros(DESCRIPTOR_SIZE, dtype=np.float32)
+    if len(faces) == 0:
+        return descriptor
+
+    points = sample_surface(vertices, faces, SAMPLE_POINTS, rng)
+    points -= points.mean(axis=0)
+
+    # D2: pairwise distances scaled by their mean -> scale invariant
+    a = points[rng.integers(0, len(points), SAMPLE_PAIRS)]
+    b = points[rng.integers(0, len(points), SAMPLE_PAIRS)]
+    distances = np.linalg.norm(a - b, axis=1)
+    mean_distance = distances.mean()
+    if mean_distance > 0:
+        distances /= mean_distance
+    d2, _ = np.histogram(distances, bins=D2_BINS, range=(0.0, 3.0))
+
+    # A3: angle at b between (a - b) and (c - b)
+    c = points[rng.integers(0, len(points), SAMPLE_PAIRS)]
+    ba, bc = a - b, c - b
+    norms = np.linalg.norm(ba, axis=1) * np.linalg.norm(bc, axis=1)
+    valid = norms > 0
+    cosines = np.einsum('ij,ij->i', ba[valid], bc[valid]) / norms[valid]
+    a3, _ = np.histogram(np.arccos(np.clip(cosines, -1.0, 1.0)), bins=A3_BINS, range=(0.0, np.pi))
+
+    # Second moments: eigenvalue ratios capture elongation and flatness
+    eigenvalues = np.sort(np.linalg.eigvalsh(np.cov(points.T)))[::-1]
+    moments = eigenvalues[1:] / eigenvalues[0] if eigenvalues[0] > 0 else np.zeros(MOMENT_DIMS)
+
+    # Each block is normalized so it contributes comparably to distances
+    blocks = [d2.astype(np.float64), a3.astype(np.float64), moments]
+    offset = 0
+    for block in blocks:
+        norm = np.linalg.norm(block)
+        descriptor[offset:offset + len(block)] = block / norm if norm > 0 else block
+        offset += len(block)
+    return descriptor
+
+
+def kmeans(data: np.ndarray, clusters: int, iterations: int = 15,
+           seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means returning centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = nearest_rows(data, centroids)
+        for cluster in range(clusters):
+            members = data[assignment == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+    return centroids
+
+
+def nearest_rows(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid for every row of data"""
+    distances = ((data ** 2).sum(axis=1)[:, None] - 2.0 * data @ centroids.T
+                 + (centroids ** 2).sum(axis=1)[None, :])
+    return distances.argmin(axis=1)
+
+
+def make_records(ids: Sequence[int], op: int, descriptors: Optional[np.ndarray] = None) -> np.ndarray:
+    records = np.zeros(len(ids), dtype=RECORD)
+    records['model_id'] = ids
+    records['op'] = op
+    if descriptors is not None:
+        records['descriptor'] = np.asarray(descriptors, dtype=np.float32).reshape(len(ids), DESCRIPTOR_SIZE)
+    return records
+
+
+class SimilarityIndex:
+    """
+    Descriptors in an append-only log on disk plus an in-memory IVF index
+
+    Every add/remove/failure is one fixed-size record appended under an
+    exclusive flock on a sidecar lock file, so processes sharing the cache
+    directory never overwrite each other and a write costs O(1) I/O. Each
+    process replays records it has not seen before answering (a stat per
+    call when nothing changed); the latest record per model wins. The log is
+    rewritten with only the live records once it holds COMPACT_RATIO times
+    more records than models, and readers notice the new file by its inode.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.directory = os.path.join(cache_dir, 'similarity')
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, 'descriptors.log')
+        self.lock_path = os.path.join(self.directory, 'descriptors.lock')
+        self._lock = threading.Lock()
+        self._reset()
+        # The log itself is read on first use, not at import of the servers
+        self._import_npy()
+
+    def _reset(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.descriptors = np.empty((0, DESCRIPTOR_SIZE), dtype=np.float32)
+        self.failed = np.empty(0, dtype=np.int64)
+        self.centroids: Optional[np.ndarray] = None
+        self.assignment = np.empty(0, dtype=np.int64)
+        self._trained_size = 0
+        self._inode = None
+        self._offset = 0
+        self._records = 0
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        with open(self.lock_path, 'a+b') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _import_npy(self):
+        """One-time conversion of the ids.npy/descriptors.npy matrices used before the log"""
+        ids_path = os.path.join(self.directory, 'ids.npy')
+        descriptors_path = os.path.join(self.directory, 'descriptors.npy')
+        if os.path.exists(self.path) or not os.path.exists(ids_path):
+            return
+        with self._file_lock(exclusive=True):
+            if os.path.exists(self.path):
+                return
+            ids, descriptors = np.load(ids_path), np.load(descriptors_path)
+            if descriptors.shape == (len(ids), DESCRIPTOR_SIZE):
+                self._write_log(make_records(ids, OP_ADD, descriptors))
+            os.remove(ids_path)
+            os.remove(descriptors_path)
+
+    def _write_log(self, records: np.ndarray):
+        """Replace the log with records (caller holds the exclusive file lock)"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(records.tobytes())
+        os.replace(tmp_path, self.path)
+
+    def _append(self, records: np.ndarray):
+        with self._lock:
+            with self._file_lock(exclusive=True):
+                with open(self.path, 'ab') as f:
+                    f.write(records.tobytes())
+                self._refresh(locked=True)
+                if self._records > COMPACT_MIN_RECORDS and \
+                        self._records > COMPACT_RATIO * (len(self.ids) + len(self.failed)):
+                    self._write_log(np.concatenate((make_records(self.ids, OP_ADD, self.descriptors),
+                                                    make_records(self.failed, OP_FAILED))))
+                    self._refresh(locked=True)
+
+    def _refresh(self, locked: bool = False):
+        """Apply records appended since the last call (caller holds self._lock)"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            info = os.fstat(f.fileno())
+            if info.st_ino != self._inode:
+                # First load, or the log was compacted
+                self._reset()
+                self._inode = info.st_ino
+            if info.st_size - self._offset < RECORD.itemsize:
+                return
+            if locked:
+                f.seek(self._offset)
+                data = f.read()
+            else:
+                with self._file_lock(exclusive=False):
+                    f.seek(self._offset)
+                    data = f.read()
+        whole = len(data) - len(data) % RECORD.itemsize
+        records = np.frombuffer(data[:whole], dtype=RECORD)
+        self._offset += whole
+        self._records += len(records)
+        self._apply(records)
+
+    def _apply(self, records: np.ndarray):
+        """Merge records into the live state; the last record per model wins"""
+        ids = np.concatenate((self.ids, self.failed, records['model_id']))
+        ops = np.concatenate((np.full(len(self.ids), OP_ADD, dtype=np.uint8),
+                              np.full(len(self.failed), OP_FAILED, dtype=np.uint8), records['op']))
+        descriptors = np.concatenate((self.descriptors,
+                                      np.zeros((len(self.failed), DESCRIPTOR_SIZE), dtype=np.float32),
+                                      records['descriptor']))
+        # Cluster assignments carry over for rows that did not change
+        assignment = np.full(len(ids), -1, dtype=np.int64)
+        if self.centroids is not None:
+            assignment[:len(self.ids)] = self.assignment
+
+        _, last_reversed = np.unique(ids[::-1], return_index=True)
+        latest = np.sort(len(ids) - 1 - last_reversed)
+        live = latest[ops[latest] == OP_ADD]
+        self.failed = ids[latest[ops[latest] == OP_FAILED]]
+        self.ids = ids[live]
+        self.descriptors = np.ascontiguousarray(descriptors[live])
+
+        count = len(self.ids)
+        if count <= EXACT_SEARCH_LIMIT or self.centroids is None or count >= 2 * self._trained_size:
+            self._retrain()
+        else:
+            assignment = assignment[live]
+            stale = np.flatnonzero(assignment < 0)
+            if len(stale):
+                assignment[stale] = nearest_rows(self.descriptors[stale], self.centroids)
+            self.assignment = assignment
+
+    def _retrain(self):
+        """(Re)build the coarse quantizer; called when the collection doubles"""
+        count = len(self.ids)
+        if count <= EXACT_SEARCH_LIMIT:
+            self.centroids = None
+            self.assignment = np.empty(0, dtype=np.int64)
+        else:
+            self.centroids = kmeans(self.descriptors, int(np.sqrt(count)))
+            self.assignment = nearest_rows(self.descriptors, self.centroids)
+        self._trained_size = count
+
+    def __contains__(self, model_id: int) -> bool:
+        with self._lock:
+            self._refresh()
+            return bool(np.any(self.ids == model_id))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self.ids)
+
+    def has_failed(self, model_id: int) -> bool:
+        """True if the model's file could not be loaded when it was last indexed"""
+        with self._lock:
+            self._refresh()
+            return bool(np.any(self.failed == model_id))
+
+    def add(self, model_id: int, descriptor: np.ndarray):
+        """Insert or replace one model's descriptor"""
+        self._append(make_records([model_id], OP_ADD, np.asarray(descriptor, dtype=np.float32)))
+
+    def mark_failed(self, model_id: int):
+        self._append(make_records([model_id], OP_FAILED))
+
+    def remove(self, model_id: int):
+        with self._lock:
+            self._refresh()
+            known = bool(np.any(self.ids == model_id) or np.any(self.failed == model_id))
+        if known:
+            self._append(make_records([model_id], OP_REMOVE))
+
+    def index_model(self, model_id: int, file_path: str,
+                    mesh: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> bool:
+        """Compute and store the descriptor for a model file (or its loaded mesh)"""
+        try:
+            vertices, faces = mesh or load_mesh_bounded(file_path, DESCRIPTOR_MAX_FACES)
+        except Exception as e:
+            print(f"Error loading model for similarity index {file_path}: {e}")
+            self.mark_failed(model_id)
+            return False
+        self.add(model_id, shape_descriptor(vertices, faces))
+        return True
+
+    def query(self, model_id: int, k: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """k nearest models to model_id as (id, distance); None if not indexed"""
+        with self._lock:
+            self._refresh()
+            ids, descriptors = self.ids, self.descriptors
+            centroids, assignment = self.centroids, self.assignment
+
+        position = np.flatnonzero(ids == model_id)
+        if len(position) == 0:
+            return None
+        target = descriptors[position[0]]
+
+        if centroids is not None:
+            probe_order = np.argsort(((centroids - target) ** 2).sum(axis=1))[:IVF_PROBES]
+            candidates = np.flatnonzero(np.isin(assignment, probe_order))
+        else:
+            candidates = np.arange(len(ids))
+
+        candidates = candidates[ids[candidates] != model_id]
+        if len(candidates) == 0:
+            return []
+
+        distances = np.sqrt(((descriptors[candidates] - target) ** 2).sum(axis=1))
+        k = min(k, len(candidates))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(int(ids[candidates[i]]), float(distances[i])) for i in nearest]
+
+
+def main():
+    """Index every model in the database that has no descriptor yet"""
+    db_config = {
+        'host': 'localhost',
+        'user': 'heritage_user',
+        'password': 'heritage_password123',
+        'database': 'cultural_heritage',
+        'autocommit': True
+    }
+
+    index = SimilarityIndex('cache')
+
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT id, name, file_path FROM models ORDER BY id")
+    models = cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+    added = 0
+    for model in models:
+        if model['id'] in index or not os.path.exists(model['file_path']):
+            continue
+        print(f"Indexing model: {model['name']}")
+        if index.index_model(model['id'], model['file_path']):
+            added += 1
+
+    print(f"Indexed {added} new models ({len(index)} total)")
+
+
+if __name__ == "__main__":
+    main()
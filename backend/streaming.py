@@ -0,0 +1,93 @@
+"""
+Streaming JSON responses for large listings
+
+Rows are read from an unbuffered (server-side) mysql.connector cursor in
+batches of STREAM_BATCH and encoded one batch at a time, so peak memory
+is one batch regardless of result size and the first bytes leave before
+the query has been fully read. Date/datetime values are encoded by the
+encoder itself (select DATE(col) to get 'YYYY-MM-DD'), so rows are not
+rewritten in Python first. orjson is used when installed; otherwise the
+stdlib encoder with the same conversions.
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from flask import Response, stream_with_context
+
+try:
+    import orjson
+except ImportError:  # Pure-Python fallback, same output
+    orjson = None
+
+STREAM_BATCH = 500
+
+
+def _default(value: Any) -> Any:
+    # Same ISO format orjson produces natively
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def encode(value: Any) -> bytes:
+        return orjson.dumps(value, default=_default)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'), ensure_ascii=False)
+
+    def encode(value: Any) -> bytes:
+        return _encoder.encode(value).encode('utf-8')
+
+
+def _generate(conn, cursor, transform: Optional[Callable[[Dict[str, Any]], None]],
+              head: bytes, tail: bytes, batch_size: int) -> Iterator[bytes]:
+    try:
+        yield head
+        first = True
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if transform is not None:
+                for row in rows:
+                    transform(row)
+            chunk = b','.join(encode(row) for row in rows)
+            yield chunk if first else b',' + chunk
+            first = False
+        yield tail
+    except Exception as e:
+        # Headers are already sent; the truncated body signals the failure
+        print(f"Error streaming response: {e}")
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        conn.close()
+
+
+def stream_json(conn, cursor, transform: Optional[Callable[[Dict[str, Any]], None]] = None,
+                envelope: Optional[Dict[str, Any]] = None, key: str = 'results',
+                batch_size: int = STREAM_BATCH) -> Response:
+    """Response streaming the executed cursor's rows as a JSON array
+
+    With `envelope`, the array is nested under `key` in an object holding
+    the envelope's other fields. `transform` may edit each row in place.
+    The response owns the cursor and connection and closes both.
+    """
+    if envelope is None:
+        head, tail = b'[', b']'
+    else:
+        fields = encode(envelope)
+        head = (fields[:-1] + b',' if len(fields) > 2 else b'{') + encode(key) + b':['
+        tail = b']}'
+
+    return Response(stream_with_context(_generate(conn, cursor, transform, head, tail, batch_size)),
+                    mimetype='application/json')
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Backend modules are imported as top-level modules, as the servers do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def box_mesh():
+    """(vertices, faces) of a closed, consistently wound box"""
+    import trimesh
+    mesh = trimesh.creation.box(extents=(2.0, 1.0, 0.5))
+    return np.asarray(mesh.vertices, dtype=np.float64), np.asarray(mesh.faces, dtype=np.int64)
+
+
+@pytest.fixture
+def sphere_mesh():
+    import trimesh
+    mesh = trimesh.creation.icosphere(subdivisions=3, radius=1.5)
+    return np.asarray(mesh.vertices, dtype=np.float64), np.asarray(mesh.faces, dtype=np.int64)
@@ -0,0 +1,167 @@
+from datetime import datetime
+
+import pytest
+
+import app
+from app import MAX_BATCH_MODELS, parse_include, parse_model_ids
+
+
+class FakeAuthManager:
+    def get_user_from_token(self, token):
+        return {'id': 7, 'session_id': 1, 'role': 'user'} if token == 'valid' else None
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append((statement, params))
+
+    def fetchall(self):
+        ids = self.statements[-1][1][:-1]
+        return [dict(self.rows[model_id]) for model_id in ids if model_id in self.rows]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, dictionary=False):
+        return self._cursor
+
+    def close(self):
+        pass
+
+
+def model_row(model_id):
+    return {'id': model_id, 'folder_id': None, 'name': f"model {model_id}", 'description': '',
+            'file_type': 'obj', 'file_size': 100, 'triangle_count': 12,
+            'uploaded_at': datetime(2024, 5, 1), 'content_hash': None}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Test client whose user owns models 1-3"""
+    cursor = FakeCursor({model_id: model_row(model_id) for model_id in (1, 2, 3)})
+    monkeypatch.setattr(app.app, 'auth_manager', FakeAuthManager())
+    monkeypatch.setattr(app, 'get_user_db_connection', lambda user_id: FakeConnection(cursor))
+    client = app.app.test_client()
+    client.cursor = cursor
+    return client
+
+
+def batch(client, method='GET', **kwargs):
+    return client.open('/api/models', method=method, headers={'Authorization': 'Bearer valid'}, **kwargs)
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('1,2,3', [1, 2, 3]),
+    (' 4 , 5 ', [4, 5]),
+    ('1,,2,', [1, 2]),
+    ([3, 1, 3, 2, 1], [3, 1, 2]),
+    (['7', 8], [7, 8]),
+])
+def test_parse_model_ids(raw, expected):
+    assert parse_model_ids(raw) == (expected, None)
+
+
+@pytest.mark.parametrize('raw', [None, '', ',', [], {'ids': [1]}, 5])
+def test_parse_model_ids_requires_a_list(raw):
+    ids, error = parse_model_ids(raw)
+    assert ids is None
+    assert 'non-empty list' in error
+
+
+@pytest.mark.parametrize('raw', ['1,a', ['x'], [None], [[1]], [True], [1.5]])
+def test_parse_model_ids_requires_integers(raw):
+    assert parse_model_ids(raw) == (None, "ids must be integers")
+
+
+def test_parse_model_ids_caps_the_batch():
+    assert parse_model_ids(list(range(MAX_BATCH_MODELS)))[0] == list(range(MAX_BATCH_MODELS))
+    ids, error = parse_model_ids(list(range(MAX_BATCH_MODELS + 1)))
+    assert ids is None
+    assert str(MAX_BATCH_MODELS) in error
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('', set()),
+    ('metadata,stats', {'metadata', 'stats'}),
+    (' metadata , ,derivatives', {'metadata', 'derivatives'}),
+    ([], set()),
+    (['stats', ' metadata '], {'stats', 'metadata'}),
+])
+def test_parse_include(raw, expected):
+    assert parse_include(raw) == (expected, None)
+
+
+@pytest.mark.parametrize('raw', [None, 1, {'metadata': True}, ['metadata', 1]])
+def test_parse_include_rejects_other_types(raw):
+    include, error = parse_include(raw)
+    assert include is None
+    assert 'include' in error
+
+
+def test_batch_requires_auth(api):
+    assert api.get('/api/models?ids=1').status_code == 401
+
+
+def test_batch_keeps_request_order_and_reports_missing(api):
+    response = batch(api, query_string={'ids': '3,99,1,3'})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [model['id'] for model in body['models']] == [3, 1]
+    assert body['missing'] == [99]
+    assert body['models'][0]['uploaded_at'] == '2024-05-01'
+    assert 'content_hash' not in body['models'][0]
+
+
+def test_batch_runs_one_query_scoped_to_the_user(api):
+    batch(api, method='POST', json={'ids': [1, 2]})
+
+    assert len(api.cursor.statements) == 1
+    statement, params = api.cursor.statements[0]
+    assert 'm.user_id = %s' in statement
+    assert params == [1, 2, 7]
+
+
+@pytest.mark.parametrize('query', [{}, {'ids': ''}, {'ids': '1,x'}])
+def test_batch_rejects_bad_ids(api, query):
+    assert batch(api, query_string=query).status_code == 400
+    assert api.cursor.statements == []
+
+
+def test_batch_rejects_too_many_ids(api):
+    ids = list(range(1, MAX_BATCH_MODELS + 2))
+    assert batch(api, method='POST', json={'ids': ids}).status_code == 400
+
+
+@pytest.mark.parametrize('body', ['[1, 2]', '"1,2"', '3', 'null', 'not json'])
+def test_batch_post_requires_an_object(api, body):
+    response = batch(api, method='POST', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert api.cursor.statements == []
+
+
+@pytest.mark.parametrize('include', ['metadata,stats', ['metadata', 'stats']])
+def test_batch_post_accepts_include_as_list_or_string(api, include, monkeypatch):
+    monkeypatch.setattr(app, 'METADATA_FIELDS', ['author'])
+    monkeypatch.setattr(app, 'STATS_FIELDS', ['face_count'])
+    api.cursor.rows[1].update(author='A. Smith', face_count=12, validated_at=None)
+
+    response = batch(api, method='POST', json={'ids': [1], 'include': include})
+
+    assert response.status_code == 200
+    model = response.get_json()['models'][0]
+    assert model['metadata'] == {'author': 'A. Smith'}
+    assert model['stats'] is None
+
+
+def test_batch_rejects_bad_include(api):
+    assert batch(api, method='POST', json={'ids': [1], 'include': 5}).status_code == 400
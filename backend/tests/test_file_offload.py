@@ -0,0 +1,152 @@
+import pytest
+from flask import Flask
+
+from file_offload import FileOffload
+
+DATA = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    root = tmp_path / 'uploads'
+    (root / 'user 1').mkdir(parents=True)
+    path = root / 'user 1' / 'model.ply'
+    path.write_bytes(DATA)
+    return str(root), str(path)
+
+
+def serve(offload, path, headers=None, file_wrapper=False):
+    """Status, headers and body of FileOffload.send() for a request with `headers`"""
+    app = Flask(__name__)
+    environ = {}
+    if file_wrapper:
+        environ['wsgi.file_wrapper'] = lambda f, block_size: iter(lambda: f.read(block_size), b'')
+    with app.test_request_context('/download', headers=headers or {}, environ_overrides=environ):
+        response = offload.send(path, 'application/octet-stream', 'model.ply')
+        response.direct_passthrough = False
+        body = response.get_data()
+        response.close()
+    return response.status_code, response.headers, body
+
+
+def test_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        FileOffload('nginx')
+
+
+def test_x_accel_redirects_inside_the_root(model_file):
+    root, path = model_file
+    status, headers, body = serve(FileOffload('x-accel', root, '/protected/'), path)
+
+    assert status == 200
+    assert body == b''
+    assert headers['X-Accel-Redirect'] == '/protected/user%201/model.ply'
+    assert "filename*=UTF-8''model.ply" in headers['Content-Disposition']
+
+
+def test_x_accel_serves_files_outside_the_root_itself(model_file, tmp_path):
+    root, path = model_file
+    status, headers, body = serve(FileOffload('x-accel', str(tmp_path / 'elsewhere')), path)
+
+    assert 'X-Accel-Redirect' not in headers
+    assert body == DATA
+
+
+def test_x_sendfile_names_the_absolute_path(model_file):
+    root, path = model_file
+    status, headers, body = serve(FileOffload('x-sendfile', root), path)
+
+    assert headers['X-Sendfile'] == path
+    assert body == b''
+
+
+@pytest.mark.parametrize('file_wrapper', [False, True])
+def test_sendfile_full_body(model_file, file_wrapper):
+    root, path = model_file
+    status, headers, body = serve(FileOffload('sendfile', root), path, file_wrapper=file_wrapper)
+
+    assert status == 200
+    assert body == DATA
+    assert headers['Content-Length'] == str(len(DATA))
+    assert headers['Accept-Ranges'] == 'bytes'
+    assert 'Content-Range' not in headers
+
+
+@pytest.mark.parametrize('header, start, stop', [
+    ('bytes=0-99', 0, 100),
+    ('bytes=100-', 100, len(DATA)),
+    ('bytes=-24', len(DATA) - 24, len(DATA)),
+    ('bytes=1000-5000', 1000, len(DATA)),
+])
+@pytest.mark.parametrize('file_wrapper', [False, True])
+def test_sendfile_single_range(model_file, header, start, stop, file_wrapper):
+    root, path = model_file
+    status, headers, body = serve(FileOffload('sendfile', root), path, {'Range': header}, file_wrapper)
+
+    assert status == 206
+    assert body == DATA[start:stop]
+    assert headers['Content-Length'] == str(stop - start)
+    assert headers['Content-Range'] == f"bytes {start}-{stop - 1}/{len(DATA)}"
+
+
+def test_sendfile_unsatisfiable_range(model_file):
+    root, path = model_file
+    status, headers, body = serve(FileOffload('sendfile', root), path, {'Range': 'bytes=5000-'})
+
+    assert status == 416
+    assert headers['Content-Range'] == f"bytes */{len(DATA)}"
+
+
+@pytest.mark.parametrize('header', ['bytes=0-9,20-29', 'bytes=0-9,5000-'])
+def test_sendfile_answers_multiple_ranges_with_the_whole_file(model_file, header):
+    root, path = model_file
+    status, headers, body = serve(FileOffload('sendfile', root), path, {'Range': header})
+
+    assert status == 200
+    assert body == DATA
+    assert 'Content-Range' not in headers
+
+
+def test_sendfile_ignores_malformed_range(model_file):
+    root, path = model_file
+    status, headers, body = serve(FileOffload('sendfile', root), path, {'Range': 'lines=1-2'})
+
+    assert status == 200
+    assert body == DATA
+
+
+@pytest.fixture
+def signed(model_file, monkeypatch):
+    """Test client serving model_file from a signed URL in sendfile mode"""
+    import app
+    from signed_urls import UrlSigner
+
+    root, path = model_file
+    signer = UrlSigner('secret', {'uploads': root})
+    monkeypatch.setattr(app, 'url_signer', signer)
+    monkeypatch.setattr(app, 'file_offload', FileOffload('sendfile', root))
+    token = signer.issue(1, 'model', 7, path, 'application/octet-stream', 'model.ply', 300)['token']
+    return app.app.test_client(), f"/api/signed/{token}"
+
+
+@pytest.mark.parametrize('header, status, expected', [
+    (None, 200, DATA),
+    ('bytes=10-19', 206, DATA[10:20]),
+    ('bytes=0-9,20-29', 200, DATA),
+])
+def test_signed_url_ranges(signed, header, status, expected):
+    client, url = signed
+    response = client.get(url, headers={'Range': header} if header else {})
+
+    assert response.status_code == status
+    assert response.get_data() == expected
+    assert response.cache_control.public
+    response.close()
+
+
+def test_signed_url_unsatisfiable_range(signed):
+    client, url = signed
+    response = client.get(url, headers={'Range': 'bytes=5000-'})
+
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f"bytes */{len(DATA)}"
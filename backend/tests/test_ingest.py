@@ -0,0 +1,86 @@
+import pytest
+
+import services
+
+HASH = 'cd' * 32
+
+
+class RecordingPool:
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, key, fn, *args, **kwargs):
+        self.jobs.append((key, kwargs.get('mesh') is not None))
+
+
+class RecordingValidator:
+    """MeshValidator stand-in that records which rows would be written"""
+
+    def __init__(self):
+        self.rows = []
+
+    def check(self, vertices, faces):
+        return vertices, faces, {'face_count': len(faces)}
+
+    def save(self, model_id, report):
+        self.rows.append((model_id, 'stats'))
+        return True
+
+    def save_failure(self, model_id, error):
+        self.rows.append((model_id, 'failure'))
+        return True
+
+    def validate_model(self, model_id, file_path):
+        self.rows.append((model_id, 'streamed'))
+
+
+@pytest.fixture
+def ingest(tmp_path, monkeypatch, box_mesh):
+    pool, validator = RecordingPool(), RecordingValidator()
+    monkeypatch.setattr(services, 'job_pool', pool)
+    monkeypatch.setattr(services, 'mesh_validator', validator)
+    monkeypatch.setattr(services, 'load_mesh_arrays', lambda file_path: box_mesh)
+    monkeypatch.setattr(services.thumbnail_renderer, 'has_previews', lambda content_hash: False)
+    monkeypatch.setattr(services.progressive_encoder, 'has_encoding', lambda content_hash: False)
+    monkeypatch.setattr(services.progressive_encoder, 'has_failed', lambda content_hash: False)
+    path = tmp_path / 'model.obj'
+    path.write_bytes(b'v 0 0 0\n')
+    return pool, validator, str(path)
+
+
+def test_in_core_ingest_saves_stats_then_shares_the_mesh(ingest):
+    pool, validator, path = ingest
+    services.ingest_model(1, path, HASH)
+
+    assert validator.rows == [(1, 'stats')]
+    assert pool.jobs == [('similarity:1', True), (f"thumbnail:{HASH}", True), (f"progressive:{HASH}", True)]
+
+
+def test_out_of_core_ingest_saves_stats_before_queueing_stages(ingest, monkeypatch):
+    pool, validator, path = ingest
+    monkeypatch.setattr(services, 'is_out_of_core', lambda file_path: True)
+    services.ingest_model(2, path, HASH)
+
+    # Written by the ingest job itself, so the sweep stops selecting the model
+    assert validator.rows == [(2, 'streamed')]
+    assert pool.jobs == [('similarity:2', False), (f"thumbnail:{HASH}", False), (f"progressive:{HASH}", False)]
+
+
+def test_unreadable_model_records_a_failure_row(ingest, monkeypatch):
+    pool, validator, path = ingest
+
+    def fail(file_path):
+        raise ValueError("not a mesh")
+    monkeypatch.setattr(services, 'load_mesh_arrays', fail)
+    services.ingest_model(3, path, HASH)
+
+    assert validator.rows == [(3, 'failure')]
+    assert pool.jobs == []
+
+
+def test_missing_file_records_a_failure_row(ingest, tmp_path):
+    pool, validator, path = ingest
+    services.ingest_model(4, str(tmp_path / 'gone.obj'), HASH)
+
+    assert validator.rows == [(4, 'failure')]
+    assert pool.jobs == []
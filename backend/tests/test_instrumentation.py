@@ -0,0 +1,82 @@
+import json
+import os
+import time
+
+import pytest
+from flask import Flask, Response, stream_with_context
+
+from metrics import RequestMetrics
+from profiling import RequestProfiler
+
+STREAM_SECONDS = 0.05
+
+
+def make_app(*instruments):
+    app = Flask(__name__)
+    for instrument in instruments:
+        instrument.init_app(app)
+
+    @app.route('/stream')
+    def stream():
+        def generate():
+            for part in ('[', '"a"', ',', '"b"', ']'):
+                time.sleep(STREAM_SECONDS / 5)
+                yield part
+        return Response(stream_with_context(generate()), mimetype='application/json')
+
+    @app.route('/plain')
+    def plain():
+        return {'ok': True}
+
+    return app
+
+
+def metric_value(metrics, metric, labels):
+    rendered = metrics.render()
+    for line in rendered.splitlines():
+        if line.split('{')[0].split(' ')[0] == metric and labels in line:
+            return float(line.rsplit(' ', 1)[1])
+    raise AssertionError(f"{metric} {labels} not in:\n{rendered}")
+
+
+def test_streamed_response_recorded_after_body():
+    metrics = RequestMetrics()
+    client = make_app(metrics).test_client()
+
+    response = client.get('/stream')
+    # Until the server closes the response the request is still in flight
+    assert metric_value(metrics, 'http_requests_in_flight', '') == 1
+    assert response.get_data() == b'["a","b"]'
+    response.close()
+
+    assert metric_value(metrics, 'http_requests_in_flight', '') == 0
+    assert metric_value(metrics, 'http_requests_total', 'route="/stream"') == 1
+    assert metric_value(metrics, 'http_request_duration_seconds_sum', 'route="/stream"') >= STREAM_SECONDS
+    assert metric_value(metrics, 'http_response_size_bytes_sum', 'route="/stream"') == len(b'["a","b"]')
+
+
+def test_plain_response_recorded_in_after_request():
+    metrics = RequestMetrics()
+    client = make_app(metrics).test_client()
+
+    client.get('/plain')
+    assert metric_value(metrics, 'http_requests_in_flight', '') == 0
+    assert metric_value(metrics, 'http_requests_total', 'route="/plain"') == 1
+
+
+@pytest.mark.parametrize('mode', ['sampler', 'cprofile'])
+def test_profile_covers_streamed_body(tmp_path, mode):
+    profiler = RequestProfiler(str(tmp_path), token='token', mode=mode)
+    client = make_app(profiler).test_client()
+
+    response = client.get('/stream', headers={'X-Profile': 'token'})
+    profile_id = response.headers['X-Profile-Id']
+    assert not os.path.exists(tmp_path / f"{profile_id}.json")
+    response.get_data()
+    response.close()
+
+    with open(tmp_path / f"{profile_id}.json") as f:
+        summary = json.load(f)
+    assert summary['endpoint'] == 'stream'
+    assert summary['status'] == 200
+    assert summary['duration_ms'] >= STREAM_SECONDS * 1000.0
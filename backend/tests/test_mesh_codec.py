@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import mesh_codec
+
+
+def canonical_triangles(vertices, faces):
+    """Triangles as sorted rows of rounded corner coordinates, independent of numbering/order"""
+    corners = np.round(np.asarray(vertices, dtype=np.float64)[faces], 3)
+    # Rotate each triangle to start at its smallest corner, keeping the winding
+    keys = [tuple(map(tuple, tri)) for tri in corners]
+    rotated = [min(tri[i:] + tri[:i] for i in range(3)) for tri in keys]
+    return sorted(rotated)
+
+
+def nearest(points, candidates):
+    """Row of candidates closest to each point"""
+    distances = np.linalg.norm(points[:, None, :] - candidates[None, :, :], axis=2)
+    return candidates[distances.argmin(axis=1)]
+
+
+@pytest.mark.parametrize('bits', [14, 16])
+def test_positions_within_error_bound(sphere_mesh, bits):
+    vertices, faces = sphere_mesh
+    decoded, decoded_faces, normals = mesh_codec.decode(mesh_codec.encode(vertices, faces, position_bits=bits))
+    assert normals is None
+    assert decoded.shape == vertices.shape and decoded_faces.shape == faces.shape
+
+    bound = mesh_codec.position_error_bound((vertices.min(axis=0), vertices.max(axis=0)), bits)
+    error = np.abs(nearest(vertices, decoded.astype(np.float64)) - vertices)
+    # Half a quantization step, plus float32 rounding of the decoded value
+    assert error.max() <= bound + 1e-6
+
+
+def test_triangles_and_winding_are_preserved(box_mesh):
+    vertices, faces = box_mesh
+    decoded, decoded_faces, _ = mesh_codec.decode(mesh_codec.encode(vertices, faces, position_bits=16))
+    assert canonical_triangles(decoded, decoded_faces.astype(np.int64)) == canonical_triangles(vertices, faces)
+
+
+def test_normals_within_angular_bound(sphere_mesh):
+    vertices, faces = sphere_mesh
+    normals = vertices / np.linalg.norm(vertices, axis=1, keepdims=True)
+    decoded, _, decoded_normals = mesh_codec.decode(mesh_codec.encode(vertices, faces, normals))
+    expected = decoded / np.linalg.norm(decoded, axis=1, keepdims=True)
+    cosines = np.clip((expected * decoded_normals).sum(axis=1), -1, 1)
+    # Position quantization moves the expected direction slightly too
+    assert np.degrees(np.arccos(cosines)).max() <= mesh_codec.normal_error_bound(mesh_codec.NORMAL_BITS) + 0.1
+
+
+def test_shared_bounds_decode_shared_vertices_identically(sphere_mesh):
+    vertices, faces = sphere_mesh
+    bounds = (vertices.min(axis=0), vertices.max(axis=0))
+    half = len(faces) // 2
+    first, _, _ = mesh_codec.decode(mesh_codec.encode(vertices, faces[:half], bounds=bounds))
+    second, _, _ = mesh_codec.decode(mesh_codec.encode(vertices, faces[half:], bounds=bounds))
+
+    shared = vertices[np.intersect1d(faces[:half], faces[half:])]
+    assert len(shared)
+    np.testing.assert_array_equal(nearest(shared, first), nearest(shared, second))
+
+
+def test_vertex_cache_order_improves_acmr(sphere_mesh):
+    vertices, faces = sphere_mesh
+    shuffled = faces[np.random.default_rng(0).permutation(len(faces))]
+    ordered = shuffled[mesh_codec.triangle_order(shuffled, len(vertices))]
+    assert mesh_codec.acmr(ordered) < mesh_codec.acmr(shuffled)
+
+
+def test_rejects_bad_input():
+    with pytest.raises(ValueError):
+        mesh_codec.encode(np.zeros((3, 3)), np.array([[0, 1, 2]]), position_bits=17)
+    with pytest.raises(ValueError):
+        mesh_codec.decode(b'XXXX' + bytes(mesh_codec.HEADER.size))
@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+
+from mesh_handle import MeshHandle, sweep_stale
+
+
+def test_shared_reference_keeps_files_until_last_release(tmp_path):
+    vertices = np.arange(12, dtype=np.float64).reshape(4, 3)
+    handle = MeshHandle.from_arrays({'vertices': vertices}, root=str(tmp_path))
+    descriptor = handle.share()
+    handle.release()
+    assert os.path.isdir(handle.directory)
+
+    with MeshHandle.open(descriptor) as mesh:
+        np.testing.assert_array_equal(mesh['vertices'], vertices)
+        view = mesh['vertices']
+    assert not os.path.exists(handle.directory)
+    # Views outlive the files
+    np.testing.assert_array_equal(view, vertices)
+
+
+def test_release_is_idempotent(tmp_path):
+    handle = MeshHandle.create({'faces': ((2, 3), np.int64)}, root=str(tmp_path))
+    other = MeshHandle.open(handle.share())
+    handle.release()
+    handle.release()
+    assert os.path.isdir(handle.directory)
+    other.release()
+    assert not os.path.exists(handle.directory)
+
+
+def test_garbage_collected_handle_releases_itself(tmp_path):
+    handle = MeshHandle.create({'faces': ((0, 3), np.int64)}, root=str(tmp_path))
+    directory = handle.directory
+    assert handle['faces'].shape == (0, 3)
+    del handle
+    assert not os.path.exists(directory)
+
+
+def test_sweep_stale_removes_old_directories(tmp_path):
+    old = MeshHandle.create({'v': ((1, 3), np.float32)}, root=str(tmp_path))
+    fresh = MeshHandle.create({'v': ((1, 3), np.float32)}, root=str(tmp_path))
+    os.utime(os.path.join(old.directory, 'refcount'), (0, 0))
+    assert sweep_stale(str(tmp_path), max_age=60) == 1
+    assert not os.path.exists(old.directory)
+    assert os.path.isdir(fresh.directory)
+    fresh.release()
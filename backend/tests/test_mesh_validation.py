@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+import trimesh
+
+from mesh_validation import MeshValidator, failure_report, mesh_statistics, orient_faces, _row, STATS_FIELDS
+
+
+@pytest.fixture
+def validator():
+    return MeshValidator({})
+
+
+def test_clean_mesh_matches_trimesh(validator, sphere_mesh):
+    vertices, faces = sphere_mesh
+    _, _, report = validator.check(vertices, faces)
+    reference = trimesh.Trimesh(vertices, faces)
+    assert report['face_count'] == len(faces)
+    assert report['is_watertight'] and report['is_winding_consistent']
+    assert report['surface_area'] == pytest.approx(reference.area)
+    assert report['volume'] == pytest.approx(reference.volume)
+    assert report['component_count'] == 1
+    assert not any(report['issues'].values())
+
+
+def test_flipped_faces_are_reoriented_outwards(validator, sphere_mesh):
+    vertices, faces = sphere_mesh
+    broken = faces.copy()
+    rng = np.random.default_rng(1)
+    flipped = rng.choice(len(faces), size=len(faces) // 3, replace=False)
+    broken[flipped] = broken[flipped][:, ::-1]
+
+    repaired_vertices, repaired_faces, report = validator.check(vertices, broken)
+    assert report['issues']['flipped_faces'] == len(flipped)
+    assert report['is_winding_consistent']
+    mesh = trimesh.Trimesh(repaired_vertices, repaired_faces)
+    assert mesh.is_winding_consistent and mesh.volume > 0
+
+
+def test_inside_out_mesh_is_flipped(box_mesh):
+    vertices, faces = box_mesh
+    oriented, flipped = orient_faces(vertices, faces[:, ::-1])
+    assert flipped == len(faces)
+    assert trimesh.Trimesh(vertices, oriented).volume > 0
+
+
+def test_open_surface_keeps_its_side(box_mesh):
+    vertices, faces = box_mesh
+    # Dropping two faces opens the box, so there is no outside to point to
+    oriented, flipped = orient_faces(vertices, faces[2:, ::-1])
+    assert flipped == 0
+    np.testing.assert_array_equal(oriented, faces[2:, ::-1])
+
+
+def test_invalid_duplicate_and_degenerate_input_is_cleaned(validator, box_mesh):
+    vertices, faces = box_mesh
+    count = len(vertices)
+    vertices = np.vstack((vertices, [[np.nan, 0, 0]], vertices[faces[0, :1]]))
+    faces = np.vstack((faces,
+                       [[0, 1, count]],          # references the NaN vertex
+                       [[0, 1, count + 5]],      # references a missing vertex
+                       faces[:1, ::-1],          # flipped twin of an existing face
+                       [[0, 0, 1]],              # repeated corner
+                       [[count + 1, *faces[0, 1:]]]))  # copy of faces[0] through a duplicate vertex
+
+    repaired_vertices, repaired_faces, report = validator.check(vertices, faces)
+    issues = report['issues']
+    assert issues['nan_vertices'] == 1
+    assert issues['invalid_faces'] == 2
+    assert issues['duplicate_vertices'] == 1
+    assert issues['degenerate_faces'] == 1
+    assert issues['duplicate_faces'] == 2
+    assert len(repaired_vertices) == count and len(repaired_faces) == 12
+    assert report['is_watertight']
+
+
+def test_repair_disabled_returns_input(box_mesh):
+    vertices, faces = box_mesh
+    broken = faces[:, ::-1].copy()
+    returned_vertices, returned_faces, report = MeshValidator({}, repair=False).check(vertices, broken)
+    assert returned_faces is broken and returned_vertices is vertices
+    assert report['repaired'] is False and report['issues']['flipped_faces'] == len(faces)
+
+
+def test_mesh_without_valid_faces_raises(validator):
+    with pytest.raises(ValueError):
+        validator.check(np.zeros((3, 3)), np.array([[0, 1, 2]]))
+
+
+def test_open_components_have_no_volume():
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0]], dtype=np.float64)
+    stats = mesh_statistics(vertices, np.array([[0, 1, 2]]))
+    assert stats['volume'] is None
+    assert stats['boundary_edges'] == 3 and not stats['is_watertight']
+
+
+def test_failure_report_row():
+    row = _row(failure_report(ValueError('x' * 1000)))
+    assert set(row) == set(STATS_FIELDS)
+    assert len(row['error']) == 500 and row['face_count'] == 0 and row['repaired'] is False
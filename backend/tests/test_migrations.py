@@ -0,0 +1,67 @@
+import migrations
+
+
+class RecordingCursor:
+    """Answers information_schema lookups from a set of existing names and records DDL"""
+
+    def __init__(self, existing):
+        self.existing = set(existing)
+        self.statements = []
+        self._params = None
+
+    def execute(self, sql, params=None):
+        self._params = params
+        sql = ' '.join(sql.split())
+        if not sql.startswith('SELECT COUNT(*) FROM information_schema'):
+            self.statements.append(sql)
+
+    def fetchone(self):
+        return (1 if self._params[-1] in self.existing else 0,)
+
+
+CURRENT = {'content_hash', 'user_agent_id', 'idx_activity_created', 'error',
+           'idx_file_type', 'idx_triangle_count', 'idx_uploaded_at', 'ft_model_text',
+           'unique_model_metadata', 'idx_culture', 'idx_period', 'idx_material', 'idx_dimensions',
+           'ft_metadata_notes', 'idx_session_user', 'idx_session_expires',
+           'idx_users_organization', 'idx_users_created', 'idx_users_last_login'}
+
+
+def test_up_to_date_database_is_left_alone():
+    cursor = RecordingCursor(CURRENT)
+    assert migrations.apply_migrations(cursor) == []
+    assert cursor.statements == []
+
+
+def test_search_indexes_are_added_one_per_statement():
+    cursor = RecordingCursor(CURRENT - {'ft_model_text', 'ft_metadata_notes', 'idx_culture'})
+    assert migrations.apply_migrations(cursor) == ['search indexes']
+    assert cursor.statements == [
+        "ALTER TABLE models ADD FULLTEXT INDEX ft_model_text (name, description)",
+        "ALTER TABLE model_metadata ADD INDEX idx_culture (culture)",
+        "ALTER TABLE model_metadata ADD FULLTEXT INDEX ft_metadata_notes (notes)",
+    ]
+
+
+def test_metadata_is_deduplicated_before_the_unique_key():
+    cursor = RecordingCursor(CURRENT - {'unique_model_metadata'})
+    migrations.apply_migrations(cursor)
+    assert cursor.statements[0].startswith("DELETE older FROM model_metadata")
+    assert cursor.statements[1] == "ALTER TABLE model_metadata ADD UNIQUE KEY unique_model_metadata (model_id)"
+
+
+def test_session_indexes():
+    cursor = RecordingCursor(CURRENT - {'idx_session_user', 'idx_session_expires'})
+    assert migrations.apply_migrations(cursor) == ['session indexes']
+    assert cursor.statements == [
+        "ALTER TABLE user_sessions ADD INDEX idx_session_user (user_id, expires_at)",
+        "ALTER TABLE user_sessions ADD INDEX idx_session_expires (expires_at)",
+    ]
+
+
+def test_user_indexes():
+    cursor = RecordingCursor(CURRENT - {'idx_users_created', 'idx_users_last_login'})
+    assert migrations.apply_migrations(cursor) == ['user indexes']
+    assert cursor.statements == [
+        "ALTER TABLE users ADD INDEX idx_users_created (created_at)",
+        "ALTER TABLE users ADD INDEX idx_users_last_login (last_login)",
+    ]
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import trimesh
+
+import native_parsers
+
+
+def export(tmp_path, mesh, name, **kwargs):
+    path = str(tmp_path / name)
+    trimesh.Trimesh(*mesh, process=False).export(path, **kwargs)
+    return path
+
+
+def test_binary_ply_matches_trimesh(tmp_path, sphere_mesh):
+    path = export(tmp_path, sphere_mesh, 'sphere.ply', encoding='binary')
+    vertices, faces = native_parsers.read_native(path)
+    reference = trimesh.load(path, process=False)
+    np.testing.assert_array_equal(vertices, reference.vertices)
+    np.testing.assert_array_equal(faces, reference.faces)
+
+
+def test_binary_ply_arrays_are_writable_copies(tmp_path, box_mesh):
+    path = export(tmp_path, box_mesh, 'box.ply', encoding='binary')
+    before = open(path, 'rb').read()
+    vertices, _ = native_parsers.read_binary_ply(path)
+    vertices[:] = 0
+    assert open(path, 'rb').read() == before
+
+
+def test_binary_stl_is_welded_like_trimesh(tmp_path, sphere_mesh):
+    path = export(tmp_path, sphere_mesh, 'sphere.stl')
+    vertices, faces = native_parsers.read_native(path)
+    reference = trimesh.load(path)
+    assert len(vertices) == len(reference.vertices)
+    assert len(faces) == len(reference.faces)
+    np.testing.assert_allclose(np.sort(vertices[faces].reshape(-1, 3), axis=0),
+                               np.sort(reference.vertices[reference.faces].reshape(-1, 3), axis=0))
+
+
+def test_negative_zero_is_welded():
+    corners = np.array([[0.0, 1, 0], [-0.0, 1, 0], [1, 0, 0]], dtype=np.float32) + np.float32(0.0)
+    vertices, faces = native_parsers.weld(corners)
+    assert len(vertices) == 2
+    assert faces.ravel()[0] == faces.ravel()[1]
+
+
+@pytest.mark.parametrize('name, kwargs', [('sphere.ply', {'encoding': 'ascii'}),
+                                          ('sphere.stl', {'file_type': 'stl_ascii'})])
+def test_ascii_files_fall_back(tmp_path, sphere_mesh, name, kwargs):
+    assert native_parsers.read_native(export(tmp_path, sphere_mesh, name, **kwargs)) is None
+
+
+def test_polygon_ply_falls_back(tmp_path):
+    path = tmp_path / 'quad.ply'
+    header = (b"ply\nformat binary_little_endian 1.0\nelement vertex 4\n"
+              b"property float x\nproperty float y\nproperty float z\n"
+              b"element face 1\nproperty list uchar int vertex_indices\nend_header\n")
+    body = np.zeros((4, 3), dtype='<f4').tobytes() + bytes([4]) + np.arange(4, dtype='<i4').tobytes()
+    path.write_bytes(header + body)
+    assert native_parsers.read_native(str(path)) is None
+
+
+def test_truncated_ply_falls_back(tmp_path, box_mesh):
+    path = export(tmp_path, box_mesh, 'box.ply', encoding='binary')
+    data = open(path, 'rb').read()
+    with open(path, 'wb') as f:
+        f.write(data[:-10])
+    assert native_parsers.read_native(path) is None
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import trimesh
+
+import obj_parser
+
+
+def write(tmp_path, text, name='model.obj'):
+    path = tmp_path / name
+    path.write_bytes(text.encode('ascii'))
+    return str(path)
+
+
+def test_matches_trimesh(tmp_path, sphere_mesh):
+    vertices, faces = sphere_mesh
+    path = str(tmp_path / 'sphere.obj')
+    trimesh.Trimesh(vertices, faces, process=False).export(path)
+
+    parsed_vertices, parsed_faces = obj_parser.read_obj(path)
+    reference = trimesh.load(path, process=False)
+    np.testing.assert_allclose(parsed_vertices, reference.vertices, atol=1e-6)
+    np.testing.assert_array_equal(parsed_faces, reference.faces)
+
+
+def test_polygons_are_fan_triangulated_and_corners_keep_vertex_index(tmp_path):
+    path = write(tmp_path, "v 0 0 0\nv 1 0 0\nv 1 1 0\nv 0 1 0\nvt 0 0\nvn 0 0 1\n"
+                           "f 1/1/1 2/1/1 3/1/1 4/1/1\n")
+    vertices, faces = obj_parser.read_obj(path)
+    assert vertices.shape == (4, 3)
+    np.testing.assert_array_equal(faces, [[0, 1, 2], [0, 2, 3]])
+
+
+def test_negative_indices_are_relative(tmp_path):
+    path = write(tmp_path, "v 0 0 0\nv 1 0 0\nv 0 1 0\nf -3 -2 -1\n")
+    _, faces = obj_parser.read_obj(path)
+    np.testing.assert_array_equal(faces, [[0, 1, 2]])
+
+
+def test_indented_lines_are_parsed(tmp_path):
+    path = write(tmp_path, "# indented\n  v 0 0 0\n\tv 1 0 0\n \t v 0 1 0\nv 0 0 1\n"
+                           "   f 1 2 3\n\tf 1 3 4\n  vn 0 0 1\n")
+    vertices, faces = obj_parser.read_obj(path)
+    np.testing.assert_allclose(vertices, [[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]])
+    np.testing.assert_array_equal(faces, [[0, 1, 2], [0, 2, 3]])
+
+
+def test_ranges_parse_like_one_pass(tmp_path, sphere_mesh, monkeypatch):
+    vertices, faces = sphere_mesh
+    lines = [f"  v {x:.9f} {y:.9f} {z:.9f}" for x, y, z in vertices]
+    lines += [f"\tf {a + 1} {b + 1} {c + 1}" for a, b, c in faces]
+    path = write(tmp_path, "\n".join(lines) + "\n")
+
+    monkeypatch.setattr(obj_parser, 'CHUNK_BYTES', 4096)
+    parsed_vertices, parsed_faces = obj_parser.read_obj(path, workers=1)
+    np.testing.assert_allclose(parsed_vertices, vertices, atol=1e-8)
+    np.testing.assert_array_equal(parsed_faces, faces)
+
+
+def test_line_continuations_fall_back(tmp_path):
+    path = write(tmp_path, "v 0 0 \\\n0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n")
+    assert obj_parser.read_obj(path) is None
+
+
+def test_out_of_range_face_raises(tmp_path):
+    path = write(tmp_path, "v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 7\n")
+    with pytest.raises(ValueError):
+        obj_parser.read_obj(path)
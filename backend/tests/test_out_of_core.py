@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+import trimesh
+
+import out_of_core
+
+
+@pytest.mark.parametrize('extension', ['obj', 'ply', 'stl'])
+def test_stats_match_trimesh(tmp_path, sphere_mesh, extension):
+    vertices, faces = sphere_mesh
+    path = str(tmp_path / f'sphere.{extension}')
+    trimesh.Trimesh(vertices, faces, process=False).export(path)
+    reference = trimesh.load(path, process=False)
+
+    with out_of_core.parse_to_chunks(path, chunk_rows=97) as mesh:
+        stats = mesh.stats()
+    assert stats['face_count'] == len(reference.faces)
+    np.testing.assert_allclose(stats['bbox'], reference.bounds, atol=1e-6)
+    assert stats['surface_area'] == pytest.approx(reference.area, rel=1e-6)
+
+
+def test_large_coordinates_keep_millimetres(tmp_path, box_mesh):
+    vertices, faces = box_mesh
+    # Georeferenced scan: metres, about 600 km from the origin
+    offset = np.array([612345.678, 5123456.789, 312.5])
+    shifted = vertices * 0.001 + offset
+    path = tmp_path / 'site.obj'
+    path.write_text(''.join(f"v {x:.6f} {y:.6f} {z:.6f}\n" for x, y, z in shifted) +
+                    ''.join(f"f {a + 1} {b + 1} {c + 1}\n" for a, b, c in faces))
+    path = str(path)
+
+    with out_of_core.parse_to_chunks(path) as mesh:
+        np.testing.assert_allclose(np.asarray(mesh.vertices), shifted, rtol=0, atol=1e-6)
+        lo, hi = mesh.bounding_box()
+        np.testing.assert_allclose(hi - lo, [0.002, 0.001, 0.0005], atol=1e-6)
+
+
+def test_decimate_to_budget(tmp_path, sphere_mesh):
+    vertices, faces = sphere_mesh
+    path = str(tmp_path / 'sphere.obj')
+    trimesh.Trimesh(vertices, faces, process=False).export(path)
+
+    with out_of_core.parse_to_chunks(path, chunk_rows=128) as mesh:
+        new_vertices, new_faces = mesh.decimate_to_budget(200)
+    assert 0 < len(new_faces) <= 200
+    assert new_faces.max() < len(new_vertices)
+    assert np.all(np.abs(np.linalg.norm(new_vertices, axis=1)) <= 1.5 + 1e-9)
+
+
+def test_temporary_directory_is_removed(tmp_path, box_mesh):
+    path = str(tmp_path / 'box.stl')
+    trimesh.Trimesh(*box_mesh, process=False).export(path)
+    mesh = out_of_core.parse_to_chunks(path)
+    directory = mesh.directory
+    mesh.close()
+    assert not os.path.exists(directory)
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from derivatives import DerivativeStore
+from progressive import MANIFEST_NAME, ProgressiveEncoder
+
+HASH = 'ab' * 32
+
+
+def test_encode_model_writes_manifest(tmp_path, sphere_mesh):
+    encoder = ProgressiveEncoder(DerivativeStore(str(tmp_path)))
+    manifest = encoder.encode_model('unused.obj', HASH, sphere_mesh)
+
+    assert manifest is not None
+    assert encoder.has_encoding(HASH)
+    assert not encoder.has_failed(HASH)
+    assert encoder.manifest(HASH)['base']['name'] == manifest['base']['name']
+
+
+def test_mesh_without_faces_is_marked_failed(tmp_path):
+    store = DerivativeStore(str(tmp_path))
+    encoder = ProgressiveEncoder(store)
+    mesh = (np.zeros((3, 3)), np.zeros((0, 3), dtype=np.int64))
+
+    assert encoder.encode_model('unused.obj', HASH, mesh) is None
+    assert encoder.has_failed(HASH)
+    assert not encoder.has_encoding(HASH)
+    assert store.has_failed(HASH, MANIFEST_NAME)
+
+
+def test_unreadable_file_is_marked_failed(tmp_path):
+    encoder = ProgressiveEncoder(DerivativeStore(str(tmp_path)))
+
+    assert encoder.encode_model(str(tmp_path / 'missing.obj'), HASH) is None
+    assert encoder.has_failed(HASH)
+
+
+class FakeAuthManager:
+    def get_user_from_token(self, token):
+        return {'id': 7, 'session_id': 1, 'role': 'user'} if token == 'valid' else None
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """Test client for the progressive route with its stores under tmp_path"""
+    import app
+    from signed_urls import UrlSigner
+
+    store = DerivativeStore(str(tmp_path))
+    monkeypatch.setattr(app.app, 'auth_manager', FakeAuthManager())
+    monkeypatch.setattr(app, 'derivative_store', store)
+    monkeypatch.setattr(app, 'progressive_encoder', ProgressiveEncoder(store))
+    monkeypatch.setattr(app, 'url_signer', UrlSigner('secret', {'cache': str(tmp_path)}))
+    monkeypatch.setattr(app, 'queue_progressive_encoding', lambda file_path, content_hash: None)
+    monkeypatch.setattr(app, 'get_model_file', lambda model_id, user_id: {
+        'file_path': str(tmp_path / 'model.obj'), 'content_hash': HASH
+    })
+    (tmp_path / 'model.obj').write_text('v 0 0 0\n')
+    return app
+
+
+def get_manifest(api):
+    return api.app.test_client().get('/api/models/1/progressive',
+                                     headers={'Authorization': 'Bearer valid'})
+
+
+def test_route_signs_raw_and_encoded_chunks(api, sphere_mesh):
+    api.progressive_encoder.encode_model('unused.obj', HASH, sphere_mesh)
+
+    response = get_manifest(api)
+    assert response.status_code == 200
+    manifest = response.get_json()
+    for chunk in [manifest['base']] + manifest['chunks']:
+        assert chunk['url']
+        assert chunk['encoded']['url']
+        token = chunk['encoded']['url'].rsplit('/', 1)[-1]
+        assert api.url_signer.verify(token)['path'].endswith(chunk['encoded']['name'])
+
+
+def test_route_reports_pending_then_failed(api):
+    assert get_manifest(api).status_code == 202
+
+    api.derivative_store.mark_failed(HASH, MANIFEST_NAME, 'Mesh has no faces')
+    assert get_manifest(api).status_code == 422
+
+
+def test_route_fails_cleanly_when_chunks_cannot_be_signed(api, sphere_mesh, monkeypatch):
+    from signed_urls import UrlSigner
+
+    api.progressive_encoder.encode_model('unused.obj', HASH, sphere_mesh)
+    monkeypatch.setattr(api, 'url_signer', UrlSigner('secret', {}))
+
+    assert get_manifest(api).status_code == 500
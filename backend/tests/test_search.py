@@ -0,0 +1,44 @@
+import search
+from search import ModelSearch, to_boolean_query
+
+
+def parse(**args):
+    return ModelSearch({}).parse_params(args)
+
+
+def test_boolean_query_drops_operators_and_caps_words():
+    assert to_boolean_query('bronze "+mask" -age*') == 'bronze* mask* age*'
+    assert len(to_boolean_query(' '.join(['w'] * 50)).split()) == 20
+    assert to_boolean_query('') == ''
+
+
+def test_facets_and_ranges():
+    spec = parse(q='amphora', culture='Roman', file_type='ply', min_triangles='1000', max_dim_x='')
+    assert spec['text'] == 'amphora*'
+    assert spec['filters'] == {'culture': 'Roman', 'file_type': 'ply'}
+    assert spec['ranges'] == {'min_triangles': 1000.0}
+
+
+def test_unknown_parameters_are_ignored():
+    spec = parse(owner='1; DROP TABLE models', sort='id')
+    assert spec['filters'] == {} and spec['ranges'] == {}
+
+
+def test_paging_is_clamped():
+    assert (parse()['page'], parse()['per_page']) == (1, search.DEFAULT_PER_PAGE)
+    spec = parse(page='0', per_page='10000')
+    assert (spec['page'], spec['per_page']) == (1, search.MAX_PER_PAGE)
+
+
+def test_invalid_numbers_are_errors():
+    assert 'error' in parse(min_dim_z='wide')
+    assert 'error' in parse(page='two')
+
+
+def test_where_uses_placeholders_only():
+    spec = parse(q='mask', period="Bronze' OR 1=1", max_triangles='5')
+    where, params = ModelSearch({})._where(spec)
+    assert "OR 1=1" not in where
+    assert params == ['mask*', 'mask*', "Bronze' OR 1=1", 5.0]
+    where, params = ModelSearch({})._where(spec, skip_facet='period')
+    assert params == ['mask*', 'mask*', 5.0]
@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from sessions import SessionManager
+
+
+class SessionTable:
+    """user_sessions rows plus a cursor that answers the statements SessionManager issues"""
+
+    def __init__(self):
+        self.rows = []
+        self.next_id = 1
+        self.deletes = []
+
+    def add(self, user_id, expires_at):
+        self.rows.append({'id': self.next_id, 'user_id': user_id, 'session_token': f"t{self.next_id}",
+                          'expires_at': expires_at})
+        self.next_id += 1
+
+    def cursor(self, dictionary=False):
+        return SessionCursor(self)
+
+    def close(self):
+        pass
+
+
+class SessionCursor:
+    def __init__(self, table):
+        self.table = table
+        self.rowcount = 0
+        self.result = None
+
+    def execute(self, statement, params=()):
+        statement = ' '.join(statement.split())
+        table = self.table
+        if statement.startswith('INSERT INTO user_sessions'):
+            user_id, token, expires_at = params
+            table.add(user_id, expires_at)
+        elif statement.startswith('SELECT id FROM user_sessions'):
+            user_id, offset = params
+            ids = sorted((row['id'] for row in table.rows if row['user_id'] == user_id), reverse=True)
+            self.result = {'id': ids[offset]} if len(ids) > offset else None
+        elif statement.startswith('DELETE FROM user_sessions WHERE user_id = %s AND id <= %s'):
+            user_id, cutoff_id = params
+            self._delete([row for row in table.rows if row['user_id'] == user_id and row['id'] <= cutoff_id])
+        elif statement.startswith('DELETE FROM user_sessions WHERE expires_at < NOW()'):
+            expired = sorted((row for row in table.rows if row['expires_at'] < datetime.now()),
+                             key=lambda row: row['expires_at'])
+            self._delete(expired[:params[0]])
+        else:
+            raise AssertionError(f"Unexpected statement: {statement}")
+
+    def _delete(self, rows):
+        ids = {row['id'] for row in rows}
+        self.table.rows = [row for row in self.table.rows if row['id'] not in ids]
+        self.table.deletes.append(len(ids))
+        self.rowcount = len(ids)
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def table():
+    return SessionTable()
+
+
+def manager(table, **kwargs):
+    sessions = SessionManager({}, **kwargs)
+    sessions.get_db_connection = lambda: table
+    return sessions
+
+
+def session_ids(table, user_id):
+    return [row['id'] for row in table.rows if row['user_id'] == user_id]
+
+
+def test_create_session_returns_token_and_expiry(table):
+    sessions = manager(table, ttl_hours=2)
+    token, expires_at = sessions.create_session(table.cursor(dictionary=True), 1)
+
+    assert table.rows[0]['session_token'] == 't1'
+    assert len(token) > 30
+    assert timedelta(hours=1, minutes=59) < expires_at - datetime.now() <= timedelta(hours=2)
+
+
+def test_cap_keeps_the_newest_sessions(table):
+    sessions = manager(table, max_per_user=3)
+    for _ in range(5):
+        sessions.create_session(table.cursor(dictionary=True), 1)
+
+    assert session_ids(table, 1) == [3, 4, 5]
+
+
+def test_cap_is_per_user(table):
+    sessions = manager(table, max_per_user=2)
+    for user_id in (1, 2, 1, 2, 1):
+        sessions.create_session(table.cursor(), user_id)
+
+    assert session_ids(table, 1) == [3, 5]
+    assert session_ids(table, 2) == [2, 4]
+
+
+def test_cap_drops_nothing_while_under_it(table):
+    sessions = manager(table, max_per_user=3)
+    for _ in range(3):
+        sessions.create_session(table.cursor(), 1)
+
+    assert session_ids(table, 1) == [1, 2, 3]
+    assert table.deletes == []
+
+
+def test_purge_deletes_only_expired_sessions_in_batches(table):
+    now = datetime.now()
+    for hours in (-5, 3, -1, -4, 2, -2, -3):
+        table.add(1, now + timedelta(hours=hours))
+    sessions = manager(table, purge_batch=2)
+
+    assert sessions.purge_expired() == 5
+    assert table.deletes == [2, 2, 1]
+    assert all(row['expires_at'] > now for row in table.rows)
+    assert sessions.purged_total == 5
+    assert sessions.last_purge is not None
+
+
+def test_purge_stops_after_max_batches(table):
+    for _ in range(10):
+        table.add(1, datetime.now() - timedelta(hours=1))
+    sessions = manager(table, purge_batch=3)
+
+    assert sessions.purge_expired(max_batches=2) == 6
+    assert len(table.rows) == 4
+    assert sessions.purge_expired() == 4
+    assert sessions.purged_total == 10
+
+
+def test_purge_stops_when_the_purger_is_stopped(table):
+    for _ in range(6):
+        table.add(1, datetime.now() - timedelta(hours=1))
+    sessions = manager(table, purge_batch=2)
+    sessions.stop_purger()
+
+    assert sessions.purge_expired() == 2
+
+
+def test_purge_without_database(table):
+    sessions = manager(table)
+    sessions.get_db_connection = lambda: None
+
+    assert sessions.purge_expired() == 0
+    assert sessions.last_purge is None
@@ -0,0 +1,65 @@
+import os
+import time
+
+import pytest
+
+import signed_urls
+from signed_urls import UrlSigner
+
+
+@pytest.fixture
+def signer(tmp_path):
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+    (uploads / 'model.ply').write_bytes(b'ply\n')
+    return UrlSigner('secret', {'uploads': str(uploads), 'cache': str(tmp_path / 'cache')})
+
+
+def issue(signer, ttl=signed_urls.DEFAULT_TTL):
+    path = os.path.join(signer.roots['uploads'], 'model.ply')
+    return signer.issue(7, 'file', 3, path, 'application/octet-stream', 'model.ply', ttl)
+
+
+def test_round_trip(signer):
+    signed = issue(signer)
+    claims = signer.verify(signed['token'])
+    assert claims['m'] == 7 and claims['u'] == 3 and claims['d'] == 'file'
+    assert claims['path'] == os.path.join(signer.roots['uploads'], 'model.ply')
+    assert signed['expires_at'] % signed_urls.EXPIRY_GRANULARITY == 0
+    assert signed['expires_at'] >= time.time() + signed_urls.DEFAULT_TTL
+
+
+def test_same_window_gives_same_url(signer):
+    assert issue(signer)['token'] == issue(signer)['token']
+
+
+def test_expired_token_is_rejected(signer, monkeypatch):
+    signed = issue(signer, ttl=1)
+    monkeypatch.setattr(signed_urls.time, 'time', lambda: signed['expires_at'] + 1)
+    assert signer.verify(signed['token']) is None
+
+
+def test_ttl_is_capped(signer):
+    signed = issue(signer, ttl=10 * signed_urls.MAX_TTL)
+    assert signed['expires_at'] <= time.time() + signed_urls.MAX_TTL + signed_urls.EXPIRY_GRANULARITY
+
+
+def test_tampered_payload_is_rejected(signer):
+    encoded, _, signature = issue(signer)['token'].partition('.')
+    payload = signed_urls._b64decode(encoded).replace(b'"m":7', b'"m":8')
+    assert signer.verify(f"{signed_urls._b64encode(payload)}.{signature}") is None
+    assert signer.verify(encoded) is None
+    assert signer.verify(f"{encoded}.{signature[:-2]}AA") is None
+
+
+def test_other_secret_is_rejected(signer):
+    other = UrlSigner('other', signer.roots)
+    assert other.verify(issue(signer)['token']) is None
+
+
+def test_paths_outside_roots_are_not_signed(signer, tmp_path):
+    outside = tmp_path / 'secret.txt'
+    outside.write_text('x')
+    assert signer.issue(1, 'file', 1, str(outside), 'text/plain', 'secret.txt') is None
+    escaping = os.path.join(signer.roots['uploads'], '..', 'secret.txt')
+    assert signer.issue(1, 'file', 1, escaping, 'text/plain', 'secret.txt') is None
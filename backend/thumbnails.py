@@ -0,0 +1,151 @@
+"""
+Headless thumbnail and turntable rendering
+
+Renders a decimated LOD of a model on the CPU (no GPU or display needed):
+orthographic projection, flat Lambert shading and painter's-algorithm
+triangle fill via Pillow, supersampled for anti-aliasing. Results are
+written to the DerivativeStore under the source file's content hash.
+"""
+
+import io
+import numpy as np
+from PIL import Image, ImageDraw, features
+from typing import Dict, Optional, Tuple
+
+from derivatives import DerivativeStore
+from mesh_utils import load_mesh_bounded, decimate_to_budget
+
+BACKGROUND = (241, 245, 249, 255)
+BASE_COLOR = np.array([196, 184, 160], dtype=np.float64)
+LIGHT_DIRECTION = np.array([0.35, 0.55, 1.0]) / np.linalg.norm([0.35, 0.55, 1.0])
+AMBIENT = 0.3
+SUPERSAMPLE = 2
+
+IMAGE_FORMAT = 'WEBP' if features.check('webp') else 'PNG'
+IMAGE_EXTENSION = 'webp' if IMAGE_FORMAT == 'WEBP' else 'png'
+THUMBNAIL_NAME = f"thumbnail.{IMAGE_EXTENSION}"
+THUMBNAIL_PNG_NAME = "thumbnail.png"
+TURNTABLE_NAME = f"turntable.{IMAGE_EXTENSION}"
+
+
+def rotation_matrix(yaw: float, pitch: float) -> np.ndarray:
+    """Rotation about Y by yaw, then about X by pitch (radians)"""
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    rot_y = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    rot_x = np.array([[1, 0, 0], [0, cp, -sp], [0, sp, cp]])
+    return rot_x @ rot_y
+
+
+def normalize_vertices(vertices: np.ndarray) -> np.ndarray:
+    """Center on the bounding box and scale into the unit sphere"""
+    center = (vertices.min(axis=0) + vertices.max(axis=0)) / 2.0
+    centered = vertices - center
+    radius = np.linalg.norm(centered, axis=1).max()
+    return centered / radius if radius > 0 else centered
+
+
+def render_view(vertices: np.ndarray, faces: np.ndarray, size: int,
+                yaw: float = 0.6, pitch: float = 0.35) -> Image.Image:
+    """Render one view of a normalized mesh as an RGBA image"""
+    canvas_size = size * SUPERSAMPLE
+    image = Image.new('RGBA', (canvas_size, canvas_size), BACKGROUND)
+    if len(faces) == 0:
+        return image.resize((size, size), Image.LANCZOS)
+
+    rotated = vertices @ rotation_matrix(yaw, pitch).T
+    tris = rotated[faces]
+
+    normals = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1.0
+    normals /= lengths[:, None]
+
+    # Two-sided lighting: scans often have inconsistent winding
+    intensity = AMBIENT + (1.0 - AMBIENT) * np.abs(normals @ LIGHT_DIRECTION)
+    colors = np.clip(BASE_COLOR[None, :] * intensity[:, None], 0, 255).astype(np.uint8)
+
+    # Orthographic projection of the unit sphere onto the canvas (y up)
+    half = canvas_size / 2.0
+    scale = half * 0.92
+    screen = np.empty(tris.shape[:2] + (2,))
+    screen[..., 0] = half + tris[..., 0] * scale
+    screen[..., 1] = half - tris[..., 1] * scale
+
+    # Painter's algorithm: camera looks down -z, so draw low z first
+    order = np.argsort(tris[:, :, 2].mean(axis=1), kind='stable')
+    draw = ImageDraw.Draw(image)
+    for polygon, color in zip(screen[order].tolist(), colors[order].tolist()):
+        draw.polygon([tuple(point) for point in polygon], fill=tuple(color))
+
+    return image.resize((size, size), Image.LANCZOS)
+
+
+def encode_image(image: Image.Image, image_format: str = IMAGE_FORMAT) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == 'WEBP':
+        image.save(buffer, format='WEBP', quality=80, method=4)
+    else:
+        image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+class ThumbnailRenderer:
+    def __init__(self, store: DerivativeStore, size: int = 256,
+                 frame_size: int = 128, frame_count: int = 12,
+                 thumbnail_faces: int = 40000, frame_faces: int = 10000):
+        self.store = store
+        self.size = size
+        self.frame_size = frame_size
+        self.frame_count = frame_count
+        self.thumbnail_faces = thumbnail_faces
+        self.frame_faces = frame_faces
+
+    def has_previews(self, content_hash: str) -> bool:
+        return (self.store.exists(content_hash, THUMBNAIL_NAME) and
+                self.store.exists(content_hash, TURNTABLE_NAME))
+
+    def has_failed(self, content_hash: str) -> bool:
+        """True if rendering this file failed before (listings then stop queueing it)"""
+        return self.store.has_failed(content_hash, THUMBNAIL_NAME)
+
+    def render_arrays(self, vertices: np.ndarray, faces: np.ndarray) -> Tuple[Image.Image, Image.Image]:
+        """Render (thumbnail, turntable sprite sheet) for a mesh"""
+        vertices = normalize_vertices(np.asarray(vertices, dtype=np.float64))
+
+        thumb_vertices, thumb_faces = decimate_to_budget(vertices, faces, self.thumbnail_faces)
+        thumbnail = render_view(thumb_vertices, thumb_faces, self.size)
+
+        frame_vertices, frame_faces = decimate_to_budget(thumb_vertices, thumb_faces, self.frame_faces)
+        sprite = Image.new('RGBA', (self.frame_size * self.frame_count, self.frame_size), BACKGROUND)
+        for frame in range(self.frame_count):
+            yaw = 2.0 * np.pi * frame / self.frame_count
+            view = render_view(frame_vertices, frame_faces, self.frame_size, yaw=yaw)
+            sprite.paste(view, (frame * self.frame_size, 0))
+
+        return thumbnail, sprite
+
+    def render_model(self, file_path: str, content_hash: str,
+                     mesh: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Optional[Dict[str, str]]:
+        """Render and store previews for a model file (or its loaded mesh); returns derivative paths"""
+        if self.has_previews(content_hash):
+            return {
+                'thumbnail': self.store.path(content_hash, THUMBNAIL_NAME),
+                'turntable': self.store.path(content_hash, TURNTABLE_NAME)
+            }
+
+        try:
+            vertices, faces = mesh or load_mesh_bounded(file_path, self.thumbnail_faces)
+            thumbnail, sprite = self.render_arrays(vertices, faces)
+        except Exception as e:
+            print(f"Error rendering thumbnails for {file_path}: {e}")
+            self.store.mark_failed(content_hash, THUMBNAIL_NAME, str(e))
+            return None
+
+        paths = {'thumbnail': self.store.write_bytes(content_hash, THUMBNAIL_NAME, encode_image(thumbnail))}
+        if IMAGE_FORMAT != 'PNG':
+            paths['thumbnail_png'] = self.store.write_bytes(content_hash, THUMBNAIL_PNG_NAME,
+                                                            encode_image(thumbnail, 'PNG'))
+        # Sprite last, so has_previews() never reports a half-written set
+        paths['turntable'] = self.store.write_bytes(content_hash, TURNTABLE_NAME, encode_image(sprite))
+        return paths
@@ -0,0 +1,246 @@
+"""
+Admin user directory backed by maintained per-user statistics
+
+user_stats keeps model_count, total_bytes and last_activity_at per user,
+updated incrementally when models are added/removed and when activity is
+logged, so listing users never aggregates the models table. rebuild()
+recomputes it from scratch for first deployment or drift repair.
+
+Listings are paginated and sorted on indexed columns; search is a prefix
+match on username/email/organization (each backed by an index). The CSV
+export streams rows from an unbuffered cursor in batches.
+"""
+
+import csv
+import io
+from typing import Any, Dict, Iterator, List, Tuple
+
+import mysql.connector
+
+import db
+
+# Sort key -> ORDER BY expression
+SORT_COLUMNS = {
+    'created_at': 'u.created_at',
+    'username': 'u.username',
+    'email': 'u.email',
+    'organization': 'u.organization',
+    'last_login': 'u.last_login',
+    'model_count': 'model_count',
+    'total_bytes': 'total_bytes',
+    'last_activity': 'last_activity_at'
+}
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+EXPORT_BATCH = 1000
+
+# %T is %H:%i:%s; spelling out %s would be taken for a parameter placeholder
+USER_COLUMNS = """
+    u.id, u.username, u.email, u.first_name, u.last_name,
+    u.organization, u.role, u.is_active,
+    DATE_FORMAT(u.created_at, '%Y-%m-%d %T') AS created_at,
+    DATE_FORMAT(u.last_login, '%Y-%m-%d %T') AS last_login,
+    COALESCE(s.model_count, 0) AS model_count,
+    COALESCE(s.total_bytes, 0) AS total_bytes,
+    DATE_FORMAT(s.last_activity_at, '%Y-%m-%d %T') AS last_activity_at
+"""
+
+EXPORT_FIELDS = ['id', 'username', 'email', 'first_name', 'last_name', 'organization', 'role',
+                 'is_active', 'created_at', 'last_login', 'model_count', 'total_bytes', 'last_activity_at']
+
+
+def escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def record_model_added(cursor, user_id: int, file_size: int):
+    """Count a new model in user_stats, on the caller's cursor"""
+    cursor.execute("""
+        INSERT INTO user_stats (user_id, model_count, total_bytes)
+        VALUES (%s, 1, %s)
+        ON DUPLICATE KEY UPDATE model_count = model_count + 1, total_bytes = total_bytes + VALUES(total_bytes)
+    """, (user_id, file_size or 0))
+
+
+def record_models_removed(cursor, user_id: int, count: int, total_bytes: int):
+    """Subtract deleted models from user_stats, on the caller's cursor"""
+    if count <= 0:
+        return
+    cursor.execute("""
+        UPDATE user_stats
+        SET model_count = GREATEST(CAST(model_count AS SIGNED) - %s, 0),
+            total_bytes = GREATEST(CAST(total_bytes AS SIGNED) - %s, 0)
+        WHERE user_id = %s
+    """, (count, total_bytes or 0, user_id))
+
+
+def record_activity(cursor, user_id: int):
+    """Stamp the user's last activity, on the caller's cursor"""
+    cursor.execute("""
+        INSERT INTO user_stats (user_id, last_activity_at) VALUES (%s, NOW())
+        ON DUPLICATE KEY UPDATE last_activity_at = VALUES(last_activity_at)
+    """, (user_id,))
+
+
+class UserDirectory:
+    def __init__(self, db_config: Dict[str, str]):
+        self.db_config = db_config
+
+    def get_db_connection(self):
+        """Get database connection"""
+        try:
+            return db.connect(self.db_config)
+        except mysql.connector.Error as err:
+            print(f"Database connection error: {err}")
+            return None
+
+    def parse_params(self, args) -> Dict[str, Any]:
+        """Validate listing arguments into a spec or {'error': ...}"""
+        sort = args.get('sort', 'created_at')
+        if sort not in SORT_COLUMNS:
+            return {"error": f"sort must be one of: {', '.join(SORT_COLUMNS)}"}
+
+        order = args.get('order', 'desc').lower()
+        if order not in ('asc', 'desc'):
+            return {"error": "order must be asc or desc"}
+
+        try:
+            page = max(1, int(args.get('page', 1)))
+            per_page = min(MAX_PER_PAGE, max(1, int(args.get('per_page', DEFAULT_PER_PAGE))))
+        except ValueError:
+            return {"error": "page and per_page must be integers"}
+
+        return {
+            'q': args.get('q', '').strip(),
+            'role': args.get('role'),
+            'sort': sort,
+            'order': order,
+            'page': page,
+            'per_page': per_page
+        }
+
+    def _where(self, spec: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        clauses = []
+        params = []
+        if spec['q']:
+            # Prefix matches so each branch can use its index (index_merge union)
+            prefix = escape_like(spec['q']) + '%'
+            clauses.append("(u.username LIKE %s OR u.email LIKE %s OR u.organization LIKE %s)")
+            params.extend([prefix, prefix, prefix])
+        if spec.get('role'):
+            clauses.append("u.role = %s")
+            params.append(spec['role'])
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def open_page(self, spec: Dict[str, Any]) -> Tuple[Dict[str, Any], Any, Any]:
+        """Paging info plus the connection and executed cursor for one page of users
+
+        The caller streams the rows and closes both; on failure the first
+        element is {'error': ...} and the others are None.
+        """
+        conn = self.get_db_connection()
+        if not conn:
+            return {"error": "Database connection failed"}, None, None
+
+        try:
+            cursor = conn.cursor(dictionary=True)
+            where, params = self._where(spec)
+
+            cursor.execute(f"SELECT COUNT(*) AS total FROM users u {where}", params)
+            total = cursor.fetchone()['total']
+
+            direction = 'ASC' if spec['order'] == 'asc' else 'DESC'
+            cursor.execute(f"""
+                SELECT {USER_COLUMNS}
+                FROM users u
+                LEFT JOIN user_stats s ON s.user_id = u.id
+                {where}
+                ORDER BY {SORT_COLUMNS[spec['sort']]} {direction}, u.id {direction}
+                LIMIT %s OFFSET %s
+            """, params + [spec['per_page'], (spec['page'] - 1) * spec['per_page']])
+
+            return {
+                "total": total,
+                "page": spec['page'],
+                "per_page": spec['per_page'],
+                "pages": (total + spec['per_page'] - 1) // spec['per_page']
+            }, conn, cursor
+
+        except Exception as e:
+            print(f"Error listing users: {e}")
+            conn.close()
+            return {"error": f"Database error: {str(e)}"}, None, None
+
+    def export_csv(self, spec: Dict[str, Any]) -> Iterator[str]:
+        """CSV of every matching user, yielded in batches from an unbuffered cursor"""
+        conn = self.get_db_connection()
+        if not conn:
+            return
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        yield buffer.getvalue()
+
+        try:
+            cursor = conn.cursor()
+            where, params = self._where(spec)
+            cursor.execute(f"""
+                SELECT {USER_COLUMNS}
+                FROM users u
+                LEFT JOIN user_stats s ON s.user_id = u.id
+                {where}
+                ORDER BY u.id
+            """, params)
+
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH)
+                if not rows:
+                    break
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(rows)
+                yield buffer.getvalue()
+
+            cursor.close()
+        except Exception as e:
+            print(f"Error exporting users: {e}")
+        finally:
+            conn.close()
+
+    def rebuild(self) -> Dict[str, Any]:
+        """Recompute user_stats for every user from models and the activity log"""
+        conn = self.get_db_connection()
+        if not conn:
+            return {"error": "Database connection failed"}
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO user_stats (user_id, model_count, total_bytes, last_activity_at)
+                SELECT u.id,
+                       COALESCE(m.model_count, 0),
+                       COALESCE(m.total_bytes, 0),
+                       a.last_activity_at
+                FROM users u
+                LEFT JOIN (
+                    SELECT user_id, COUNT(*) AS model_count, SUM(file_size) AS total_bytes
+                    FROM models GROUP BY user_id
+                ) m ON m.user_id = u.id
+                LEFT JOIN (
+                    SELECT user_id, MAX(created_at) AS last_activity_at
+                    FROM user_activity_log GROUP BY user_id
+                ) a ON a.user_id = u.id
+                ON DUPLICATE KEY UPDATE
+                    model_count = VALUES(model_count),
+                    total_bytes = VALUES(total_bytes),
+                    last_activity_at = COALESCE(VALUES(last_activity_at), user_stats.last_activity_at)
+            """)
+            cursor.close()
+            conn.close()
+            return {"success": True}
+
+        except Exception as e:
+            print(f"Error rebuilding user stats: {e}")
+            return {"error": f"Database error: {str(e)}"}